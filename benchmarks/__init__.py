@@ -0,0 +1 @@
+"""Benchmarks of WaniKani Notifier against a local fake WaniKani API."""
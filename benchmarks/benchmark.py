@@ -0,0 +1,110 @@
+"""
+End-to-end benchmark of WaniKani Notifier against a local fake WaniKani API.
+
+Each scenario runs the command line interface in a fresh process, so that import time and peak memory are measured
+as a cron run would experience them, and is reported with the requests and bytes served by the fake API.
+
+Usage::
+
+    python -m benchmarks.benchmark [--levels 1 10 30 60] [--subjects-per-level 150] [--json results.json]
+"""
+import argparse
+import json
+import os
+import resource
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from typing import List
+
+CHAINS = (
+    "available_assignments_now all_available_assignments",
+    "available_assignments_now --since 1",
+    "available_assignments_now --since 1 all_available_assignments",
+    "available_assignments_now --since 1 --min 10 available_assignments_now --since 6 all_available_assignments",
+)
+DEFAULT_LEVELS = (1, 10, 30, 60)
+
+Result = namedtuple("Result", ("level", "chain", "cache", "wall_time", "run_time", "requests", "bytes", "peak_rss"))
+
+
+def run_child(api_root: str, token: str, chain: str) -> None:
+    """
+    Runs the command line interface once in the current process, then prints its measurements as JSON.
+    """
+    started_at = time.perf_counter()
+    from wanikani_api import constants
+    constants.ROOT_WK_API_URL = api_root
+    from wanikani_notifier.cli import cli
+
+    run_started_at = time.perf_counter()
+    cli.main(["--wanikani", token] + shlex.split(chain), standalone_mode=False)
+    finished_at = time.perf_counter()
+
+    print(json.dumps({
+        "wall_time": finished_at - started_at,
+        "run_time": finished_at - run_started_at,
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }))
+
+
+def run_scenario(fake, level: int, chain: str, cache_folder: str, cache: str) -> Result:
+    fake.reset_counters()
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.benchmark", "--child", fake.api_root, f"level-{level}", chain],
+        cwd=cache_folder,
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join([os.getcwd(), os.environ.get("PYTHONPATH", "")]),
+                 WANIKANI_NOTIFIER_CACHE_DIR=cache_folder),
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    measurements = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    return Result(level=level, chain=chain, cache=cache, requests=fake.requests, bytes=fake.bytes_sent, **measurements)
+
+
+def run_benchmarks(levels: List[int], subjects_per_level: int) -> List[Result]:
+    from benchmarks.fake_wanikani import FakeWaniKani
+
+    results = []
+    with FakeWaniKani(subjects_per_level=subjects_per_level) as fake:
+        for level in levels:
+            for chain in CHAINS:
+                with tempfile.TemporaryDirectory() as cache_folder:
+                    results.append(run_scenario(fake, level, chain, cache_folder, "cold"))
+                    results.append(run_scenario(fake, level, chain, cache_folder, "warm"))
+    return results
+
+
+def print_results(results: List[Result]) -> None:
+    print(f"{'level':>5} {'cache':>5} {'wall (s)':>9} {'run (s)':>8} {'requests':>8} {'KiB':>9} {'RSS (MiB)':>9}  chain")
+    for r in results:
+        print(f"{r.level:>5} {r.cache:>5} {r.wall_time:>9.3f} {r.run_time:>8.3f} {r.requests:>8} "
+              f"{r.bytes / 1024:>9.1f} {r.peak_rss / 1024 / 1024:>9.1f}  {r.chain}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=DEFAULT_LEVELS, help="Levels of the benchmarked accounts")
+    parser.add_argument("--subjects-per-level", type=int, default=150, help="Number of subjects per level")
+    parser.add_argument("--json", help="File to write the results to, as JSON")
+    parser.add_argument("--child", nargs=3, metavar=("API_ROOT", "TOKEN", "CHAIN"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    results = run_benchmarks(args.levels, args.subjects_per_level)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump([r._asdict() for r in results], json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Local stand-in for the WaniKani API, serving synthetic accounts.
+
+Accounts are identified by their API token, of the form "level-<n>", and own an assignment for every subject up to
+their level. It implements the pagination contract and the filters used by WaniKani Notifier, the summary report,
+as well as ETag based conditional requests, and counts the requests and bytes it serves.
+"""
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs, urlencode
+
+import ujson as ujson
+
+SUBJECTS_PER_PAGE = 1000
+ASSIGNMENTS_PER_PAGE = 500
+MAX_LEVEL = 60
+SUBJECT_TYPES = (("radical", 0.05), ("kanji", 0.25), ("vocabulary", 0.70))
+
+# Time spent before the next review, per SRS stage, as in WaniKani's SRS.
+SRS_INTERVALS = {1: timedelta(hours=4), 2: timedelta(hours=8), 3: timedelta(days=1), 4: timedelta(days=2),
+                 5: timedelta(weeks=1), 6: timedelta(weeks=2), 7: timedelta(days=30), 8: timedelta(days=120)}
+
+EPOCH = datetime(year=2020, month=1, day=1)
+
+
+def _timestamp(moment: Optional[datetime]) -> Optional[str]:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%fZ") if moment else None
+
+
+def _parse_timestamp(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value.rstrip("Z").split("+")[0])
+    except ValueError:
+        return datetime.min
+
+
+def _hour(moment: datetime) -> datetime:
+    """Reviews become available on the hour on WaniKani."""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def build_subjects(subjects_per_level: int) -> List[dict]:
+    subjects = []
+    for level in range(1, MAX_LEVEL + 1):
+        for subject_type, share in SUBJECT_TYPES:
+            for _ in range(max(1, int(subjects_per_level * share))):
+                subject_id = len(subjects) + 1
+                data = {
+                    "level": level,
+                    "created_at": _timestamp(EPOCH),
+                    "characters": "字",
+                    "meanings": [{"meaning": f"Meaning {subject_id}", "primary": True, "accepted_answer": True}],
+                    "auxiliary_meanings": [],
+                    "document_url": f"https://www.wanikani.com/{subject_type}/{subject_id}",
+                    "hidden_at": None,
+                    "meaning_mnemonic": "A mnemonic long enough to weigh like the real ones. " * 8,
+                    "amalgamation_subject_ids": [],
+                    "component_subject_ids": [],
+                    "parts_of_speech": ["noun"],
+                    "character_images": [],
+                    "readings": [{"reading": "じ", "primary": True, "accepted_answer": True, "type": "onyomi"}],
+                }
+                subjects.append({
+                    "id": subject_id,
+                    "object": subject_type,
+                    "url": f"/subjects/{subject_id}",
+                    "data_updated_at": _timestamp(EPOCH),
+                    "data": data,
+                })
+    return subjects
+
+
+def build_assignments(subjects: List[dict], level: int, now: datetime) -> List[dict]:
+    """
+    Builds the assignments of an account of the provided level.
+
+    Subjects of past levels are started, the older the level the higher their SRS stage, while the subjects
+    of the current level are split between lessons and the first SRS stages.
+    """
+    assignments = []
+    for subject in subjects:
+        subject_level = subject["data"]["level"]
+        if subject_level > level:
+            continue
+
+        index = len(assignments)
+        srs_stage = min(9, max(0, (level - subject_level) + index % 4)) if subject_level < level else index % 3
+        created_at = now - timedelta(days=7 * (level - subject_level) + 1)
+        started_at = created_at + timedelta(hours=1) if srs_stage else None
+        burned_at = created_at + timedelta(days=150) if srs_stage == 9 else None
+        available_at = None
+        if 0 < srs_stage < 9:
+            available_at = _hour(now + SRS_INTERVALS[srs_stage] * ((index % 7) / 3.5 - 1))
+        assignments.append({
+            "id": index + 1,
+            "object": "assignment",
+            "url": f"/assignments/{index + 1}",
+            "data_updated_at": _timestamp(started_at or created_at),
+            "data": {
+                "created_at": _timestamp(created_at),
+                "subject_id": subject["id"],
+                "subject_type": subject["object"],
+                "srs_stage": srs_stage,
+                "unlocked_at": _timestamp(created_at),
+                "started_at": _timestamp(started_at),
+                "passed_at": _timestamp(started_at) if srs_stage >= 5 else None,
+                "burned_at": _timestamp(burned_at),
+                "available_at": _timestamp(available_at),
+                "resurrected_at": None,
+                "hidden": False,
+            },
+        })
+    return assignments
+
+
+def build_user(level: int) -> dict:
+    return {
+        "object": "user",
+        "url": "/user",
+        "data_updated_at": _timestamp(EPOCH),
+        "data": {
+            "id": f"user-{level}",
+            "username": f"level{level}",
+            "level": level,
+            "profile_url": f"https://www.wanikani.com/users/level{level}",
+            "started_at": _timestamp(EPOCH),
+            "current_vacation_started_at": None,
+            "subscription": {"active": True, "type": "lifetime", "max_level_granted": 60, "period_ends_at": None},
+            "preferences": {
+                "default_voice_actor_id": 1,
+                "lessons_autoplay_audio": False,
+                "lessons_batch_size": 5,
+                "lessons_presentation_order": "ascending_level_then_subject",
+                "reviews_autoplay_audio": False,
+                "reviews_display_srs_indicator": True,
+            },
+        },
+    }
+
+
+def build_summary(assignments: List[dict], now: datetime) -> dict:
+    """
+    Builds the summary of an account: its lessons available now, and its reviews per hour for the next 24 hours,
+    the first hour gathering all the reviews already available.
+    """
+    current_hour = _hour(now)
+    lessons = [a["data"]["subject_id"] for a in assignments if a["data"]["started_at"] is None]
+    reviews: List[List[int]] = [[] for _ in range(25)]
+    review_times = []
+    for assignment in assignments:
+        data = assignment["data"]
+        if data["started_at"] is None or data["available_at"] is None:
+            continue
+        available_at = _parse_timestamp(data["available_at"])
+        review_times.append(available_at)
+        hours = max(0, int((available_at - current_hour).total_seconds() // 3600))
+        if hours < len(reviews):
+            reviews[hours].append(data["subject_id"])
+    return {
+        "object": "report",
+        "url": "/summary",
+        "data_updated_at": _timestamp(current_hour),
+        "data": {
+            "lessons": [{"available_at": _timestamp(current_hour), "subject_ids": lessons}],
+            "next_reviews_at": _timestamp(min(review_times, default=None)),
+            "reviews": [{"available_at": _timestamp(current_hour + timedelta(hours=hours)), "subject_ids": subject_ids}
+                        for hours, subject_ids in enumerate(reviews)],
+        },
+    }
+
+
+def _matches(resource: dict, filters: Dict[str, str]) -> bool:
+    data = resource["data"]
+    if "updated_after" in filters and \
+            _parse_timestamp(resource["data_updated_at"]) <= _parse_timestamp(filters["updated_after"]):
+        return False
+    if "unlocked" in filters and (data["unlocked_at"] is not None) != (filters["unlocked"] == "true"):
+        return False
+    if "started" in filters and (data["started_at"] is not None) != (filters["started"] == "true"):
+        return False
+    if "hidden" in filters and data["hidden"] != (filters["hidden"] == "true"):
+        return False
+    if "available_before" in filters and \
+            (data["available_at"] is None or data["available_at"] > _timestamp(_parse_timestamp(filters["available_before"]))):
+        return False
+    if "available_after" in filters and \
+            (data["available_at"] is None or data["available_at"] < _timestamp(_parse_timestamp(filters["available_after"]))):
+        return False
+    return True
+
+
+class FakeWaniKani:
+    """
+    Fake WaniKani API server, running in a background thread.
+    """
+
+    def __init__(self, subjects_per_level: int = 150, now: Optional[datetime] = None):
+        self.now = now or datetime.utcnow()
+        self.subjects = build_subjects(subjects_per_level)
+        self._assignments: Dict[int, List[dict]] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def api_root(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v2/"
+
+    def __enter__(self) -> "FakeWaniKani":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+
+    def assignments(self, level: int) -> List[dict]:
+        with self._lock:
+            if level not in self._assignments:
+                self._assignments[level] = build_assignments(self.subjects, level, self.now)
+            return self._assignments[level]
+
+    def _record(self, body_size: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += body_size
+
+    def _collection(self, endpoint: str, resources: List[dict], filters: Dict[str, str], per_page: int) -> dict:
+        page_after_id = int(filters.pop("page_after_id", 0))
+        matching = [r for r in resources if _matches(r, filters)]
+        page = [r for r in matching if r["id"] > page_after_id][:per_page]
+        next_url = None
+        if page and page[-1]["id"] < matching[-1]["id"]:
+            next_url = f"{self.api_root}{endpoint}?{urlencode(dict(filters, page_after_id=page[-1]['id']))}"
+        previous_url = None
+        if page_after_id and page:
+            previous_url = f"{self.api_root}{endpoint}?{urlencode(dict(filters, page_before_id=page[0]['id']))}"
+        return {
+            "object": "collection",
+            "url": f"{self.api_root}{endpoint}",
+            "pages": {
+                "per_page": per_page,
+                "next_url": next_url,
+                "previous_url": previous_url,
+            },
+            "total_count": len(matching),
+            "data_updated_at": max((r["data_updated_at"] for r in matching), default=_timestamp(EPOCH)),
+            "data": page,
+        }
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                token = self.headers.get("Authorization", "").replace("Bearer ", "")
+                if not token.startswith("level-"):
+                    return self._send(401, {"error": "Unauthorized. Nice try.", "code": 401})
+                level = int(token[len("level-"):])
+
+                url = urlparse(self.path)
+                filters = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+                if endpoint == "user":
+                    content = build_user(level)
+                elif endpoint == "subjects":
+                    content = fake._collection("subjects", fake.subjects, filters, SUBJECTS_PER_PAGE)
+                elif endpoint == "summary":
+                    content = build_summary(fake.assignments(level), fake.now)
+                elif endpoint == "assignments":
+                    content = fake._collection("assignments", fake.assignments(level), filters, ASSIGNMENTS_PER_PAGE)
+                else:
+                    return self._send(404, {"error": "Not found", "code": 404})
+                self._send(200, content)
+
+            def _send(self, status: int, content: dict) -> None:
+                body = ujson.dumps(content).encode("utf-8")
+                etag = f'W/"{hashlib.md5(body).hexdigest()}"'
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    status, body = 304, b""
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if status in (200, 304):
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+                fake._record(len(body))
+
+            def log_message(self, *_args) -> None:
+                pass
+
+        return Handler
@@ -54,6 +54,8 @@ setup(
     entry_points={
         'console_scripts': [
             'wanikani_notifier=wanikani_notifier.cli:cli',
+            'wanikani_notifier_batch=wanikani_notifier.batch:batch',
+            'wanikani_notifier_sync=wanikani_notifier.sync:sync',
         ],
     },
     install_requires=requirements,
@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+from wanikani_notifier import cache
+
+
+@pytest.fixture(autouse=True)
+def cache_folder(tmp_path, monkeypatch) -> str:
+    """
+    Keeps the caches of each test in its own temporary folder.
+    """
+    folder = os.path.join(tmp_path, "data")
+    monkeypatch.setenv(cache.CACHE_DIR_ENV_VAR, folder)
+    return folder
@@ -1,9 +1,17 @@
+import subprocess
+import sys
+import threading
+import time
 from abc import ABC, abstractmethod
 from typing import Any, Dict
+from unittest.mock import MagicMock
 
 import pytest
+from pytest_mock import MockerFixture
 
 from wanikani_notifier.notifiers.notifier import NoMessageProvided, Notifier, factory
+from wanikani_notifier.notifiers.notifier import NotificationTimeout, notify_all
+from wanikani_notifier.notifiers.notifier import NotifierFactory, UnknownNotifier, ENTRY_POINTS_GROUP, _entry_points
 
 
 class NotifierTester(ABC):
@@ -38,3 +46,161 @@ class NotifierTester(ABC):
 
     def test_notify_message_all_options(self, imp):
         imp.notify("title", "message", "url", "icon")
+
+
+@pytest.fixture
+def hanging_event() -> threading.Event:
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def mocked_notifier(mocker: MockerFixture, key: str, **notify_kwargs) -> MagicMock:
+    n = mocker.Mock(spec=Notifier)
+    n.key.return_value = key
+    n.notify = mocker.Mock(**notify_kwargs)
+    return n
+
+
+def test_notify_all_isolates_failures_and_timeouts(mocker, hanging_event):
+    notifiers = [
+        mocked_notifier(mocker, "hanging", side_effect=lambda **_: hanging_event.wait(5)),
+        mocked_notifier(mocker, "failing", side_effect=RuntimeError),
+        mocked_notifier(mocker, "working"),
+    ]
+
+    started_at = time.monotonic()
+    results = notify_all(notifiers, 0.2, title="title", message="message")
+
+    assert time.monotonic() - started_at < 1
+    assert [r.key for r in results] == ["hanging", "failing", "working"]
+    assert [r.succeeded for r in results] == [False, False, True]
+    assert isinstance(results[0].error, NotificationTimeout)
+    assert isinstance(results[1].error, RuntimeError)
+    for n in notifiers:
+        n.notify.assert_called_once_with(title="title", message="message", url=None, icon=None)
+
+
+def test_notify_all_runs_concurrently(mocker):
+    notifiers = [mocked_notifier(mocker, str(i), side_effect=lambda **_: time.sleep(0.2)) for i in range(5)]
+
+    started_at = time.monotonic()
+    results = notify_all(notifiers, 5, title="title", message="message")
+
+    assert time.monotonic() - started_at < 0.8
+    assert all(r.succeeded for r in results)
+
+
+def test_factory_imports_notifier_modules_lazily():
+    code = ("import sys; from wanikani_notifier import cli; "
+            "from wanikani_notifier.notifiers.notifier import factory; "
+            "assert 'chump' not in sys.modules and 'pushsafer' not in sys.modules; "
+            "factory.create('console'); "
+            "assert 'chump' not in sys.modules and 'pushsafer' not in sys.modules")
+
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_factory_builder_path(mocker):
+    builder = mocker.Mock()
+    mocker.patch("wanikani_notifier.notifiers.notifier.importlib.import_module",
+                 return_value=mocker.Mock(SomeNotifier=mocker.Mock(build=builder)))
+    notifier_factory = NotifierFactory()
+    notifier_factory.register_builder_path("some", "some_package.some_module:SomeNotifier.build")
+
+    assert notifier_factory.create("Some", token="__TOKEN__") is builder.return_value
+    builder.assert_called_once_with(token="__TOKEN__")
+
+
+def test_factory_entry_point(mocker):
+    entry_point = mocker.Mock()
+    entry_point.name = "thirdparty"
+    entry_points = mocker.patch("wanikani_notifier.notifiers.notifier._entry_points", return_value=[entry_point])
+
+    assert NotifierFactory().create("thirdparty") is entry_point.load.return_value.return_value
+    entry_points.assert_called_once_with(ENTRY_POINTS_GROUP)
+
+
+def test_factory_entry_point_not_accepting_session(mocker):
+    def build(token):
+        return ("thirdparty", token)
+
+    entry_point = mocker.Mock()
+    entry_point.name = "thirdparty"
+    entry_point.load.return_value = build
+    mocker.patch("wanikani_notifier.notifiers.notifier._entry_points", return_value=[entry_point])
+
+    assert NotifierFactory().create("thirdparty", token="__TOKEN__", session=mocker.Mock()) == ("thirdparty", "__TOKEN__")
+
+
+def test_entry_points_of_unknown_group():
+    assert list(_entry_points("__unknown_group__")) == []
+
+
+def test_factory_unknown_notifier(mocker):
+    mocker.patch("wanikani_notifier.notifiers.notifier._entry_points", return_value=[])
+
+    with pytest.raises(UnknownNotifier):
+        NotifierFactory().create("unknown")
+
+
+class BatchingNotifier(Notifier):
+    batches = []
+
+    @classmethod
+    def key(cls) -> str:
+        return "batching"
+
+    def notify(self, title, message, url=None, icon=None):
+        raise AssertionError("Notifiers of the same class must be notified together")
+
+    @classmethod
+    def notify_many(cls, notifiers, title, message, url=None, icon=None):
+        cls.batches.append(list(notifiers))
+        return [None, RuntimeError("__ERROR__")]
+
+
+def test_notify_all_batches_notifiers_of_the_same_class(mocker):
+    BatchingNotifier.batches.clear()
+    notifiers = [BatchingNotifier(), mocked_notifier(mocker, "working"), BatchingNotifier()]
+
+    results = notify_all(notifiers, 5, title="title", message="message")
+
+    assert BatchingNotifier.batches == [[notifiers[0], notifiers[2]]]
+    assert [r.key for r in results] == ["batching", "working", "batching"]
+    assert [r.succeeded for r in results] == [True, True, False]
+    assert isinstance(results[2].error, RuntimeError)
+
+
+def test_notify_many_sends_in_turn_by_default(mocker):
+    notifiers = [mocked_notifier(mocker, "failing", side_effect=RuntimeError), mocked_notifier(mocker, "working")]
+
+    errors = Notifier.notify_many(notifiers, title="title", message="message", url="url")
+
+    assert isinstance(errors[0], RuntimeError)
+    assert errors[1] is None
+    for n in notifiers:
+        n.notify.assert_called_once_with(title="title", message="message", url="url", icon=None)
+
+
+class HangingNotifier(Notifier):
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    @classmethod
+    def key(cls) -> str:
+        return "hanging"
+
+    def notify(self, title, message, url=None, icon=None):
+        self.event.wait(5)
+
+
+def test_notify_all_runs_notifiers_not_sending_many_concurrently(hanging_event):
+    working_event = threading.Event()
+    working_event.set()
+    notifiers = [HangingNotifier(hanging_event), HangingNotifier(working_event)]
+
+    results = notify_all(notifiers, 0.2, title="title", message="message")
+
+    assert [r.succeeded for r in results] == [False, True]
+    assert isinstance(results[0].error, NotificationTimeout)
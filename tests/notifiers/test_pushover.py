@@ -1,12 +1,14 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from unittest.mock import MagicMock
 
+import chump
 import pytest
+import requests
 from pytest_mock import MockerFixture
 
 from tests.notifiers.test_notifier import NotifierTester
-from wanikani_notifier.notifiers.notifier import Notifier
-from wanikani_notifier.notifiers.pushover import PushoverNotifier
+from wanikani_notifier.notifiers.notifier import Notifier, NoMessageProvided, notify_all
+from wanikani_notifier.notifiers.pushover import PUSHOVER_MAX_USERS_PER_MESSAGE, PushoverNotifier
 
 
 @pytest.fixture
@@ -42,3 +44,118 @@ class TestPushoverNotifier(NotifierTester):
     def test_notify_message_all_options(self, imp, mocked_pushover_send_message):
         super().test_notify_message_all_options(imp)
         mocked_pushover_send_message.assert_called()
+
+    def test_notify_message_not_sent(self, imp, mocked_pushover_send_message):
+        mocked_pushover_send_message.return_value.is_sent = False
+        mocked_pushover_send_message.return_value.error = RuntimeError("__ERROR__")
+
+        with pytest.raises(RuntimeError):
+            imp.notify(title="title", message="message")
+
+
+APP_TOKEN = "a" * 30
+USER_TOKEN = "u" * 30
+
+
+def test_notify_through_session(mocker: MockerFixture):
+    session = mocker.Mock()
+    session.post.return_value.status_code = 200
+    session.post.return_value.headers = {
+        "date": "Sat, 08 Jan 2022 12:00:00 GMT",
+        "X-Limit-App-Limit": "10000",
+        "X-Limit-App-Remaining": "9999",
+        "X-Limit-App-Reset": "1643673600",
+    }
+    session.post.return_value.json.return_value = {"status": 1, "request": "__REQUEST__"}
+
+    PushoverNotifier(APP_TOKEN, USER_TOKEN, session=session).notify("title", "message", "url")
+
+    session.post.assert_called_once()
+    assert session.post.call_args[0][0] == "https://api.pushover.net/1/messages.json"
+    assert session.post.call_args[1]["data"]["user"] == USER_TOKEN
+    assert session.post.call_args[1]["data"]["token"] == APP_TOKEN
+    assert session.post.call_args[1]["data"]["message"] == "message"
+
+
+def pushover_session(mocker: MockerFixture, status_code: int = 200, response: Optional[Dict[str, Any]] = None
+                     ) -> MagicMock:
+    session = mocker.Mock()
+    session.post.return_value.status_code = status_code
+    session.post.return_value.headers = {
+        "X-Limit-App-Limit": "10000",
+        "X-Limit-App-Remaining": "9999",
+        "X-Limit-App-Reset": "1643673600",
+    }
+    session.post.return_value.json.return_value = response or {"status": 1, "request": "__REQUEST__"}
+    return session
+
+
+def user_token(index: int) -> str:
+    return f"u{index:029d}"
+
+
+def test_notify_many_sends_one_request_per_app(mocker: MockerFixture):
+    session = pushover_session(mocker)
+    notifiers = [PushoverNotifier(APP_TOKEN, user_token(i), session=session) for i in range(3)]
+    notifiers.append(PushoverNotifier("b" * 30, user_token(3), session=session))
+
+    errors = PushoverNotifier.notify_many(notifiers, "title", "message", "url")
+
+    assert errors == [None] * 4
+    assert [(c[1]["data"]["token"], c[1]["data"]["user"]) for c in session.post.call_args_list] == [
+        (APP_TOKEN, ",".join(user_token(i) for i in range(3))),
+        ("b" * 30, user_token(3)),
+    ]
+    assert session.post.call_args[1]["data"]["url"] == "url"
+
+
+def test_notify_many_splits_users_in_batches(mocker: MockerFixture):
+    session = pushover_session(mocker)
+    notifiers = [PushoverNotifier(APP_TOKEN, user_token(i), session=session)
+                 for i in range(PUSHOVER_MAX_USERS_PER_MESSAGE + 1)]
+
+    PushoverNotifier.notify_many(notifiers, "title", "message")
+
+    assert [len(c[1]["data"]["user"].split(",")) for c in session.post.call_args_list] == [
+        PUSHOVER_MAX_USERS_PER_MESSAGE, 1
+    ]
+
+
+def test_notify_many_falls_back_to_each_user_on_invalid_user(mocker: MockerFixture):
+    session = pushover_session(mocker)
+    invalid_user = {"status": 0, "request": "__REQUEST__", "user": "invalid", "errors": ["user key is invalid"]}
+    session.post.side_effect = [
+        mocker.Mock(status_code=400, headers={}, json=mocker.Mock(return_value=invalid_user)),
+        mocker.Mock(status_code=400, headers={}, json=mocker.Mock(return_value=invalid_user)),
+        session.post.return_value,
+    ]
+    notifiers = [PushoverNotifier(APP_TOKEN, user_token(i), session=session) for i in range(2)]
+
+    errors = PushoverNotifier.notify_many(notifiers, "title", "message")
+
+    assert isinstance(errors[0], chump.APIError)
+    assert errors[1] is None
+    assert [c[1]["data"]["user"] for c in session.post.call_args_list] == [
+        f"{user_token(0)},{user_token(1)}", user_token(0), user_token(1)
+    ]
+
+
+def test_notify_many_no_message():
+    notifiers = [PushoverNotifier(APP_TOKEN, USER_TOKEN, session=requests.Session())]
+
+    errors = PushoverNotifier.notify_many(notifiers, "title", "")
+
+    assert isinstance(errors[0], NoMessageProvided)
+
+
+def test_notify_all_batches_users_per_app(mocker: MockerFixture):
+    session = pushover_session(mocker)
+    notifiers = [PushoverNotifier(APP_TOKEN, user_token(i), session=session) for i in range(2)]
+    notifiers.append(PushoverNotifier("b" * 30, user_token(2), session=session))
+
+    results = notify_all(notifiers, 5, title="title", message="message")
+
+    assert all(r.succeeded for r in results)
+    assert sorted(c[1]["data"]["user"] for c in session.post.call_args_list) == [
+        f"{user_token(0)},{user_token(1)}", user_token(2)
+    ]
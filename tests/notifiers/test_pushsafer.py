@@ -1,6 +1,7 @@
 from typing import Dict, Any
 from unittest.mock import MagicMock
 
+import pushsafer
 import pytest
 from pytest_mock import MockerFixture
 
@@ -41,3 +42,21 @@ class TestPushSaferNotifier(NotifierTester):
     def test_notify_message_all_options(self, imp, mocked_pushsafer_send_message):
         super().test_notify_message_all_options(imp)
         mocked_pushsafer_send_message.assert_called()
+
+
+def test_notify_through_session(mocker: MockerFixture):
+    session = mocker.Mock()
+    session.post.return_value.status_code = 200
+
+    PushSaferNotifier("__TOKEN__", session=session).notify("title", "message", "url")
+
+    session.post.assert_called_once()
+    assert session.post.call_args[1]["data"] == {"m": "message", "t": "title", "u": "url", "k": "__TOKEN__"}
+
+
+def test_notify_through_session_failure(mocker: MockerFixture):
+    session = mocker.Mock()
+    session.post.return_value.status_code = 400
+
+    with pytest.raises(pushsafer.MessageSendError):
+        PushSaferNotifier("__TOKEN__", session=session).notify("title", "message")
@@ -0,0 +1,99 @@
+import json
+from unittest.mock import MagicMock
+
+import click
+import pytest
+from click.testing import CliRunner
+from pytest_mock import MockerFixture
+
+from wanikani_notifier.batch import batch, load_accounts
+
+
+@pytest.fixture
+def mocked_wk_client(mocker: MockerFixture) -> MagicMock:
+    return mocker.patch("wanikani_notifier.batch.build_client")
+
+
+@pytest.fixture
+def mocked_get_all_subjects(mocker: MockerFixture) -> MagicMock:
+    return mocker.patch("wanikani_notifier.batch.get_all_subjects")
+
+
+@pytest.fixture
+def mocked_notifier_creator(mocker: MockerFixture) -> MagicMock:
+    return mocker.patch("wanikani_notifier.notifiers.notifier.factory.create")
+
+
+@pytest.fixture
+def mocked_all_available_assignments(mocker: MockerFixture) -> MagicMock:
+    mocked = mocker.patch("wanikani_notifier.cli.all_available_assignments")
+    mocked.return_value = "__MESSAGE__"
+    return mocked
+
+
+def write_config(tmp_path, accounts) -> str:
+    config_path = tmp_path / "accounts.json"
+    config_path.write_text(json.dumps({"accounts": accounts}))
+    return str(config_path)
+
+
+def test_load_accounts():
+    accounts = load_accounts({"accounts": [
+        {"name": "someone", "wanikani": "__TOKEN__", "chain": "available_assignments_now --since 1"},
+        {"wanikani": "__TOKEN__", "chain": ["all_available_assignments"], "notify": {"console": True},
+         "stop_if_empty": False, "notify_changes_only": True, "min_increase": 5},
+    ]})
+
+    assert [a.name for a in accounts] == ["someone", "1"]
+    assert [len(a.processors) for a in accounts] == [1, 2]
+    assert [a.stop_if_empty for a in accounts] == [True, False]
+    assert [(a.notify_changes_only, a.min_increase) for a in accounts] == [(False, 1), (True, 5)]
+
+
+def test_load_accounts_invalid_chain():
+    with pytest.raises(click.UsageError):
+        load_accounts({"accounts": [{"wanikani": "__TOKEN__", "chain": "unknown_command"}]})
+
+
+def test_batch_syncs_subjects_once(tmp_path, mocked_wk_client, mocked_get_all_subjects,
+                                   mocked_notifier_creator, mocked_all_available_assignments):
+    config_path = write_config(tmp_path, [
+        {"wanikani": f"__TOKEN_{i}__", "chain": "all_available_assignments", "notify": {"console": True}}
+        for i in range(5)
+    ])
+
+    result = CliRunner().invoke(batch, [config_path, "--workers", "2"])
+
+    assert result.exit_code == 0
+    mocked_get_all_subjects.assert_called_once()
+    assert mocked_all_available_assignments.call_count == 5
+    assert mocked_notifier_creator.call_count == 5
+    assert mocked_notifier_creator.return_value.notify.call_count == 5
+
+
+def test_batch_notifies_several_pushover_users(tmp_path, mocked_wk_client, mocked_get_all_subjects,
+                                               mocked_notifier_creator, mocked_all_available_assignments):
+    config_path = write_config(tmp_path, [
+        {"wanikani": "__TOKEN__", "chain": "all_available_assignments",
+         "notify": {"pushover": [["__APP_TOKEN__", "__USER_1__"], ["__APP_TOKEN__", "__USER_2__"]]}},
+    ])
+
+    result = CliRunner().invoke(batch, [config_path])
+
+    assert result.exit_code == 0
+    assert [c[1]["user_token"] for c in mocked_notifier_creator.call_args_list] == ["__USER_1__", "__USER_2__"]
+
+
+def test_batch_reports_failed_accounts(tmp_path, mocked_wk_client, mocked_get_all_subjects,
+                                       mocked_all_available_assignments):
+    mocked_all_available_assignments.side_effect = [RuntimeError, "__MESSAGE__"]
+    config_path = write_config(tmp_path, [
+        {"name": "failing", "wanikani": "__TOKEN__", "chain": "all_available_assignments"},
+        {"name": "working", "wanikani": "__TOKEN__", "chain": "all_available_assignments"},
+    ])
+
+    result = CliRunner().invoke(batch, [config_path, "--workers", "1"])
+
+    assert result.exit_code == 1
+    assert "1 out of 2 accounts failed: failing" in result.output
+    assert mocked_all_available_assignments.call_count == 2
@@ -0,0 +1,126 @@
+import os
+import time
+
+import pytest
+from pytest_mock import MockerFixture
+
+from wanikani_notifier import cache
+from wanikani_notifier.cache import ConditionalRequestsCache, CONDITIONAL_REQUESTS_RETENTION
+
+
+def test_versioned_round_trip(cache_folder):
+    path = cache.cache_path("content.json.gz")
+
+    cache.dump_versioned(path, 3, {"some": ["content"]})
+
+    assert cache.load_versioned(path, 3) == {"some": ["content"]}
+    assert cache.load_versioned(path, 4) is None
+
+
+def test_dump_versioned_streams_iterators(cache_folder):
+    path = cache.cache_path("content.json.gz")
+
+    cache.dump_versioned(path, 1, {"at": 1.5, "records": iter([(1, "a"), (2, "b")]), "empty": iter([])})
+
+    assert cache.load_versioned(path, 1) == {"at": 1.5, "records": [[1, "a"], [2, "b"]], "empty": []}
+
+
+def test_dump_versioned_failure_keeps_previous_file(cache_folder):
+    path = cache.cache_path("content.json.gz")
+    cache.dump_versioned(path, 1, ["previous"])
+
+    def failing_records():
+        yield "partial"
+        raise RuntimeError()
+
+    with pytest.raises(RuntimeError):
+        cache.dump_versioned(path, 1, failing_records())
+
+    assert cache.load_versioned(path, 1) == ["previous"]
+    assert os.listdir(cache_folder) == ["content.json.gz"]
+
+
+def test_load_versioned_missing_or_corrupted(cache_folder):
+    path = cache.cache_path("content.json.gz")
+    assert cache.load_versioned(path, 1) is None
+
+    with open(path, "w") as corrupted:
+        corrupted.write("not gzip")
+
+    assert cache.load_versioned(path, 1) is None
+
+
+def test_cache_folder_precedence(tmp_path, monkeypatch):
+    monkeypatch.delenv(cache.CACHE_DIR_ENV_VAR, raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    monkeypatch.setattr(cache, "_configured_cache_folder", None)
+    assert cache.cache_folder() == os.path.join(tmp_path, "xdg", cache.CACHE_FOLDER_NAME)
+
+    monkeypatch.setenv(cache.CACHE_DIR_ENV_VAR, str(tmp_path / "env"))
+    assert cache.cache_folder() == str(tmp_path / "env")
+
+    cache.set_cache_folder(str(tmp_path / "option"))
+    assert cache.cache_path("content.json.gz") == os.path.join(tmp_path, "option", "content.json.gz")
+    assert os.path.isdir(tmp_path / "option")
+
+
+def test_token_digest_hides_token():
+    assert "__TOKEN__" not in cache.token_digest("__TOKEN__")
+    assert cache.token_digest("__TOKEN__") != cache.token_digest("__OTHER_TOKEN__")
+
+
+def test_conditional_requests_persisted(cache_folder):
+    ConditionalRequestsCache.for_token("__TOKEN__").put("url", "etag", None, {"data": 1})
+
+    assert ConditionalRequestsCache.for_token("__TOKEN__").get("url") == {
+        "etag": "etag", "last_modified": None, "content": {"data": 1}, "stored_at": pytest.approx(time.time(), abs=5)
+    }
+    assert ConditionalRequestsCache.for_token("__OTHER_TOKEN__").get("url") is None
+
+
+def test_conditional_requests_outdated_entries_dropped(cache_folder, mocker: MockerFixture):
+    conditional_requests = ConditionalRequestsCache.for_token("__TOKEN__")
+    conditional_requests.put("old_url", "etag", None, {})
+    mocked_time = mocker.patch("wanikani_notifier.cache.time")
+    mocked_time.time.return_value = time.time() + CONDITIONAL_REQUESTS_RETENTION.total_seconds() + 1
+
+    conditional_requests.put("new_url", "etag", None, {})
+
+    assert conditional_requests.get("old_url") is None
+    assert conditional_requests.get("new_url") is not None
+
+
+def test_conditional_requests_same_response_not_written_again(cache_folder, mocker: MockerFixture):
+    conditional_requests = ConditionalRequestsCache.for_token("__TOKEN__")
+    conditional_requests.put("url", "etag", None, {"data": 1})
+    dump_versioned = mocker.spy(cache, "dump_versioned")
+
+    conditional_requests.put("url", "etag", None, {"data": 1})
+
+    dump_versioned.assert_not_called()
+
+
+def test_conditional_requests_keep_responses_stored_by_other_processes(cache_folder):
+    conditional_requests = ConditionalRequestsCache.for_token("__TOKEN__")
+    other_conditional_requests = ConditionalRequestsCache.for_token("__TOKEN__")
+    conditional_requests.get("url")
+    other_conditional_requests.get("url")
+
+    conditional_requests.put("url", "etag", None, {"data": 1})
+    other_conditional_requests.put("other_url", "etag", None, {"data": 2})
+
+    reloaded = ConditionalRequestsCache.for_token("__TOKEN__")
+    assert reloaded.get("url")["content"] == {"data": 1}
+    assert reloaded.get("other_url")["content"] == {"data": 2}
+
+
+def test_legacy_cache_path(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "workdir" / cache.LEGACY_CACHE_FOLDER)
+    monkeypatch.chdir(tmp_path / "workdir")
+    open(os.path.join(cache.LEGACY_CACHE_FOLDER, "file"), "w").close()
+
+    assert cache.legacy_cache_path("file") == os.path.join(cache.LEGACY_CACHE_FOLDER, "file")
+    assert cache.legacy_cache_path("other_file") is None
+
+    monkeypatch.setenv(cache.CACHE_DIR_ENV_VAR, cache.LEGACY_CACHE_FOLDER)
+    assert cache.legacy_cache_path("file") is None
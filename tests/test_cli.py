@@ -1,12 +1,25 @@
+import json
+import os
+import pstats
+import time
+from datetime import datetime, timedelta
 from typing import Tuple
 from unittest.mock import MagicMock
 
 import pytest
 from click.testing import CliRunner
+import pytz
 from pytest_mock import MockerFixture
+from wanikani_api.models import Summary
 
+from wanikani_notifier import cache
 from wanikani_notifier.cli import cli
-from wanikani_notifier.cli import notify, available_assignments_now, all_available_assignments
+from wanikani_notifier.cli import notify, available_assignments_now, all_available_assignments, forecast, windows
+from wanikani_notifier.cli import Context, next_evaluation_delay, deliver, next_run, format_next_run
+from wanikani_notifier.notifiers.notifier import Notifier
+from wanikani_notifier.outbox import Outbox
+from wanikani_notifier.state import NotificationState
+from wanikani_notifier.store import STORE_FILENAME
 from wanikani_notifier.wanikani import AvailableAssignments
 
 
@@ -17,7 +30,20 @@ from wanikani_notifier.wanikani import AvailableAssignments
 
 @pytest.fixture
 def mocked_wk_client(mocker: MockerFixture) -> MagicMock:
-    return mocker.patch("wanikani_notifier.cli.WaniKaniClient")
+    mocked = mocker.patch("wanikani_notifier.cli.build_client")
+    mocked.return_value.v2_api_key = "__TOKEN__"
+    mocked.return_value.summary.return_value = empty_summary()
+    return mocked
+
+
+def empty_summary() -> Summary:
+    current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    return Summary({"object": "report", "url": "/summary", "data_updated_at": current_hour.isoformat(), "data": {
+        "lessons": [{"available_at": current_hour.isoformat(), "subject_ids": []}],
+        "next_reviews_at": None,
+        "reviews": [{"available_at": (current_hour + timedelta(hours=hours)).isoformat(), "subject_ids": []}
+                    for hours in range(25)],
+    }})
 
 
 @pytest.fixture
@@ -80,6 +106,53 @@ class TestCli:
 
         assert result.exit_code == 0
 
+    def test_cli_sqlite_store(self, mocked_wk_client):
+        mocked_wk_client.return_value.subjects.return_value = []
+        mocked_wk_client.return_value.assignments.return_value = []
+        mocked_wk_client.return_value.user_information.return_value.level = 1
+        runner = CliRunner()
+        result = runner.invoke(cli, "--wanikani __TOKEN__ --store sqlite --no-summary "
+                                    "available_assignments_now all_available_assignments")
+
+        assert result.exit_code == 0
+        mocked_wk_client.return_value.assignments.assert_called_once()
+
+    def test_cli_chained_commands_fetch_assignments_once(self, mocked_wk_client, mocked_get_all_subjects):
+        mocked_wk_client.return_value.assignments.return_value = []
+        runner = CliRunner()
+        result = runner.invoke(cli, "--wanikani __TOKEN__ --no-summary available_assignments_now all_available_assignments")
+
+        assert result.exit_code == 0
+        mocked_wk_client.return_value.assignments.assert_called_once()
+        mocked_wk_client.return_value.user_information.assert_called_once()
+
+    def test_cli_windows_fetch_assignments_once(self, mocked_wk_client, mocked_get_all_subjects):
+        mocked_wk_client.return_value.assignments.return_value = []
+        runner = CliRunner()
+        result = runner.invoke(cli, "--wanikani __TOKEN__ --no-summary windows --hours 1 --hours 6 --hours 24")
+
+        assert result.exit_code == 0
+        mocked_wk_client.return_value.assignments.assert_called_once()
+
+    def test_cli_next_run(self, mocker, mocked_wk_client, mocked_get_all_subjects, mocked_all_available_assignments):
+        mocked_all_available_assignments.return_value = None
+        mocker.patch("wanikani_notifier.cli.next_run", return_value=datetime(year=2022, month=1, day=10, hour=13))
+        runner = CliRunner()
+        result = runner.invoke(cli, "--wanikani __TOKEN__ all_available_assignments next_run --format systemd")
+
+        assert result.exit_code == 0
+        assert result.stdout == "2022-01-10 13:00:00 UTC\n"
+
+    def test_cli_counts_from_summary(self, mocked_wk_client, mocked_get_all_subjects):
+        mocked_wk_client.return_value.assignments.return_value = []
+        runner = CliRunner()
+        result = runner.invoke(cli, "--wanikani __TOKEN__ available_assignments_now all_available_assignments")
+
+        assert result.exit_code == 0
+        mocked_wk_client.return_value.summary.assert_called_once()
+        mocked_wk_client.return_value.assignments.assert_not_called()
+        mocked_wk_client.return_value.user_information.assert_not_called()
+
     def test_cli_notify_no_notifiers(self, mocked_get_all_subjects, mocked_notifier_creator):
         runner = CliRunner()
         result = runner.invoke(cli, "--wanikani __TOKEN__ notify")
@@ -87,11 +160,14 @@ class TestCli:
         assert result.exit_code == 0
         mocked_notifier_creator.assert_not_called()
 
-    def test_cli_notify_all_notifiers(self, mocked_get_all_subjects, mocked_notifier_creator):
+    def test_cli_notify_all_notifiers(self, mocked_get_all_subjects, mocked_notifier_creator,
+                                      mocked_all_available_assignments):
+        mocked_all_available_assignments.return_value = "__MESSAGE__"
         runner = CliRunner()
         result = runner.invoke(cli,
                                """
                                --wanikani __TOKEN__
+                               all_available_assignments
                                notify --pushsafer __TOKEN__ --pushover __APP_TOKEN__ __USER_TOKEN__ --console
                                """
                                )
@@ -99,6 +175,68 @@ class TestCli:
         assert result.exit_code == 0
         assert mocked_notifier_creator.call_count == 3
 
+    def test_cli_notify_nothing_to_notify_creates_no_notifiers(self, mocked_get_all_subjects, mocked_notifier_creator,
+                                                               mocked_all_available_assignments):
+        mocked_all_available_assignments.return_value = None
+        runner = CliRunner()
+        result = runner.invoke(cli, "--wanikani __TOKEN__ all_available_assignments notify --pushsafer __TOKEN__")
+
+        assert result.exit_code == 0
+        mocked_notifier_creator.assert_not_called()
+
+    def test_cli_cache_dir(self, tmp_path, monkeypatch, mocked_wk_client, mocked_get_all_subjects,
+                           mocked_all_available_assignments):
+        monkeypatch.setattr(cache, "_configured_cache_folder", None)
+        mocked_all_available_assignments.return_value = None
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--wanikani", "__TOKEN__", "--cache-dir", str(tmp_path / "shared"), "--store", "sqlite",
+                                     "all_available_assignments"])
+
+        assert result.exit_code == 0
+        assert os.path.exists(tmp_path / "shared" / STORE_FILENAME)
+
+    def test_cli_metrics_and_profile(self, tmp_path, mocked_wk_client, mocked_get_all_subjects,
+                                     mocked_all_available_assignments):
+        mocked_all_available_assignments.return_value = None
+        metrics_path = tmp_path / "metrics.json"
+        profile_path = tmp_path / "run.prof"
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--wanikani", "__TOKEN__", "--metrics", str(metrics_path), "--profile", str(profile_path),
+                                     "all_available_assignments"])
+
+        assert result.exit_code == 0
+        with open(metrics_path) as metrics_file:
+            stages = json.load(metrics_file)["stages"]
+        assert stages["command.cli_all_available_assignments"]["calls"] == 1
+        assert pstats.Stats(str(profile_path)).total_calls > 0
+
+    def test_cli_daemon_keeps_notifiers_and_subjects(self, mocker, mocked_wk_client, mocked_get_all_subjects,
+                                                     mocked_notifier_creator, mocked_all_available_assignments):
+        mocked_sleep = mocker.patch("wanikani_notifier.cli.time.sleep", side_effect=[None, KeyboardInterrupt])
+        mocker.patch("wanikani_notifier.cli.next_evaluation_delay", return_value=timedelta(minutes=5))
+        mocked_all_available_assignments.return_value = "__MESSAGE__"
+        runner = CliRunner()
+        result = runner.invoke(cli, "--wanikani __TOKEN__ --daemon all_available_assignments notify --console")
+
+        assert result.exit_code == 0
+        assert mocked_sleep.call_count == 2
+        mocked_sleep.assert_called_with(300)
+        assert mocked_all_available_assignments.call_count == 2
+        mocked_get_all_subjects.assert_called_once()
+        mocked_notifier_creator.assert_called_once()
+        assert mocked_notifier_creator.return_value.notify.call_count == 2
+
+    def test_cli_daemon_survives_failures(self, mocker, mocked_wk_client, mocked_get_all_subjects,
+                                          mocked_all_available_assignments):
+        mocked_sleep = mocker.patch("wanikani_notifier.cli.time.sleep", side_effect=[None, KeyboardInterrupt])
+        mocked_all_available_assignments.side_effect = [RuntimeError, None]
+        runner = CliRunner()
+        result = runner.invoke(cli, "--wanikani __TOKEN__ --daemon --min-interval 2 all_available_assignments")
+
+        assert result.exit_code == 0
+        assert mocked_sleep.call_args_list[0] == mocker.call(120)
+        assert mocked_all_available_assignments.call_count == 2
+
 
 ###################
 #  CLI use cases  #
@@ -143,9 +281,10 @@ class TestUseCases:
         result = runner.invoke(cli, notify_new_and_all_use_case[0])
 
         assert result.exit_code == 0
-        assert mocked_notifier_creator.call_count == 1
+        assert mocked_notifier_creator.call_count == (1 if expect_notify else 0)
         assert mocked_available_assignments_now.call_count == 1
-        assert mocked_all_available_assignments.call_count == 1
+        assert mocked_all_available_assignments.call_count == (0 if notify_new_and_all_use_case[1] and not now_available
+                                                               else 1)
         assert mocked_notifier_creator.return_value.notify.call_count == (1 if expect_notify else 0)
 
 
@@ -210,6 +349,185 @@ class TestCommands:
 
         assert message == expected_message
 
+    @pytest.mark.parametrize("total, counts, expected_message", [
+        pytest.param(True, [AvailableAssignments(2, 0), AvailableAssignments(5, 1), AvailableAssignments(9, 3)],
+                     "Available assignments: 2 reviews in the last 1h; 1 lessons and 5 reviews in the last 6h; "
+                     "3 lessons and 9 reviews in total",
+                     id="all_windows"),
+        pytest.param(False, [AvailableAssignments(0, 0), AvailableAssignments(5, 0)],
+                     "Available assignments: 5 reviews in the last 6h",
+                     id="empty_window_left_out"),
+        pytest.param(False, [AvailableAssignments(0, 0), AvailableAssignments(0, 0)], None, id="none"),
+    ])
+    def test_windows(self, mocked_get_available_assignments, total, counts, expected_message):
+        mocked_get_available_assignments.side_effect = counts
+        message = windows(None, {}, hours=[1, 6], total=total)
+
+        assert message == expected_message
+        assert mocked_get_available_assignments.call_args_list[0][1]["end"] - \
+            mocked_get_available_assignments.call_args_list[0][1]["start"] == timedelta(hours=1, seconds=-1)
+
+    @pytest.mark.parametrize("next_notification_in, expected_next_run_in", [
+        (timedelta(minutes=20), timedelta(minutes=20)),
+        (timedelta(hours=2), timedelta(hours=1)),
+        (None, timedelta(hours=1)),
+    ])
+    def test_next_run(self, mocker, next_notification_in, expected_next_run_in):
+        now = datetime.utcnow()
+        mocker.patch("wanikani_notifier.cli.datetime", wraps=datetime, utcnow=lambda: now)
+        mocked_get_next_notification_time = mocker.patch("wanikani_notifier.cli.get_next_notification_time",
+                                                         return_value=now + next_notification_in
+                                                         if next_notification_in else None)
+
+        assert next_run(None, {}, since=6, min_assignments=10, max_delay=timedelta(hours=1)) == now + expected_next_run_in
+        assert mocked_get_next_notification_time.call_args[1]["since"] == timedelta(hours=6)
+        assert mocked_get_next_notification_time.call_args[1]["min_assignments"] == 10
+
+    @pytest.mark.parametrize("output_format, expected", [
+        ("iso", "2022-01-10T13:00:05+00:00"),
+        ("epoch", "1641819605"),
+        ("systemd", "2022-01-10 13:00:05 UTC"),
+    ])
+    def test_format_next_run(self, output_format, expected):
+        assert format_next_run(datetime(year=2022, month=1, day=10, hour=13, second=5, microsecond=10), output_format) \
+            == expected
+
+    def test_format_next_run_at_local_time(self, monkeypatch):
+        monkeypatch.setenv("TZ", "Europe/Paris")
+        time.tzset()
+        try:
+            assert format_next_run(datetime(year=2022, month=1, day=10, hour=13), "at") == "202201101400.00"
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+    @pytest.mark.parametrize("days,counts,expected_message",
+                             [
+                                 pytest.param(None, [0, 12, 0, 0, 40] + [0] * 19,
+                                              "Upcoming reviews in the next 24h: 12 at 15:00, 40 at 18:00",
+                                              id="hourly"),
+                                 pytest.param(3, [5, 0, 7],
+                                              "Upcoming reviews in the next 3 days: 5 on Mon 10, 7 on Wed 12",
+                                              id="daily"),
+                                 pytest.param(None, [0] * 24, None, id="none"),
+                             ]
+                             )
+    def test_forecast(self, mocker, days, counts, expected_message):
+        mocked_datetime = mocker.patch("wanikani_notifier.cli.datetime")
+        mocked_datetime.utcnow.return_value = datetime(year=2022, month=1, day=10, hour=13, minute=20)
+        mocked_get_review_forecast = mocker.patch("wanikani_notifier.cli.get_review_forecast", return_value=counts)
+
+        message = forecast(None, {}, hours=24, days=days, timezone=pytz.timezone("Europe/Paris"))
+
+        assert message == expected_message
+        expected_start = datetime(2022, 1, 9, 23) if days else datetime(2022, 1, 10, 13)
+        assert mocked_get_review_forecast.call_args[1]["boundaries"][0] == pytz.utc.localize(expected_start)
+
+    def test_forecast_days_across_daylight_saving_time_change(self, mocker):
+        mocked_datetime = mocker.patch("wanikani_notifier.cli.datetime")
+        mocked_datetime.utcnow.return_value = datetime(year=2026, month=10, day=23, hour=13)
+        mocked_get_review_forecast = mocker.patch("wanikani_notifier.cli.get_review_forecast", return_value=[1] * 5)
+
+        message = forecast(None, {}, hours=24, days=5, timezone=pytz.timezone("Europe/Paris"))
+
+        assert message == "Upcoming reviews in the next 5 days: 1 on Fri 23, 1 on Sat 24, 1 on Sun 25, 1 on Mon 26, " \
+                          "1 on Tue 27"
+        boundaries = mocked_get_review_forecast.call_args[1]["boundaries"]
+        assert [b.astimezone(pytz.utc).replace(tzinfo=None) for b in boundaries] == [
+            datetime(2026, 10, 22, 22), datetime(2026, 10, 23, 22), datetime(2026, 10, 24, 22),
+            datetime(2026, 10, 25, 23), datetime(2026, 10, 26, 23), datetime(2026, 10, 27, 23),
+        ]
+
+    def test_available_assignments_notify_changes_only(self, mocked_get_available_assignments):
+        state = NotificationState.for_token("__TOKEN__")
+        messages = []
+        for assignments in [AvailableAssignments(3, 0), AvailableAssignments(3, 0), AvailableAssignments(0, 0),
+                            AvailableAssignments(3, 0), AvailableAssignments(5, 0)]:
+            mocked_get_available_assignments.return_value = assignments
+            messages.append(all_available_assignments(None, {}, state))
+            state.commit()
+
+        assert messages == ["In total, there are 3 reviews to do.", None, None,
+                            "In total, there are 3 reviews to do.", "In total, there are 5 reviews to do."]
+
+    def test_cli_notify_changes_only_persisted(self, mocked_wk_client, mocked_get_all_subjects,
+                                               mocked_all_available_assignments, mocked_notifier_creator, mocker):
+        mocker.patch("wanikani_notifier.cli.get_available_assignments", return_value=AvailableAssignments(3, 0))
+        mocked_all_available_assignments.side_effect = all_available_assignments
+        runner = CliRunner()
+        args = "--wanikani __TOKEN__ --notify-changes-only all_available_assignments notify --console"
+
+        assert runner.invoke(cli, args).exit_code == 0
+        assert runner.invoke(cli, args).exit_code == 0
+
+        assert mocked_notifier_creator.return_value.notify.call_count == 1
+
+    def test_cli_notify_changes_only_after_failure(self, mocked_wk_client, mocked_get_all_subjects,
+                                                   mocked_all_available_assignments, mocked_notifier_creator, mocker):
+        mocker.patch("wanikani_notifier.cli.get_available_assignments", return_value=AvailableAssignments(3, 0))
+        mocked_all_available_assignments.side_effect = all_available_assignments
+        mocked_notifier_creator.return_value.notify.side_effect = [RuntimeError("down"), None]
+        runner = CliRunner()
+        args = "--wanikani __TOKEN__ --notify-changes-only all_available_assignments notify --console"
+
+        assert runner.invoke(cli, args).exit_code == 0
+        assert runner.invoke(cli, args).exit_code == 0
+
+        assert mocked_notifier_creator.return_value.notify.call_count == 2
+
+    def test_cli_notify_changes_only_chain_stopped(self, mocked_wk_client, mocked_get_all_subjects,
+                                                   mocked_all_available_assignments, mocked_notifier_creator, mocker):
+        mocked_get_available_assignments = mocker.patch("wanikani_notifier.cli.get_available_assignments",
+                                                        side_effect=[AvailableAssignments(3, 0),
+                                                                     AvailableAssignments(0, 0),
+                                                                     AvailableAssignments(3, 0),
+                                                                     AvailableAssignments(2, 0)])
+        mocked_all_available_assignments.side_effect = all_available_assignments
+        runner = CliRunner()
+        args = "--wanikani __TOKEN__ --stop-if-empty --notify-changes-only all_available_assignments " \
+               "available_assignments_now --since 1 notify --console"
+
+        assert runner.invoke(cli, args).exit_code == 0
+        assert runner.invoke(cli, args).exit_code == 0
+
+        assert mocked_get_available_assignments.call_count == 4
+        mocked_notifier_creator.return_value.notify.assert_called_once_with(
+            title=mocker.ANY, message="In total, there are 3 reviews to do.\n2 reviews are now available!", url=mocker.ANY,
+            icon=None)
+
+    def test_cli_notify_changes_only_windows_not_deduplicated(self, mocked_wk_client, mocked_get_all_subjects,
+                                                              mocked_notifier_creator, mocker):
+        mocker.patch("wanikani_notifier.cli.get_available_assignments", return_value=AvailableAssignments(5, 0))
+        runner = CliRunner()
+
+        for args in ["available_assignments_now --since 1", "windows --hours 1 --no-total"] * 2:
+            assert runner.invoke(cli, f"--wanikani __TOKEN__ --notify-changes-only {args} notify --console").exit_code == 0
+
+        assert mocked_notifier_creator.return_value.notify.call_count == 4
+
+    def test_cli_forecast_unknown_timezone(self, mocked_wk_client, mocked_get_all_subjects):
+        result = CliRunner().invoke(cli, "--wanikani __TOKEN__ forecast --timezone Nowhere/Special")
+
+        assert result.exit_code == 2
+
+    @pytest.mark.parametrize("next_available_in,expected_delay",
+                             [
+                                 pytest.param(None, timedelta(hours=1), id="nothing_scheduled"),
+                                 pytest.param(timedelta(seconds=10), timedelta(minutes=1), id="close"),
+                                 pytest.param(timedelta(minutes=20), timedelta(minutes=20), id="within_bounds"),
+                                 pytest.param(timedelta(hours=5), timedelta(hours=1), id="far"),
+                             ]
+                             )
+    def test_next_evaluation_delay(self, mocker, next_available_in, expected_delay):
+        mocked_datetime = mocker.patch("wanikani_notifier.cli.datetime")
+        mocked_datetime.utcnow.return_value = datetime(year=2022, month=1, day=1)
+        mocker.patch("wanikani_notifier.cli.get_next_available_time",
+                     return_value=(datetime(year=2022, month=1, day=1) + next_available_in if next_available_in else None))
+
+        delay = next_evaluation_delay(Context(None, {}, None, {}, None, True), timedelta(minutes=1), timedelta(hours=1))
+
+        assert delay == expected_delay
+
     def test_notify_no_notifiers_no_messages(self, mocked_notifier_creator):
         notify("", [])
 
@@ -235,3 +553,46 @@ class TestCommands:
 
         assert mocked_notifier_creator.call_count == 3
         assert mocked_notifier_creator.return_value.notify.call_count == 3
+
+    def test_deliver_retries_failed_notifications_on_later_runs(self, mocked_notifier_creator, mocker):
+        failing, working = mocker.Mock(spec=Notifier), mocker.Mock(spec=Notifier)
+        failing.key.return_value, working.key.return_value = "failing", "working"
+        failing.notify.side_effect = RuntimeError
+        mocked_notifier_creator.side_effect = lambda key, **kwargs: {"pushsafer": failing, "console": working}[key]
+        notifiers_parameters = [("pushsafer", {"private_key": "__KEY__"}), ("console", {})]
+        context = Context(None, {}, None, {}, None, True, outbox=Outbox.for_token("__TOKEN__"))
+
+        first_results = deliver(context, "some message", notifiers_parameters)
+        mocker.patch("wanikani_notifier.outbox.time.time", return_value=time.time() + 3600)
+        failing.notify.side_effect = None
+        retry_results = deliver(context._replace(outbox=Outbox.for_token("__TOKEN__")), "", notifiers_parameters)
+
+        assert [(r.key, r.succeeded) for r in first_results] == [("failing", False), ("working", True)]
+        assert [(r.key, r.succeeded) for r in retry_results] == [("failing", True)]
+        assert working.notify.call_count == 1
+        assert Outbox.for_token("__TOKEN__").pending() == []
+
+    def test_deliver_newer_message_replaces_pending_one(self, mocked_notifier_creator, mocker):
+        failing = mocker.Mock(spec=Notifier)
+        failing.key.return_value = "failing"
+        failing.notify.side_effect = RuntimeError
+        mocked_notifier_creator.return_value = failing
+        notifiers_parameters = [("console", {})]
+        context = Context(None, {}, None, {}, None, True, outbox=Outbox.for_token("__TOKEN__"))
+        deliver(context, "first message", notifiers_parameters)
+        mocker.patch("wanikani_notifier.outbox.time.time", return_value=time.time() + 3600)
+
+        deliver(context, "second message", notifiers_parameters)
+
+        assert [c[1]["message"] for c in failing.notify.call_args_list] == ["first message", "second message"]
+        assert [d.message for d in context.outbox.pending()] == ["second message"]
+
+    def test_notify_failing_notifier_does_not_block_others(self, mocker):
+        failing = mocker.Mock(spec=Notifier)
+        failing.notify.side_effect = RuntimeError
+        working = mocker.Mock(spec=Notifier)
+
+        results = notify("some message", [failing, working])
+
+        assert [r.succeeded for r in results] == [False, True]
+        working.notify.assert_called_once()
@@ -0,0 +1,159 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+from requests import HTTPError
+from wanikani_api.exceptions import InvalidWanikaniApiKeyException
+
+from wanikani_notifier.cache import ConditionalRequestsCache
+from wanikani_notifier.client import WaniKaniClient, build_client
+from wanikani_notifier.ratelimit import TokenBucket, SharedTokenBucket
+
+USER_JSON = {
+    "object": "user",
+    "url": "https://api.wanikani.com/v2/user",
+    "data_updated_at": "2022-01-01T00:00:00.000000Z",
+    "data": {
+        "username": "user",
+        "level": 5,
+        "subscription": {"active": True, "type": "lifetime", "max_level_granted": 60, "period_ends_at": None},
+        "profile_url": "https://www.wanikani.com/users/user",
+        "started_at": "2021-01-01T00:00:00.000000Z",
+        "current_vacation_started_at": None,
+        "preferences": {
+            "lessons_batch_size": 5,
+            "lessons_autoplay_audio": False,
+            "reviews_autoplay_audio": False,
+            "lessons_presentation_order": "ascending_level_then_subject",
+            "reviews_display_srs_indicator": True,
+        },
+    },
+}
+
+
+def collection_json(next_url=None, previous_url=None, data=()):
+    return {
+        "object": "collection",
+        "url": "https://api.wanikani.com/v2/assignments",
+        "data_updated_at": "2022-01-01T00:00:00.000000Z",
+        "pages": {"next_url": next_url, "previous_url": previous_url, "per_page": 500},
+        "total_count": len(data),
+        "data": list(data),
+    }
+
+
+@pytest.fixture
+def mocked_session(mocker: MockerFixture) -> MagicMock:
+    session = mocker.Mock()
+    session.get.return_value.status_code = 200
+    return session
+
+
+def test_user_information_uses_session(mocked_session):
+    mocked_session.get.return_value.json.return_value = USER_JSON
+
+    user = WaniKaniClient("__TOKEN__", session=mocked_session).user_information()
+
+    assert user.level == 5
+    mocked_session.get.assert_called_once()
+    assert mocked_session.get.call_args[1]["headers"]["Authorization"] == "Bearer __TOKEN__"
+
+
+def test_assignments_fetches_all_pages_through_session(mocked_session):
+    mocked_session.get.return_value.json.side_effect = [
+        collection_json(next_url="https://api.wanikani.com/v2/assignments?page_after_id=1"),
+        collection_json(),
+    ]
+
+    assignments = WaniKaniClient("__TOKEN__", session=mocked_session).assignments(unlocked=True, fetch_all=True)
+
+    assert len(assignments) == 0
+    assert mocked_session.get.call_count == 2
+    assert mocked_session.get.call_args_list[0][0][0] == "https://api.wanikani.com/v2/assignments?unlocked=true"
+
+
+def test_invalid_token(mocked_session):
+    mocked_session.get.return_value.status_code = 401
+
+    with pytest.raises(InvalidWanikaniApiKeyException):
+        WaniKaniClient("__TOKEN__", session=mocked_session).user_information()
+
+
+def test_server_error(mocked_session):
+    mocked_session.get.return_value.status_code = 500
+    mocked_session.get.return_value.raise_for_status.side_effect = HTTPError
+
+    with pytest.raises(HTTPError):
+        WaniKaniClient("__TOKEN__", session=mocked_session).user_information()
+
+
+def test_conditional_request_reuses_cached_content(mocked_session, tmp_path):
+    conditional_requests = ConditionalRequestsCache(str(tmp_path / "conditional.json.gz"))
+    mocked_session.get.return_value.headers = {"ETag": "W/\"1\"", "Last-Modified": "Sat, 08 Jan 2022 12:00:00 GMT"}
+    mocked_session.get.return_value.json.return_value = USER_JSON
+    WaniKaniClient("__TOKEN__", session=mocked_session, conditional_requests=conditional_requests).user_information()
+    mocked_session.get.return_value.status_code = 304
+    mocked_session.get.return_value.json.side_effect = ValueError
+
+    user = WaniKaniClient("__TOKEN__", session=mocked_session,
+                          conditional_requests=ConditionalRequestsCache(str(tmp_path / "conditional.json.gz"))
+                          ).user_information()
+
+    assert user.level == 5
+    assert mocked_session.get.call_args[1]["headers"]["If-None-Match"] == "W/\"1\""
+    assert mocked_session.get.call_args[1]["headers"]["If-Modified-Since"] == "Sat, 08 Jan 2022 12:00:00 GMT"
+
+
+def test_conditional_request_skips_multiple_pages(mocked_session, mocker):
+    conditional_requests = mocker.Mock(spec=ConditionalRequestsCache)
+    conditional_requests.get.return_value = None
+    mocked_session.get.return_value.headers = {"ETag": "W/\"1\""}
+    mocked_session.get.return_value.json.side_effect = [
+        collection_json(next_url="https://api.wanikani.com/v2/assignments?page_after_id=1"),
+        collection_json(previous_url="https://api.wanikani.com/v2/assignments?page_before_id=2"),
+    ]
+
+    WaniKaniClient("__TOKEN__", session=mocked_session,
+                   conditional_requests=conditional_requests).assignments(fetch_all=True)
+
+    conditional_requests.put.assert_not_called()
+
+
+def test_throttled_request_retried_after_delay(mocked_session):
+    throttled = MagicMock(status_code=429, headers={"Retry-After": "3"})
+    accepted = MagicMock(status_code=200, headers={})
+    accepted.json.return_value = USER_JSON
+    mocked_session.get.side_effect = [throttled, accepted]
+    rate_limit = MagicMock(spec=TokenBucket)
+    rate_limit.acquire.return_value = 0.0
+
+    user = WaniKaniClient("__TOKEN__", session=mocked_session, rate_limit=rate_limit).user_information()
+
+    assert user.level == 5
+    assert mocked_session.get.call_count == 2
+    assert rate_limit.acquire.call_count == 2
+    assert rate_limit.pause_until.call_args[0][0] == pytest.approx(time.time() + 3, abs=1)
+
+
+def test_exhausted_rate_limit_pauses_until_reset(mocked_session):
+    mocked_session.get.return_value.headers = {"RateLimit-Remaining": "0", "RateLimit-Reset": "1641643260"}
+    mocked_session.get.return_value.json.return_value = USER_JSON
+    rate_limit = MagicMock(spec=TokenBucket)
+    rate_limit.acquire.return_value = 0.0
+
+    WaniKaniClient("__TOKEN__", session=mocked_session, rate_limit=rate_limit).user_information()
+
+    rate_limit.pause_until.assert_called_once_with(1641643260.0)
+
+
+def test_build_client_shares_the_bucket_of_its_token(mocker: MockerFixture):
+    session = mocker.Mock()
+
+    wk_client = build_client("__TOKEN__", session, requests_per_minute=30)
+
+    assert wk_client.session is session
+    assert isinstance(wk_client.conditional_requests, ConditionalRequestsCache)
+    assert isinstance(wk_client.rate_limit, SharedTokenBucket) and wk_client.rate_limit.capacity == 30
+    assert build_client("__TOKEN__", session, requests_per_minute=30).rate_limit is wk_client.rate_limit
+    assert not isinstance(build_client("__TOKEN__", session, shared_rate_limit=False).rate_limit, SharedTokenBucket)
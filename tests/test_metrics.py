@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from wanikani_notifier.metrics import Metrics, PROMETHEUS_FORMAT
+
+
+@pytest.fixture
+def some_metrics() -> Metrics:
+    some_metrics = Metrics()
+    some_metrics.record("stage", 0.5)
+    some_metrics.record("stage", 0.25)
+    some_metrics.increment("event")
+    some_metrics.increment("event", 2)
+    return some_metrics
+
+
+def test_snapshot(some_metrics):
+    assert some_metrics.snapshot() == {
+        "stages": {"stage": {"calls": 2, "duration": 0.75}},
+        "counts": {"event": 3},
+    }
+
+
+def test_timed():
+    some_metrics = Metrics()
+
+    with some_metrics.timed("stage"):
+        pass
+
+    @some_metrics.timed("stage")
+    def timed_function():
+        pass
+
+    timed_function()
+
+    assert some_metrics.snapshot()["stages"]["stage"]["calls"] == 2
+
+
+def test_reset(some_metrics):
+    some_metrics.reset()
+
+    assert some_metrics.snapshot() == {"stages": {}, "counts": {}}
+
+
+def test_write_json(some_metrics, tmp_path):
+    path = str(tmp_path / "metrics.json")
+
+    some_metrics.write(path)
+
+    with open(path) as metrics_file:
+        assert json.load(metrics_file) == some_metrics.snapshot()
+
+
+def test_write_prometheus(some_metrics, tmp_path):
+    path = str(tmp_path / "metrics.prom")
+
+    some_metrics.write(path, PROMETHEUS_FORMAT)
+
+    with open(path) as metrics_file:
+        content = metrics_file.read()
+    assert 'wanikani_notifier_stage_duration_seconds{stage="stage"} 0.75' in content
+    assert 'wanikani_notifier_stage_calls{stage="stage"} 2' in content
+    assert 'wanikani_notifier_events{event="event"} 3' in content
+    assert list(tmp_path.iterdir()) == [tmp_path / "metrics.prom"]
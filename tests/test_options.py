@@ -0,0 +1,27 @@
+import click
+from click.testing import CliRunner
+
+from wanikani_notifier.options import wanikani_options
+
+
+def echo_options(summary: bool) -> click.Command:
+    @click.command()
+    @wanikani_options(summary=summary)
+    def command(**options):
+        click.echo(" ".join(f"{name}={value}" for name, value in sorted(options.items())))
+
+    return command
+
+
+def test_wanikani_options_defaults():
+    result = CliRunner().invoke(echo_options(summary=True), [])
+
+    assert result.output == "cache_dir=None http_retries=3 http_timeout=10.0 rate_limit=60 shared_rate_limit=True " \
+                            "store=json summary=True\n"
+
+
+def test_wanikani_options_without_summary():
+    result = CliRunner().invoke(echo_options(summary=False), ["--process-rate-limit", "--store", "sqlite"])
+
+    assert result.output == "cache_dir=None http_retries=3 http_timeout=10.0 rate_limit=60 shared_rate_limit=False " \
+                            "store=sqlite\n"
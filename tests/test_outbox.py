@@ -0,0 +1,110 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from wanikani_notifier.outbox import Outbox, notifier_id, OUTBOX_MAX_ATTEMPTS, OUTBOX_MAX_AGE
+
+
+@pytest.fixture
+def clock(mocker: MockerFixture) -> MagicMock:
+    mocked_time = mocker.patch("wanikani_notifier.outbox.time")
+    mocked_time.time.return_value = time.time()
+    return mocked_time
+
+
+def test_notifier_id_hides_credentials():
+    assert "__KEY__" not in notifier_id("pushsafer", private_key="__KEY__")
+    assert notifier_id("pushsafer", private_key="__KEY__") != notifier_id("pushsafer", private_key="__OTHER_KEY__")
+
+
+def test_same_message_queued_once():
+    outbox = Outbox.for_token("__TOKEN__")
+
+    first_id = outbox.enqueue("notifier", "title", "message")
+    second_id = outbox.enqueue("notifier", "title", "message")
+    outbox.enqueue("other_notifier", "title", "message")
+
+    assert first_id == second_id
+    assert [d.id for d in outbox.due(["notifier"])] == [first_id]
+
+
+def test_newer_message_replaces_pending_ones():
+    outbox = Outbox.for_token("__TOKEN__")
+    outbox.enqueue("notifier", "title", "40 reviews")
+    outbox.enqueue("other_notifier", "title", "40 reviews")
+
+    latest_id = outbox.enqueue("notifier", "title", "41 reviews")
+
+    assert [d.id for d in outbox.due(["notifier"])] == [latest_id]
+    assert [d.message for d in outbox.due(["other_notifier"])] == ["40 reviews"]
+
+
+def test_locked_reloads_and_persists():
+    outbox = Outbox.for_token("__TOKEN__")
+    outbox.pending()
+    other_run_outbox = Outbox.for_token("__TOKEN__")
+    other_run_outbox.enqueue("other_notifier", "title", "message")
+    other_run_outbox.save()
+
+    with outbox.locked():
+        outbox.enqueue("notifier", "title", "message")
+
+    assert sorted(d.notifier_id for d in Outbox.for_token("__TOKEN__").pending()) == ["notifier", "other_notifier"]
+
+
+def test_pending_deliveries_persisted():
+    outbox = Outbox.for_token("__TOKEN__")
+    delivery_id = outbox.enqueue("notifier", "title", "message", "url")
+    outbox.save()
+
+    assert [(d.id, d.message, d.url) for d in Outbox.for_token("__TOKEN__").due(["notifier"])] == [
+        (delivery_id, "message", "url")
+    ]
+    assert Outbox.for_token("__OTHER_TOKEN__").pending() == []
+
+
+def test_delivered_removed():
+    outbox = Outbox.for_token("__TOKEN__")
+    delivery_id = outbox.enqueue("notifier", "title", "message")
+
+    outbox.delivered(delivery_id)
+
+    assert outbox.pending() == []
+
+
+def test_failed_retried_with_backoff(clock):
+    outbox = Outbox.for_token("__TOKEN__")
+    delivery_id = outbox.enqueue("notifier", "title", "message")
+    now = clock.time.return_value
+
+    outbox.failed(delivery_id)
+    assert outbox.due(["notifier"]) == []
+    clock.time.return_value = now + 60
+    assert [d.attempts for d in outbox.due(["notifier"])] == [1]
+
+    outbox.failed(delivery_id)
+    clock.time.return_value = now + 60 + 119
+    assert outbox.due(["notifier"]) == []
+    clock.time.return_value = now + 60 + 120
+    assert [d.attempts for d in outbox.due(["notifier"])] == [2]
+
+
+def test_failed_dropped_after_max_attempts():
+    outbox = Outbox.for_token("__TOKEN__")
+    delivery_id = outbox.enqueue("notifier", "title", "message")
+
+    for _ in range(OUTBOX_MAX_ATTEMPTS):
+        outbox.failed(delivery_id)
+
+    assert outbox.pending() == []
+
+
+def test_outdated_deliveries_dropped(clock):
+    outbox = Outbox.for_token("__TOKEN__")
+    outbox.enqueue("notifier", "title", "message")
+    outbox.save()
+    clock.time.return_value += OUTBOX_MAX_AGE.total_seconds()
+
+    assert Outbox.for_token("__TOKEN__").pending() == []
@@ -0,0 +1,85 @@
+import os
+from email.utils import formatdate
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from wanikani_notifier.ratelimit import TokenBucket, SharedTokenBucket, RateLimiter, retry_delay, DEFAULT_RETRY_DELAY
+
+NOW = 1641643200.0
+
+
+@pytest.fixture
+def clock(mocker: MockerFixture) -> MagicMock:
+    """
+    Fake clock of the rate limiter, whose sleeps advance the time.
+    """
+    mocked_time = mocker.patch("wanikani_notifier.ratelimit.time")
+    mocked_time.now = NOW
+    mocked_time.time.side_effect = lambda: mocked_time.now
+
+    def sleep(seconds):
+        mocked_time.now += seconds
+
+    mocked_time.sleep.side_effect = sleep
+    return mocked_time
+
+
+def response(**headers) -> MagicMock:
+    mocked = MagicMock()
+    mocked.headers = headers
+    return mocked
+
+
+def test_token_bucket_allows_bursts_then_paces(clock):
+    bucket = TokenBucket(requests_per_minute=60)
+
+    waits = [bucket.acquire() for _ in range(62)]
+
+    assert waits[:60] == [0.0] * 60
+    assert waits[60:] == [pytest.approx(1.0), pytest.approx(1.0)]
+
+
+def test_token_bucket_paused(clock):
+    bucket = TokenBucket(requests_per_minute=60)
+
+    bucket.pause_until(NOW + 30)
+
+    assert bucket.acquire() == pytest.approx(31.0)
+
+
+def test_shared_token_bucket_shared_by_instances(clock, tmp_path):
+    path = os.path.join(tmp_path, "rate-limit.json")
+    first, second = SharedTokenBucket(path, requests_per_minute=2), SharedTokenBucket(path, requests_per_minute=2)
+
+    assert [first.acquire(), second.acquire()] == [0.0, 0.0]
+    assert first.acquire() == pytest.approx(30.0)
+
+
+def test_rate_limiter_bucket_per_token():
+    rate_limiter = RateLimiter()
+
+    assert rate_limiter.bucket("__TOKEN__") is rate_limiter.bucket("__TOKEN__")
+    assert rate_limiter.bucket("__TOKEN__") is not rate_limiter.bucket("__OTHER_TOKEN__")
+    assert isinstance(rate_limiter.bucket("__TOKEN__", shared=True), SharedTokenBucket)
+
+
+def test_rate_limiter_bucket_per_rate():
+    rate_limiter = RateLimiter()
+
+    assert rate_limiter.bucket("__TOKEN__", 60).capacity == 60
+    assert rate_limiter.bucket("__TOKEN__", 30).capacity == 30
+    assert rate_limiter.bucket("__TOKEN__", 30) is rate_limiter.bucket("__TOKEN__", 30)
+
+
+@pytest.mark.parametrize("headers,expected_delay",
+                         [
+                             pytest.param({"Retry-After": "12"}, 12, id="retry_after_seconds"),
+                             pytest.param({"Retry-After": formatdate(NOW + 20, usegmt=True)}, 20, id="retry_after_date"),
+                             pytest.param({"RateLimit-Reset": str(NOW + 40)}, 40, id="rate_limit_reset"),
+                             pytest.param({}, DEFAULT_RETRY_DELAY, id="no_header"),
+                         ]
+                         )
+def test_retry_delay(clock, headers, expected_delay):
+    assert retry_delay(response(**headers)) == pytest.approx(expected_delay)
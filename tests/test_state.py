@@ -0,0 +1,76 @@
+import pytest
+
+from wanikani_notifier.state import NotificationState
+
+
+def test_first_message_notified():
+    assert NotificationState.for_token("__TOKEN__").should_notify("command", [0, 40])
+
+
+def test_same_counts_not_notified_again_across_runs():
+    state = NotificationState.for_token("__TOKEN__")
+    state.should_notify("command", [0, 40])
+    state.commit()
+    state.save()
+
+    assert not NotificationState.for_token("__TOKEN__").should_notify("command", [0, 40])
+    assert NotificationState.for_token("__TOKEN__").should_notify("other_command", [0, 40])
+    assert NotificationState.for_token("__OTHER_TOKEN__").should_notify("command", [0, 40])
+
+
+@pytest.mark.parametrize("min_increase,counts_sequence,expected_notified",
+                         [
+                             pytest.param(1, [[0, 40], [0, 41]], [True, True], id="rise"),
+                             pytest.param(1, [[0, 40], [1, 39]], [True, False], id="same_total"),
+                             pytest.param(1, [[0, 40], [0, 30], [0, 31]], [True, False, True], id="drop_lowers_reference"),
+                             pytest.param(10, [[0, 40], [0, 45], [0, 50]], [True, False, True], id="threshold"),
+                             pytest.param(0, [[0, 40], [1, 39], [0, 30]], [True, True, True], id="any_change"),
+                         ]
+                         )
+def test_should_notify(min_increase, counts_sequence, expected_notified):
+    state = NotificationState.for_token("__TOKEN__", min_increase)
+
+    notified = []
+    for counts in counts_sequence:
+        notified.append(state.should_notify("command", counts))
+        state.commit()
+
+    assert notified == expected_notified
+
+
+def test_counts_not_committed_notified_again():
+    state = NotificationState.for_token("__TOKEN__")
+    state.should_notify("command", [0, 40])
+    state.save()
+
+    assert NotificationState.for_token("__TOKEN__").should_notify("command", [0, 40])
+
+
+def test_reset_notifies_next_message():
+    state = NotificationState.for_token("__TOKEN__")
+    state.should_notify("command", [0, 40])
+    state.commit()
+
+    state.reset("command")
+
+    assert state.should_notify("command", [0, 40])
+
+
+def test_overlapping_runs_merged():
+    state = NotificationState.for_token("__TOKEN__")
+    state.should_notify("command", [0, 40])
+    state.should_notify("stale_command", [0, 10])
+    state.commit()
+    state.save()
+    first_run, second_run = NotificationState.for_token("__TOKEN__"), NotificationState.for_token("__TOKEN__")
+    first_run.should_notify("other_command", [0, 5])
+    second_run.should_notify("command", [0, 50])
+    second_run.reset("stale_command")
+
+    for run in (first_run, second_run):
+        run.commit()
+        run.save()
+
+    state = NotificationState.for_token("__TOKEN__")
+    assert [state.should_notify(key, counts) for key, counts in [("command", [0, 50]), ("other_command", [0, 5]),
+                                                                 ("stale_command", [0, 10])]] == [False, False, True]
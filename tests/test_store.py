@@ -0,0 +1,113 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from wanikani_notifier import cache
+from wanikani_notifier.store import SqliteStore, STORE_FILENAME
+
+
+@pytest.fixture
+def store() -> SqliteStore:
+    return SqliteStore.default()
+
+
+def assignment(id: int, subject_id: int = 1, created_at: float = 0.0, available_at: float = None,
+               started: bool = True, unlocked: bool = True, hidden: bool = False):
+    return id, subject_id, created_at, available_at, started, unlocked, hidden, 0.0
+
+
+def test_store_created_in_cache_folder(store):
+    assert os.path.exists(os.path.join(cache.cache_folder(), STORE_FILENAME))
+
+
+def test_subjects(store):
+    store.put_subjects([(1, 1, 10.0), (2, 2, 20.0)])
+    store.put_subjects([(2, 3, 30.0)])
+
+    assert store.get_subject(2) == (2, 3, 30.0)
+    assert store.get_subject(3) is None
+    assert store.subject_ids() == [1, 2]
+    assert store.latest_subject_update() == 30.0
+
+
+def test_assignments_per_account(store):
+    store.put_assignments("someone", [assignment(1), assignment(2, unlocked=False)], full_synced_at=100.0)
+    store.put_assignments("someone_else", [assignment(3)])
+
+    assert [a[0] for a in store.get_assignments("someone")] == [1]
+    assert [a[0] for a in store.get_assignments("someone", unlocked_only=False)] == [1, 2]
+    assert store.get_assignments("someone")[0][4:7] == (True, True, False)
+    assert store.full_synced_at("someone") == 100.0
+    assert store.full_synced_at("someone_else") is None
+    assert store.count_assignments("someone") == 2
+
+
+def test_full_sync_replaces_assignments(store):
+    store.put_assignments("someone", [assignment(1), assignment(2)], full_synced_at=100.0)
+
+    store.put_assignments("someone", [assignment(3)], full_synced_at=200.0)
+
+    assert [a[0] for a in store.get_assignments("someone")] == [3]
+    assert store.full_synced_at("someone") == 200.0
+
+
+def test_count_available_assignments(store):
+    store.put_subjects([(1, 1, 0.0), (2, 5, 0.0)])
+    store.put_assignments("someone", [
+        assignment(1, available_at=10.0),
+        assignment(2, available_at=20.0),
+        assignment(3, available_at=30.0),
+        assignment(4, available_at=10.0, hidden=True),
+        assignment(5, subject_id=2, available_at=10.0),
+        assignment(6, created_at=15.0, started=False),
+        assignment(7, created_at=15.0, started=False, unlocked=False),
+    ])
+
+    assert store.count_available_assignments("someone", user_level=1, end=20.0) == (2, 1)
+    assert store.count_available_assignments("someone", user_level=5, end=20.0, start=15.0) == (1, 1)
+    assert store.count_available_assignments("someone_else", user_level=5, end=20.0) == (0, 0)
+    assert store.next_available_at("someone", user_level=1, after=20.0) == 30.0
+    assert store.next_available_at("someone", user_level=1, after=30.0) is None
+
+
+def test_outdated_schema_recreated(tmp_path):
+    path = os.path.join(tmp_path, STORE_FILENAME)
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE subjects (id INTEGER PRIMARY KEY)")
+
+    store = SqliteStore(path)
+    store.put_subjects([(1, 1, 0.0)])
+
+    assert store.get_subject(1) == (1, 1, 0.0)
+
+
+def test_concurrent_first_runs_keep_each_other_tables(tmp_path):
+    path = os.path.join(tmp_path, STORE_FILENAME)
+
+    def first_run(subject_id: int) -> None:
+        SqliteStore(path).put_subjects([(subject_id, 1, 0.0)])
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(first_run, range(16)))
+
+    assert SqliteStore(path).subject_ids() == list(range(16))
+
+
+def test_review_and_lesson_times(store):
+    store.put_subjects([(1, 1, 0.0), (2, 5, 0.0)])
+    store.put_assignments("someone", [
+        assignment(1, available_at=30.0),
+        assignment(2, available_at=10.0),
+        assignment(3, available_at=20.0),
+        assignment(4, subject_id=2, available_at=15.0),
+        assignment(5, available_at=25.0, hidden=True),
+        assignment(6, created_at=12.0, started=False),
+        assignment(7, created_at=5.0, started=False),
+    ])
+
+    assert store.review_times("someone", user_level=1, after=10.0) == [20.0, 30.0]
+    assert store.review_times_between("someone", user_level=5, start=10.0, end=30.0) == [10.0, 15.0, 20.0]
+    assert store.lesson_times("someone", after=0.0) == [5.0, 12.0]
+    assert store.lesson_times("someone_else", after=0.0) == []
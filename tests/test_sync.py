@@ -0,0 +1,75 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from click.testing import CliRunner
+from pytest_mock import MockerFixture
+
+from wanikani_notifier import cache
+from wanikani_notifier.sync import sync, named_tokens
+from wanikani_notifier.wanikani import SyncReport
+
+
+@pytest.fixture
+def mocked_wk_client(mocker: MockerFixture) -> MagicMock:
+    return mocker.patch("wanikani_notifier.sync.build_client")
+
+
+@pytest.fixture
+def mocked_sync_subjects(mocker: MockerFixture) -> MagicMock:
+    return mocker.patch("wanikani_notifier.sync.sync_subjects", return_value=({}, SyncReport(12, 9000, False)))
+
+
+@pytest.fixture
+def mocked_sync_assignments(mocker: MockerFixture) -> MagicMock:
+    return mocker.patch("wanikani_notifier.sync.sync_assignments", return_value=SyncReport(3, 1500, True))
+
+
+def test_named_tokens():
+    assert named_tokens(["__TOKEN_1__"], {"accounts": [{"name": "someone", "wanikani": "__TOKEN_2__"},
+                                                       {"wanikani": "__TOKEN_1__"}]}) == [
+        (cache.token_digest("__TOKEN_1__")[:8], "__TOKEN_1__"),
+        ("someone", "__TOKEN_2__"),
+    ]
+
+
+def test_sync_reports_changes(tmp_path, mocked_wk_client, mocked_sync_subjects, mocked_sync_assignments):
+    config_path = tmp_path / "accounts.json"
+    config_path.write_text(json.dumps({"accounts": [{"name": f"account{i}", "wanikani": f"__TOKEN_{i}__"}
+                                                    for i in range(2)]}))
+
+    result = CliRunner().invoke(sync, ["--accounts", str(config_path)])
+
+    assert result.exit_code == 0
+    mocked_sync_subjects.assert_called_once()
+    assert mocked_sync_assignments.call_count == 2
+    assert result.output.splitlines() == [
+        "subjects: 12 updated, 9000 in total",
+        "assignments of account0: 3 updated, 1500 in total (full sync)",
+        "assignments of account1: 3 updated, 1500 in total (full sync)",
+    ]
+
+
+def test_sync_subjects_only(mocked_wk_client, mocked_sync_subjects, mocked_sync_assignments):
+    result = CliRunner().invoke(sync, ["--wanikani", "__TOKEN__", "--subjects-only"])
+
+    assert result.exit_code == 0
+    mocked_sync_subjects.assert_called_once()
+    mocked_sync_assignments.assert_not_called()
+
+
+def test_sync_reports_failed_accounts(mocked_wk_client, mocked_sync_subjects, mocked_sync_assignments):
+    mocked_sync_assignments.side_effect = [RuntimeError, SyncReport(0, 10, False)]
+
+    result = CliRunner().invoke(sync, ["--wanikani", "__TOKEN_1__", "--wanikani", "__TOKEN_2__"])
+
+    assert result.exit_code == 1
+    assert "1 out of 2 accounts failed" in result.output
+    assert "0 updated, 10 in total" in result.output
+
+
+def test_sync_requires_a_token(mocked_sync_subjects):
+    result = CliRunner().invoke(sync, [])
+
+    assert result.exit_code == 2
+    mocked_sync_subjects.assert_not_called()
@@ -0,0 +1,36 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from wanikani_notifier.transport import build_session
+
+
+@pytest.fixture
+def mocked_send(mocker: MockerFixture):
+    return mocker.patch("requests.Session.send")
+
+
+def test_build_session_applies_default_timeout(mocked_send):
+    session = build_session(timeout=3)
+
+    session.get("https://api.wanikani.com/v2/user")
+
+    assert mocked_send.call_args[1]["timeout"] == 3
+
+
+def test_build_session_keeps_explicit_timeout(mocked_send):
+    session = build_session(timeout=3)
+
+    session.get("https://api.wanikani.com/v2/user", timeout=7)
+
+    assert mocked_send.call_args[1]["timeout"] == 7
+
+
+def test_build_session_shares_pooled_adapter():
+    session = build_session(retries=5, pool_size=4)
+
+    adapter = session.get_adapter("https://api.wanikani.com/v2/user")
+
+    assert adapter is session.get_adapter("https://api.pushover.net/1/messages.json")
+    assert adapter.max_retries.total == 5
+    assert "POST" not in adapter.max_retries.allowed_methods
+    assert adapter._pool_maxsize == 4
@@ -1,15 +1,31 @@
 import datetime
-from dataclasses import dataclass
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
 from unittest.mock import MagicMock
 
 import pytest
 from wanikani_api.client import Client as WaniKaniClient
+from wanikani_api.models import Summary
 from pytest_mock import MockerFixture
 
-from wanikani_notifier.wanikani import get_all_subjects
+from wanikani_notifier import cache
+from wanikani_notifier.store import SqliteStore
+from wanikani_notifier.wanikani import get_all_subjects, SubjectInfo, AssignmentsSnapshot, StoredSubjects
+from wanikani_notifier.wanikani import get_all_assignments, ASSIGNMENTS_FULL_RESYNC_PERIOD, AssignmentColumns
+from wanikani_notifier.wanikani import AssignmentInfo, SyncReport, sync_subjects, sync_assignments
+from wanikani_notifier.wanikani import get_next_available_time, get_review_forecast, get_next_notification_time
+from wanikani_notifier.wanikani import SUBJECTS_CACHED_FILENAME, LEGACY_SUBJECTS_CACHED_FILENAME, SUBJECTS_CACHE_VERSION
 from wanikani_notifier.wanikani import get_available_assignments, get_notification_message, AvailableAssignments
 
 
+NOW = datetime.datetime(year=2022, month=1, day=10, hour=12)
+FULL_SYNC_UPDATED_AFTER = datetime.datetime.min.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
 @dataclass
 class MockedLesson:
     unlocked_at = True
@@ -23,109 +39,504 @@ class MockedReview:
 
 
 class MockedSubject:
-    def __init__(self, id: int, data_updated_at: datetime):
+    def __init__(self, id: int, data_updated_at: datetime, level: int = 1):
         self.id = id
+        self.level = level
         self.data_updated_at = data_updated_at
         self._raw = {}
 
 
+@dataclass
+class MockedAssignment:
+    subject_id: int
+    created_at: datetime.datetime = datetime.datetime(year=2021, month=1, day=1)
+    started_at: Optional[datetime.datetime] = None
+    available_at: Optional[datetime.datetime] = None
+    hidden: bool = False
+    unlocked_at: Optional[datetime.datetime] = datetime.datetime(year=2021, month=1, day=1)
+    data_updated_at: datetime.datetime = datetime.datetime(year=2021, month=1, day=1)
+    id: int = field(default_factory=itertools.count(1).__next__)
+
+
 @pytest.fixture
 def mocked_wk_client(mocker: MockerFixture) -> MagicMock:
-    return mocker.Mock(spec=WaniKaniClient)
+    wk_client = mocker.Mock(spec=WaniKaniClient)
+    wk_client.v2_api_key = "__TOKEN__"
+    return wk_client
 
 
-@pytest.fixture
-def mocked_os(mocker: MockerFixture) -> MagicMock:
-    return mocker.patch("wanikani_notifier.wanikani.os")
+def cached_files(folder: str) -> List[str]:
+    return [filename for filename in os.listdir(folder) if not filename.endswith(".lock")]
 
 
-@pytest.fixture
-def mocked_open(mocker: MockerFixture) -> MagicMock:
-    return mocker.patch("builtins.open")
+def summary_of(lessons: int, reviews_per_hour: List[int], next_reviews_at: Optional[datetime.datetime] = None
+               ) -> Summary:
+    def timestamp(moment: datetime.datetime) -> str:
+        return moment.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
+    return Summary({"object": "report", "url": "/summary", "data_updated_at": timestamp(NOW), "data": {
+        "lessons": [{"available_at": timestamp(NOW), "subject_ids": list(range(lessons))}],
+        "next_reviews_at": timestamp(next_reviews_at) if next_reviews_at else None,
+        "reviews": [{"available_at": timestamp(NOW + datetime.timedelta(hours=hours)), "subject_ids": list(range(count))}
+                    for hours, count in enumerate(reviews_per_hour)],
+    }})
 
-@pytest.fixture
-def mocked_json(mocker: MockerFixture) -> MagicMock:
-    return mocker.patch("wanikani_notifier.wanikani.ujson")
+
+def snapshot_of(wk_client, all_subjects, sqlite: bool):
+    if not sqlite:
+        return AssignmentsSnapshot(wk_client), all_subjects
+
+    store = SqliteStore.default()
+    store.put_subjects(all_subjects.values())
+    return AssignmentsSnapshot(wk_client, store=store), StoredSubjects(store)
 
 
 @pytest.fixture
-def mocked_subject(mocker: MockerFixture) -> MagicMock:
-    return mocker.patch("wanikani_notifier.wanikani.Subject")
-
-
-def test_get_all_subjects_folder_not_found(mocked_wk_client,
-                                           mocked_os, mocked_open,
-                                           mocked_json):
-    mocked_os.path.exists.return_value = False
-    mocked_json.load.return_value = {}
-    mocked_wk_client.subjects.return_value = [
-        MockedSubject(id=1, data_updated_at=datetime.datetime(year=2022, month=1, day=1)),
-        MockedSubject(id=2, data_updated_at=datetime.datetime(year=2021, month=1, day=1)),
-        MockedSubject(id=3, data_updated_at=datetime.datetime(year=2021, month=1, day=1)),
+def fetched_subjects() -> List[MockedSubject]:
+    return [
+        MockedSubject(id=1, data_updated_at=datetime.datetime(year=2022, month=1, day=1), level=1),
+        MockedSubject(id=2, data_updated_at=datetime.datetime(year=2021, month=1, day=1), level=2),
+        MockedSubject(id=3, data_updated_at=datetime.datetime(year=2021, month=1, day=1), level=3),
     ]
 
+
+def test_get_all_subjects_folder_not_found(mocked_wk_client, cache_folder, fetched_subjects):
+    mocked_wk_client.subjects.return_value = fetched_subjects
+
+    all_subjects = get_all_subjects(mocked_wk_client)
+
+    assert os.path.exists(os.path.join(cache_folder, SUBJECTS_CACHED_FILENAME))
+    assert mocked_wk_client.subjects.call_args[1]["updated_after"] == FULL_SYNC_UPDATED_AFTER
+    assert sorted(all_subjects) == [1, 2, 3]
+    assert all_subjects[2].level == 2
+
+
+def test_get_all_subjects_some_subjects_cached(mocked_wk_client, cache_folder, fetched_subjects):
+    mocked_wk_client.subjects.return_value = fetched_subjects[:2]
     get_all_subjects(mocked_wk_client)
+    mocked_wk_client.subjects.return_value = fetched_subjects[2:]
+
+    all_subjects = get_all_subjects(mocked_wk_client)
+
+    assert mocked_wk_client.subjects.call_args[1]["updated_after"] == "2022-01-01T00:00:00.000000"
+    assert sorted(all_subjects) == [1, 2, 3]
+    assert all_subjects[1] == SubjectInfo(id=1, level=1, data_updated_at=1640995200.0)
 
-    assert mocked_os.path.exists.call_count == 2
-    mocked_os.makedirs.assert_called()
-    mocked_wk_client.subjects.assert_called()
-    mocked_json.load.assert_not_called()
-    mocked_json.dump.assert_called()
-
-
-def test_get_all_subjects_folder_found_no_subject_cached(mocked_wk_client,
-                                                         mocked_os, mocked_open,
-                                                         mocked_json):
-    mocked_os.path.exists.return_value = True
-    mocked_json.load.return_value = {}
-    mocked_wk_client.subjects.return_value = [
-        MockedSubject(id=1, data_updated_at=datetime.datetime(year=2022, month=1, day=1)),
-        MockedSubject(id=2, data_updated_at=datetime.datetime(year=2021, month=1, day=1)),
-        MockedSubject(id=3, data_updated_at=datetime.datetime(year=2021, month=1, day=1)),
-    ]
 
+def test_get_all_subjects_not_written_when_unchanged(mocked_wk_client, cache_folder, fetched_subjects,
+                                                     mocker: MockerFixture):
+    mocked_wk_client.subjects.return_value = fetched_subjects
     get_all_subjects(mocked_wk_client)
+    mocked_wk_client.subjects.return_value = []
+    dump_versioned = mocker.spy(cache, "dump_versioned")
 
-    assert mocked_os.path.exists.call_count == 2
-    mocked_os.makedirs.assert_not_called()
-    mocked_wk_client.subjects.assert_called()
-    mocked_json.load.assert_called()
-    mocked_json.dump.assert_called()
+    all_subjects = get_all_subjects(mocked_wk_client)
 
+    dump_versioned.assert_not_called()
+    assert sorted(all_subjects) == [1, 2, 3]
 
-def test_get_all_subjects_some_subjects_cached(mocked_wk_client,
-                                               mocked_os, mocked_open,
-                                               mocked_json, mocked_subject):
-    mocked_os.path.exists.return_value = True
-    mocked_json.load.return_value = [
-        {"id": 1, "data_updated_at": "2021-12-27"},
-        {"id": 2, "data_updated_at": "2021-12-28"},
-    ]
-    mocked_subject.return_value.data_updated_at = datetime.datetime(year=2021, month=12, day=12)
-    mocked_wk_client.subjects.return_value = [
-        MockedSubject(id=1, data_updated_at=datetime.datetime(year=2022, month=1, day=1)),
-        MockedSubject(id=2, data_updated_at=datetime.datetime(year=2021, month=1, day=1)),
-        MockedSubject(id=3, data_updated_at=datetime.datetime(year=2021, month=1, day=1)),
+
+def test_get_all_subjects_outdated_cache_version(mocked_wk_client, cache_folder, fetched_subjects):
+    cache.dump_versioned(cache.cache_path(SUBJECTS_CACHED_FILENAME), 1, [[4, 4, 0.0]])
+    mocked_wk_client.subjects.return_value = fetched_subjects
+
+    all_subjects = get_all_subjects(mocked_wk_client)
+
+    assert mocked_wk_client.subjects.call_args[1]["updated_after"] == FULL_SYNC_UPDATED_AFTER
+    assert sorted(all_subjects) == [1, 2, 3]
+
+
+def test_get_all_subjects_migrates_legacy_cache(mocked_wk_client, cache_folder):
+    with open(cache.cache_path(LEGACY_SUBJECTS_CACHED_FILENAME), "w") as legacy_file:
+        json.dump([
+            {"id": 1, "data_updated_at": "2021-12-27T00:00:00.000000Z", "data": {"level": 5, "meanings": []}},
+            {"id": 2, "data_updated_at": "2021-12-28T00:00:00.000000Z", "data": {"level": 6, "meanings": []}},
+        ], legacy_file)
+    mocked_wk_client.subjects.return_value = []
+
+    all_subjects = get_all_subjects(mocked_wk_client)
+
+    assert not os.path.exists(os.path.join(cache_folder, LEGACY_SUBJECTS_CACHED_FILENAME))
+    assert os.path.exists(os.path.join(cache_folder, SUBJECTS_CACHED_FILENAME))
+    assert mocked_wk_client.subjects.call_args[1]["updated_after"] == "2021-12-28T00:00:00.000000"
+    assert all_subjects == {1: SubjectInfo(1, 5, 1640563200.0), 2: SubjectInfo(2, 6, 1640649600.0)}
+
+
+@pytest.mark.parametrize("filename", (SUBJECTS_CACHED_FILENAME, LEGACY_SUBJECTS_CACHED_FILENAME))
+def test_get_all_subjects_migrates_data_folder(mocked_wk_client, cache_folder, tmp_path, monkeypatch, filename):
+    os.makedirs(tmp_path / "workdir" / cache.LEGACY_CACHE_FOLDER)
+    monkeypatch.chdir(tmp_path / "workdir")
+    moved_path = os.path.join(cache.LEGACY_CACHE_FOLDER, filename)
+    if filename == SUBJECTS_CACHED_FILENAME:
+        cache.dump_versioned(moved_path, SUBJECTS_CACHE_VERSION, [[1, 5, 1640563200.0]])
+    else:
+        with open(moved_path, "w") as legacy_file:
+            json.dump([{"id": 1, "data_updated_at": "2021-12-27T00:00:00.000000Z", "data": {"level": 5}}], legacy_file)
+    mocked_wk_client.subjects.return_value = []
+
+    all_subjects = get_all_subjects(mocked_wk_client)
+
+    assert all_subjects == {1: SubjectInfo(1, 5, 1640563200.0)}
+    assert mocked_wk_client.subjects.call_args[1]["updated_after"] == "2021-12-27T00:00:00.000000"
+    assert not os.path.exists(moved_path)
+    assert os.path.exists(os.path.join(cache_folder, SUBJECTS_CACHED_FILENAME))
+
+
+def test_get_all_subjects_stored(mocked_wk_client, cache_folder, fetched_subjects):
+    store = SqliteStore.default()
+    mocked_wk_client.subjects.return_value = fetched_subjects[:2]
+    get_all_subjects(mocked_wk_client, store=store)
+    mocked_wk_client.subjects.return_value = fetched_subjects[2:]
+
+    all_subjects = get_all_subjects(mocked_wk_client, store=store)
+
+    assert mocked_wk_client.subjects.call_args[1]["updated_after"] == "2022-01-01T00:00:00.000000"
+    assert not os.path.exists(os.path.join(cache_folder, SUBJECTS_CACHED_FILENAME))
+    assert sorted(all_subjects) == [1, 2, 3]
+    assert all_subjects[1] == SubjectInfo(id=1, level=1, data_updated_at=1640995200.0)
+    assert 4 not in all_subjects
+
+
+def test_get_all_assignments_no_assignment_cached(mocked_wk_client, cache_folder):
+    mocked_wk_client.assignments.return_value = [MockedAssignment(subject_id=1), MockedAssignment(subject_id=2)]
+
+    all_assignments = get_all_assignments(mocked_wk_client)
+
+    assert mocked_wk_client.assignments.call_args[1]["updated_after"] == FULL_SYNC_UPDATED_AFTER
+    assert len(all_assignments) == 2
+    assert len(cached_files(cache_folder)) == 1
+
+
+def test_get_all_assignments_some_assignments_cached(mocked_wk_client, cache_folder):
+    relocked = MockedAssignment(subject_id=2)
+    mocked_wk_client.assignments.return_value = [MockedAssignment(subject_id=1), relocked]
+    get_all_assignments(mocked_wk_client)
+    mocked_wk_client.assignments.return_value = [
+        MockedAssignment(subject_id=2, id=relocked.id, unlocked_at=None, data_updated_at=NOW),
+        MockedAssignment(subject_id=3, data_updated_at=NOW),
     ]
 
-    get_all_subjects(mocked_wk_client)
+    all_assignments = get_all_assignments(mocked_wk_client)
 
-    assert mocked_os.path.exists.call_count == 2
-    mocked_os.makedirs.assert_not_called()
-    mocked_wk_client.subjects.assert_called()
-    mocked_json.load.assert_called()
-    mocked_json.dump.assert_called()
+    assert mocked_wk_client.assignments.call_args[1]["updated_after"] == "2021-01-01T00:00:00.000000"
+    assert len(all_assignments) == 3
+    assert not all_assignments[relocked.id].unlocked
 
 
-def test_available_assignments_none(mocked_wk_client):
+def test_get_all_assignments_not_written_when_unchanged(mocked_wk_client, cache_folder, mocker: MockerFixture):
+    mocked_wk_client.assignments.return_value = [MockedAssignment(subject_id=1)]
+    get_all_assignments(mocked_wk_client)
     mocked_wk_client.assignments.return_value = []
+    dump_versioned = mocker.spy(cache, "dump_versioned")
+
+    all_assignments = get_all_assignments(mocked_wk_client)
+
+    dump_versioned.assert_not_called()
+    assert len(all_assignments) == 1
+
+
+def test_get_all_assignments_full_resync_when_outdated(mocked_wk_client, cache_folder, mocker: MockerFixture):
+    mocked_wk_client.assignments.return_value = [MockedAssignment(subject_id=1)]
+    get_all_assignments(mocked_wk_client)
+    mocked_time = mocker.patch("wanikani_notifier.wanikani.time")
+    mocked_time.time.return_value = time.time() + ASSIGNMENTS_FULL_RESYNC_PERIOD.total_seconds() + 1
+    mocked_wk_client.assignments.return_value = [MockedAssignment(subject_id=2)]
+
+    all_assignments = get_all_assignments(mocked_wk_client)
+
+    assert mocked_wk_client.assignments.call_args[1]["updated_after"] == FULL_SYNC_UPDATED_AFTER
+    assert len(all_assignments) == 1
+
+
+def test_sync_subjects_report(mocked_wk_client, cache_folder, fetched_subjects):
+    mocked_wk_client.subjects.return_value = fetched_subjects[:2]
+    assert sync_subjects(mocked_wk_client)[1] == SyncReport(updated=2, total=2, full_sync=True)
+    mocked_wk_client.subjects.return_value = fetched_subjects[2:]
+
+    assert sync_subjects(mocked_wk_client)[1] == SyncReport(updated=len(fetched_subjects) - 2,
+                                                            total=len(fetched_subjects), full_sync=False)
+
+
+@pytest.mark.parametrize("sqlite", (False, True))
+def test_sync_assignments_report(mocked_wk_client, cache_folder, sqlite):
+    store = SqliteStore.default() if sqlite else None
+    mocked_wk_client.assignments.return_value = [MockedAssignment(subject_id=1), MockedAssignment(subject_id=2)]
+    assert sync_assignments(mocked_wk_client, store=store) == SyncReport(updated=2, total=2, full_sync=True)
+    mocked_wk_client.assignments.return_value = [MockedAssignment(subject_id=3)]
+
+    assert sync_assignments(mocked_wk_client, store=store) == SyncReport(updated=1, total=3, full_sync=False)
+
+
+def test_get_all_assignments_cached_per_token(mocked_wk_client, cache_folder):
+    mocked_wk_client.assignments.return_value = [MockedAssignment(subject_id=1)]
+    get_all_assignments(mocked_wk_client)
+    mocked_wk_client.v2_api_key = "__OTHER_TOKEN__"
 
-    get_available_assignments(mocked_wk_client, {}, datetime.datetime.utcnow())
+    get_all_assignments(mocked_wk_client)
+
+    assert mocked_wk_client.assignments.call_args[1]["updated_after"] == FULL_SYNC_UPDATED_AFTER
+    assert len(cached_files(cache_folder)) == 2
+
+
+def test_available_assignments_none(mocked_wk_client, cache_folder):
+    mocked_wk_client.assignments.return_value = []
+
+    get_available_assignments(AssignmentsSnapshot(mocked_wk_client), {}, datetime.datetime.utcnow())
 
     mocked_wk_client.assignments.assert_called()
 
 
+@pytest.mark.parametrize("sqlite", [False, True])
+def test_available_assignments_in_period(mocked_wk_client, cache_folder, sqlite):
+    mocked_wk_client.user_information.return_value.level = 2
+    mocked_wk_client.assignments.return_value = [
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW - datetime.timedelta(hours=2)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW - datetime.timedelta(minutes=30)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(hours=1)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=None),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW, hidden=True),
+        MockedAssignment(subject_id=3, started_at=NOW, available_at=NOW),
+        MockedAssignment(subject_id=4, started_at=NOW, available_at=NOW),
+        MockedAssignment(subject_id=2, created_at=NOW - datetime.timedelta(hours=2)),
+        MockedAssignment(subject_id=2, created_at=NOW - datetime.timedelta(minutes=30)),
+    ]
+    snapshot, all_subjects = snapshot_of(mocked_wk_client,
+                                         {1: SubjectInfo(1, 1, 0.0), 2: SubjectInfo(2, 2, 0.0), 3: SubjectInfo(3, 3, 0.0)},
+                                         sqlite)
+
+    available_since_an_hour = get_available_assignments(snapshot, all_subjects,
+                                                        end=NOW, start=NOW - datetime.timedelta(hours=1))
+    all_available = get_available_assignments(snapshot, all_subjects, end=NOW)
+
+    assert available_since_an_hour == AvailableAssignments(reviews=1, lessons=1)
+    assert all_available == AvailableAssignments(reviews=2, lessons=2)
+    mocked_wk_client.assignments.assert_called_once()
+    mocked_wk_client.user_information.assert_called_once()
+
+
+@pytest.mark.parametrize("sqlite", [False, True])
+def test_get_next_available_time(mocked_wk_client, cache_folder, sqlite):
+    mocked_wk_client.user_information.return_value.level = 1
+    mocked_wk_client.assignments.return_value = [
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW - datetime.timedelta(hours=1)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(hours=3)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(hours=2)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(hours=1), hidden=True),
+        MockedAssignment(subject_id=2, started_at=NOW, available_at=NOW + datetime.timedelta(hours=1)),
+    ]
+    snapshot, all_subjects = snapshot_of(mocked_wk_client, {1: SubjectInfo(1, 1, 0.0), 2: SubjectInfo(2, 2, 0.0)}, sqlite)
+
+    next_available_time = get_next_available_time(snapshot, all_subjects, after=NOW)
+
+    assert next_available_time == NOW + datetime.timedelta(hours=2)
+
+
+def hours_from(start: datetime.datetime, hours: int) -> List[datetime.datetime]:
+    return [start + datetime.timedelta(hours=h) for h in range(hours + 1)]
+
+
+@pytest.mark.parametrize("sqlite", [False, True])
+def test_get_review_forecast(mocked_wk_client, cache_folder, sqlite):
+    mocked_wk_client.user_information.return_value.level = 1
+    mocked_wk_client.assignments.return_value = [
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW - datetime.timedelta(minutes=30)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(minutes=30)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(hours=2)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(hours=2, minutes=59)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(hours=3)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(hours=1), hidden=True),
+        MockedAssignment(subject_id=2, started_at=NOW, available_at=NOW + datetime.timedelta(hours=1)),
+        MockedAssignment(subject_id=1, created_at=NOW + datetime.timedelta(hours=1)),
+    ]
+    snapshot, all_subjects = snapshot_of(mocked_wk_client, {1: SubjectInfo(1, 1, 0.0), 2: SubjectInfo(2, 2, 0.0)}, sqlite)
+
+    forecast = get_review_forecast(snapshot, all_subjects, boundaries=hours_from(NOW - datetime.timedelta(hours=1), 4),
+                                   after=NOW)
+    uneven_forecast = get_review_forecast(snapshot, all_subjects, boundaries=[NOW, NOW + datetime.timedelta(hours=2),
+                                                                              NOW + datetime.timedelta(hours=5)])
+
+    assert forecast == [0, 1, 0, 2]
+    assert uneven_forecast == [1, 3]
+    mocked_wk_client.assignments.assert_called_once()
+
+
+def test_available_assignments_from_summary(mocked_wk_client, cache_folder):
+    mocked_wk_client.summary.return_value = summary_of(lessons=3, reviews_per_hour=[5] + [1] * 24, next_reviews_at=NOW)
+    snapshot = AssignmentsSnapshot(mocked_wk_client, use_summary=True)
+
+    all_available = get_available_assignments(snapshot, {}, end=NOW + datetime.timedelta(minutes=30))
+    all_available_later = get_available_assignments(snapshot, {}, end=NOW + datetime.timedelta(hours=2))
+
+    assert all_available == AvailableAssignments(reviews=5, lessons=3)
+    assert all_available_later == AvailableAssignments(reviews=7, lessons=3)
+    mocked_wk_client.summary.assert_called_once()
+    mocked_wk_client.assignments.assert_not_called()
+    mocked_wk_client.user_information.assert_not_called()
+
+
+def test_available_assignments_since_falls_back_from_summary(mocked_wk_client, cache_folder):
+    mocked_wk_client.summary.return_value = summary_of(lessons=3, reviews_per_hour=[5] + [1] * 24, next_reviews_at=NOW)
+    mocked_wk_client.user_information.return_value.level = 1
+    mocked_wk_client.assignments.return_value = [
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW - datetime.timedelta(hours=2)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW),
+    ]
+    snapshot = AssignmentsSnapshot(mocked_wk_client, use_summary=True)
+
+    available = get_available_assignments(snapshot, {1: SubjectInfo(1, 1, 0.0)},
+                                          end=NOW, start=NOW - datetime.timedelta(hours=1))
+    available_beyond_summary = get_available_assignments(snapshot, {1: SubjectInfo(1, 1, 0.0)},
+                                                         end=NOW + datetime.timedelta(days=2))
+
+    assert available == AvailableAssignments(reviews=1, lessons=0)
+    assert available_beyond_summary == AvailableAssignments(reviews=2, lessons=0)
+    mocked_wk_client.assignments.assert_called_once()
+
+
+@pytest.mark.parametrize("reviews_per_hour, next_reviews_at, expected_next_available_time", [
+    ([5, 0, 2] + [0] * 22, NOW, NOW + datetime.timedelta(hours=2)),
+    ([0] * 25, NOW + datetime.timedelta(days=3), NOW + datetime.timedelta(days=3)),
+    ([0] * 25, None, None),
+])
+def test_get_next_available_time_from_summary(mocked_wk_client, cache_folder, reviews_per_hour, next_reviews_at,
+                                              expected_next_available_time):
+    mocked_wk_client.summary.return_value = summary_of(lessons=0, reviews_per_hour=reviews_per_hour,
+                                                       next_reviews_at=next_reviews_at)
+
+    next_available_time = get_next_available_time(AssignmentsSnapshot(mocked_wk_client, use_summary=True), {},
+                                                  after=NOW + datetime.timedelta(minutes=10))
+
+    assert next_available_time == expected_next_available_time
+    mocked_wk_client.assignments.assert_not_called()
+
+
+def test_get_next_available_time_beyond_summary(mocked_wk_client, cache_folder):
+    mocked_wk_client.summary.return_value = summary_of(lessons=0, reviews_per_hour=[5] + [0] * 24, next_reviews_at=NOW)
+    mocked_wk_client.user_information.return_value.level = 1
+    mocked_wk_client.assignments.return_value = [
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(days=2)),
+    ]
+
+    next_available_time = get_next_available_time(AssignmentsSnapshot(mocked_wk_client, use_summary=True),
+                                                  {1: SubjectInfo(1, 1, 0.0)}, after=NOW)
+
+    assert next_available_time == NOW + datetime.timedelta(days=2)
+
+
+def test_get_review_forecast_from_summary(mocked_wk_client, cache_folder):
+    mocked_wk_client.summary.return_value = summary_of(lessons=0, reviews_per_hour=[5, 1, 0, 2] + [1] * 21,
+                                                       next_reviews_at=NOW)
+    mocked_wk_client.assignments.return_value = []
+    snapshot = AssignmentsSnapshot(mocked_wk_client, use_summary=True)
+
+    hourly = get_review_forecast(snapshot, {}, boundaries=hours_from(NOW, 4), after=NOW + datetime.timedelta(minutes=10))
+    get_review_forecast(snapshot, {}, boundaries=[NOW + datetime.timedelta(days=d) for d in range(8)], after=NOW)
+
+    assert hourly == [0, 1, 0, 2]
+    mocked_wk_client.summary.assert_called_once()
+    mocked_wk_client.assignments.assert_called_once()
+
+
+def test_assignment_columns():
+    columns = AssignmentColumns([
+        AssignmentInfo(1, subject_id=1, created_at=0.0, available_at=10.0, started=True, unlocked=True, hidden=False,
+                       data_updated_at=0.0),
+        AssignmentInfo(2, subject_id=2, created_at=0.0, available_at=20.0, started=True, unlocked=True, hidden=False,
+                       data_updated_at=0.0),
+        AssignmentInfo(3, subject_id=1, created_at=0.0, available_at=30.0, started=True, unlocked=True, hidden=True,
+                       data_updated_at=0.0),
+        AssignmentInfo(4, subject_id=1, created_at=0.0, available_at=None, started=True, unlocked=True, hidden=False,
+                       data_updated_at=0.0),
+        AssignmentInfo(5, subject_id=3, created_at=15.0, available_at=None, started=False, unlocked=True, hidden=False,
+                       data_updated_at=0.0),
+    ])
+    all_subjects = {1: SubjectInfo(1, 1, 0.0), 2: SubjectInfo(2, 2, 0.0)}
+
+    assert list(columns.review_times) == [10.0, 20.0]
+    assert list(columns.lesson_times) == [15.0]
+    assert columns.count_reviews(all_subjects, user_level=2, end=20.0) == 2
+    assert columns.count_reviews(all_subjects, user_level=1, end=20.0) == 1
+    assert columns.count_reviews(all_subjects, user_level=2, end=20.0, start=15.0) == 1
+    assert columns.count_reviews({1: SubjectInfo(1, 1, 0.0)}, user_level=2, end=20.0) == 1
+    assert columns.count_lessons(end=20.0, start=15.0) == 1
+    assert columns.count_lessons(end=10.0) == 0
+
+
+def test_snapshot_columns_built_once_without_keeping_records(mocked_wk_client, cache_folder):
+    mocked_wk_client.assignments.return_value = [
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW),
+        MockedAssignment(subject_id=1, unlocked_at=None),
+    ]
+    snapshot = AssignmentsSnapshot(mocked_wk_client)
+
+    columns = snapshot.columns
+
+    assert snapshot.columns is columns
+    assert len(columns.review_times) == 1
+    mocked_wk_client.assignments.assert_called_once()
+
+
+@pytest.mark.parametrize("min_assignments, since, expected_next_notification_time", [
+    (1, None, NOW + datetime.timedelta(hours=1)),
+    (5, None, NOW + datetime.timedelta(hours=2)),
+    (10, None, None),
+    (2, datetime.timedelta(hours=1), NOW + datetime.timedelta(hours=2)),
+    (3, datetime.timedelta(hours=1), None),
+])
+@pytest.mark.parametrize("sqlite", (False, True))
+def test_get_next_notification_time(mocked_wk_client, cache_folder, min_assignments, since,
+                                    expected_next_notification_time, sqlite):
+    mocked_wk_client.user_information.return_value.level = 1
+    mocked_wk_client.assignments.return_value = [
+        MockedAssignment(subject_id=1),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW - datetime.timedelta(hours=1)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(hours=1)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(hours=2)),
+        MockedAssignment(subject_id=1, started_at=NOW, available_at=NOW + datetime.timedelta(hours=2)),
+        MockedAssignment(subject_id=2, started_at=NOW, available_at=NOW + datetime.timedelta(hours=3)),
+    ]
+    snapshot, all_subjects = snapshot_of(mocked_wk_client, {1: SubjectInfo(1, 1, 0.0), 2: SubjectInfo(2, 2, 0.0)},
+                                         sqlite)
+
+    next_notification_time = get_next_notification_time(snapshot, all_subjects,
+                                                        after=NOW, min_assignments=min_assignments, since=since)
+
+    assert next_notification_time == expected_next_notification_time
+    assert (snapshot._columns is None) == sqlite
+
+
+def test_get_next_notification_time_from_summary(mocked_wk_client, cache_folder):
+    mocked_wk_client.summary.return_value = summary_of(lessons=2, reviews_per_hour=[3, 0, 4, 1] + [0] * 21,
+                                                       next_reviews_at=NOW)
+    snapshot = AssignmentsSnapshot(mocked_wk_client, use_summary=True)
+
+    assert get_next_notification_time(snapshot, {}, after=NOW, min_assignments=9) == NOW + datetime.timedelta(hours=2)
+    assert get_next_notification_time(snapshot, {}, after=NOW, min_assignments=1) == NOW + datetime.timedelta(hours=2)
+    mocked_wk_client.assignments.assert_not_called()
+
+
+def test_stored_assignments_full_resync_when_outdated(mocked_wk_client, cache_folder, mocker: MockerFixture):
+    store = SqliteStore.default()
+    mocked_wk_client.assignments.return_value = [MockedAssignment(subject_id=1), MockedAssignment(subject_id=2)]
+    snapshot = AssignmentsSnapshot(mocked_wk_client, store=store)
+    assert len(snapshot.synced_store.get_assignments(snapshot.account)) == 2
+    mocked_wk_client.assignments.return_value = [MockedAssignment(subject_id=3)]
+    mocked_time = mocker.patch("wanikani_notifier.wanikani.time")
+    mocked_time.time.return_value = time.time() + ASSIGNMENTS_FULL_RESYNC_PERIOD.total_seconds()
+
+    snapshot = AssignmentsSnapshot(mocked_wk_client, store=store)
+    assignments = [AssignmentInfo(*a) for a in snapshot.synced_store.get_assignments(snapshot.account)]
+
+    assert mocked_wk_client.assignments.call_args[1]["updated_after"] == FULL_SYNC_UPDATED_AFTER
+    assert [a.subject_id for a in assignments] == [3]
+
+
+def test_get_next_available_time_none(mocked_wk_client, cache_folder):
+    mocked_wk_client.assignments.return_value = []
+
+    assert get_next_available_time(AssignmentsSnapshot(mocked_wk_client), {}, after=NOW) is None
+
+
 def test_get_message_no_new_reviews_no_new_lessons():
     message = get_notification_message(AvailableAssignments(reviews=0, lessons=0))
 
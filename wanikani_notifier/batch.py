@@ -0,0 +1,165 @@
+import logging
+import shlex
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, IO, Mapping
+
+import click
+import requests
+import ujson as ujson
+
+from wanikani_notifier import cache, ratelimit, transport
+from wanikani_notifier.cli import Context, build_processors, run_processors
+from wanikani_notifier.client import build_client
+from wanikani_notifier.options import wanikani_options
+from wanikani_notifier.outbox import Outbox
+from wanikani_notifier.state import NotificationState
+from wanikani_notifier.store import SqliteStore, SQLITE_STORE
+from wanikani_notifier.wanikani import get_all_subjects, AssignmentsSnapshot, SubjectInfo
+
+Account = namedtuple("Account", ("name", "wanikani", "processors", "stop_if_empty", "notify_changes_only",
+                                 "min_increase", "outbox"),
+                     defaults=(False, 1, False))
+
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.argument("config", type=click.File("r"))
+@click.option("--workers",
+              type=click.IntRange(min=1),
+              default=8,
+              help="Maximum number of accounts processed at the same time",
+              show_default=True
+              )
+@wanikani_options()
+def batch(config: IO, workers: int, http_timeout: float, http_retries: int, rate_limit: int, shared_rate_limit: bool,
+          cache_dir: Optional[str], store: str, summary: bool):
+    """
+    Runs the chained commands of all the WaniKani accounts described in the CONFIG JSON file.
+
+    The subjects are synced once for all the accounts, which are then processed concurrently.
+    """
+    accounts = load_accounts(ujson.load(config))
+    if not accounts:
+        return
+
+    cache.set_cache_folder(cache_dir)
+    session = transport.build_session(timeout=http_timeout, retries=http_retries, pool_size=workers)
+    subjects_client = build_client(accounts[0].wanikani, session, rate_limit, shared_rate_limit)
+    sqlite_store = SqliteStore.default() if store == SQLITE_STORE else None
+    all_subjects = get_all_subjects(subjects_client, store=sqlite_store)
+
+    failures = process_accounts(accounts, all_subjects, session, workers, store=sqlite_store,
+                                rate_limit=rate_limit, shared_rate_limit=shared_rate_limit, summary=summary)
+    if failures:
+        raise click.ClickException(f"{len(failures)} out of {len(accounts)} accounts failed: {', '.join(failures)}")
+
+
+def load_accounts(config: Dict[str, Any]) -> List[Account]:
+    """
+    Loads the accounts described by a batch configuration.
+
+    Each account provides its WaniKani API token, the chain of commands to run, written as on the command line,
+    and optionally the notifiers to notify through at the end of the chain, Pushover accepting a list of
+    [app token, user token] pairs to notify several users, e.g.::
+
+        {
+            "accounts": [
+                {
+                    "name": "someone",
+                    "wanikani": "__TOKEN__",
+                    "chain": "available_assignments_now --since 1 all_available_assignments",
+                    "notify": {"pushover": ["__APP_TOKEN__", "__USER_TOKEN__"], "pushsafer": "__KEY__", "console": true},
+                    "stop_if_empty": true,
+                    "notify_changes_only": true,
+                    "min_increase": 1,
+                    "outbox": true
+                }
+            ]
+        }
+
+    :param config: Batch configuration.
+    :return: the accounts to process.
+    :raises click.UsageError: if the chain of an account is not valid.
+    """
+    accounts = []
+    for index, account_config in enumerate(config.get("accounts", [])):
+        chain = account_config.get("chain", [])
+        args = shlex.split(chain) if isinstance(chain, str) else list(chain)
+        args += _notify_args(account_config.get("notify"))
+        accounts.append(Account(name=account_config.get("name", str(index)),
+                                wanikani=account_config["wanikani"],
+                                processors=build_processors(args),
+                                stop_if_empty=account_config.get("stop_if_empty", True),
+                                notify_changes_only=account_config.get("notify_changes_only", False),
+                                min_increase=account_config.get("min_increase", 1),
+                                outbox=account_config.get("outbox", False)))
+
+    return accounts
+
+
+def _notify_args(notify_config: Optional[Dict[str, Any]]) -> List[str]:
+    if not notify_config:
+        return []
+
+    args = ["notify"]
+    if notify_config.get("pushsafer"):
+        args += ["--pushsafer", notify_config["pushsafer"]]
+    pushover = notify_config.get("pushover")
+    if pushover:
+        for app_token, user_token in (pushover if isinstance(pushover[0], list) else [pushover]):
+            args += ["--pushover", app_token, user_token]
+    if notify_config.get("console"):
+        args += ["--console"]
+    return args
+
+
+def process_accounts(accounts: List[Account],
+                     all_subjects: Mapping[int, SubjectInfo],
+                     session: requests.Session,
+                     workers: int,
+                     store: Optional[SqliteStore] = None,
+                     rate_limit: int = ratelimit.DEFAULT_REQUESTS_PER_MINUTE,
+                     shared_rate_limit: bool = True,
+                     summary: bool = True
+                     ) -> List[str]:
+    """
+    Runs the chained commands of all the provided accounts concurrently.
+
+    :param accounts: Accounts to process.
+    :param all_subjects: Subjects known to WaniKani, shared by all the accounts.
+    :param session: HTTP session shared by all the accounts.
+    :param workers: Maximum number of accounts processed at the same time.
+    :param store: SQLite store shared by all the accounts, if any.
+    :param rate_limit: Maximum number of WaniKani requests per minute and API token.
+    :param shared_rate_limit: Whether the rate limits are shared with other processes.
+    :param summary: Whether the counts covered by WaniKani's summary are read from it.
+    :return: the names of the accounts that failed.
+    """
+    def process(account: Account) -> Optional[str]:
+        try:
+            process_account(account, all_subjects, session, store, rate_limit, shared_rate_limit, summary)
+        except Exception:
+            logger.exception("Failed to process account %s", account.name)
+            return account.name
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return [name for name in executor.map(process, accounts) if name is not None]
+
+
+def process_account(account: Account, all_subjects: Mapping[int, SubjectInfo], session: requests.Session,
+                    store: Optional[SqliteStore] = None,
+                    rate_limit: int = ratelimit.DEFAULT_REQUESTS_PER_MINUTE,
+                    shared_rate_limit: bool = True, summary: bool = True) -> None:
+    wanikani_client = build_client(account.wanikani, session, rate_limit, shared_rate_limit)
+    context = Context(wanikani_client=wanikani_client,
+                      all_subjects=all_subjects,
+                      snapshot=AssignmentsSnapshot(wanikani_client, store=store, use_summary=summary),
+                      notifiers={},
+                      session=session,
+                      stop_if_empty=account.stop_if_empty,
+                      notification_state=(NotificationState.for_token(account.wanikani, account.min_increase)
+                                          if account.notify_changes_only else None),
+                      outbox=Outbox.for_token(account.wanikani) if account.outbox else None)
+    run_processors(context, account.processors)
@@ -0,0 +1,242 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Optional, Dict, IO, Iterator
+
+import ujson as ujson
+
+try:
+    import fcntl
+except ImportError:  # pragma: nocover
+    fcntl = None
+
+CACHE_DIR_ENV_VAR = "WANIKANI_NOTIFIER_CACHE_DIR"
+CACHE_FOLDER_NAME = "wanikani_notifier"
+LEGACY_CACHE_FOLDER = "data"
+
+CONDITIONAL_REQUESTS_CACHED_FILENAME = "conditional-requests-{}.json.gz"
+CONDITIONAL_REQUESTS_CACHE_VERSION = 1
+CONDITIONAL_REQUESTS_RETENTION = timedelta(days=7)
+
+_configured_cache_folder: Optional[str] = None
+
+
+def set_cache_folder(folder: Optional[str]) -> None:
+    """
+    Sets the folder all the cache files are stored in, for the whole process.
+
+    :param folder: Path of the cache folder, None to fall back to the default one.
+    """
+    global _configured_cache_folder
+    _configured_cache_folder = folder
+
+
+def cache_folder() -> str:
+    """
+    Gets the folder all the cache files are stored in, which is, in order of precedence, the one that was set,
+    the one given by the WANIKANI_NOTIFIER_CACHE_DIR environment variable, or the wanikani_notifier folder of the
+    XDG cache directory (~/.cache by default).
+    """
+    if _configured_cache_folder:
+        return _configured_cache_folder
+    if os.environ.get(CACHE_DIR_ENV_VAR):
+        return os.environ[CACHE_DIR_ENV_VAR]
+
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(xdg_cache_home, CACHE_FOLDER_NAME)
+
+
+def legacy_cache_path(filename: str) -> Optional[str]:
+    """
+    Gets the path of a file cached by previous versions in the data folder of the working directory, the cache folder
+    before it became configurable, if that file exists and the cache folder is now another one.
+
+    :param filename: Name of the cached file.
+    :return: the path of the file cached by previous versions, if any.
+    """
+    path = os.path.join(LEGACY_CACHE_FOLDER, filename)
+    if os.path.abspath(LEGACY_CACHE_FOLDER) == os.path.abspath(cache_folder()) or not os.path.exists(path):
+        return None
+    return path
+
+
+def cache_path(filename: str) -> str:
+    """
+    Gets the path of a file stored in the cache folder, creating the folder if need be.
+
+    :param filename: Name of the cached file.
+    :return: the path of the cached file.
+    """
+    folder = cache_folder()
+    os.makedirs(folder, exist_ok=True)
+
+    return os.path.join(folder, filename)
+
+
+def token_digest(token: str) -> str:
+    """
+    Gets a digest of an API token, to name the cache files of a user without exposing their token.
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+def load_versioned(path: str, version: int) -> Optional[Any]:
+    """
+    Loads the content of a compressed and versioned cache file.
+
+    :param path: Path of the cache file to load.
+    :param version: Schema version the content must have been written with.
+    :return: the cached content if the file exists and has the expected version, None otherwise.
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as cache_file:
+            cached = ujson.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(cached, dict) or cached.get("version") != version:
+        return None
+
+    return cached.get("content")
+
+
+def dump_versioned(path: str, version: int, content: Any) -> None:
+    """
+    Writes some content to a compressed and versioned cache file, replacing it atomically.
+
+    Iterators found in the content, directly or as values of dictionaries, are streamed to the file item by item,
+    so that large collections of records never need to be serialized at once.
+
+    :param path: Path of the cache file to write.
+    :param version: Schema version of the content.
+    :param content: JSON serializable content to cache.
+    """
+    with atomic_open(path, "wb") as raw_file, gzip.open(raw_file, "wt", encoding="utf-8") as cache_file:
+        _write_json(cache_file, {"version": version, "content": content})
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = "w") -> Iterator[IO]:
+    """
+    Opens a temporary file next to the provided path, which replaces it once the wrapped block succeeds.
+
+    Readers and concurrent writers thus either see the previous file or the complete new one, never a truncated one.
+    The temporary file is removed if the wrapped block fails.
+
+    :param path: Path of the file to write.
+    :param mode: Mode of the opened file, either text or binary.
+    """
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary_path, mode.replace("w", "x")) as temporary_file:
+            yield temporary_file
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    Holds an exclusive lock on a file while in the wrapped block, so that processes sharing the file take turns.
+
+    Locking is only supported where fcntl is available. Elsewhere, the block runs without any lock.
+
+    :param path: Path of the lock file, created if need be.
+    """
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _write_json(stream: IO[str], content: Any) -> None:
+    if isinstance(content, dict):
+        stream.write("{")
+        for index, (key, value) in enumerate(content.items()):
+            stream.write(f'{"," if index else ""}{ujson.dumps(str(key))}:')
+            _write_json(stream, value)
+        stream.write("}")
+    elif isinstance(content, Iterator):
+        stream.write("[")
+        for index, item in enumerate(content):
+            stream.write(f'{"," if index else ""}{ujson.dumps(item)}')
+        stream.write("]")
+    else:
+        stream.write(ujson.dumps(content))
+
+
+class ConditionalRequestsCache:
+    """
+    Validators and content of the last responses received per URL, persisted between runs.
+
+    They allow requests to be made conditional, so that the server answers with an empty "304 Not Modified"
+    response when the content did not change.
+    Entries that were not stored again for CONDITIONAL_REQUESTS_RETENTION are dropped.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._entries: Optional[Dict[str, dict]] = None
+
+    @classmethod
+    def for_token(cls, token: str) -> "ConditionalRequestsCache":
+        return cls(cache_path(CONDITIONAL_REQUESTS_CACHED_FILENAME.format(token_digest(token))))
+
+    def get(self, url: str) -> Optional[dict]:
+        """
+        Gets the entry stored for a URL.
+
+        :param url: URL that was requested.
+        :return: a dictionary with the "etag" and "last_modified" validators and the "content" of the response,
+                    None if nothing is stored for this URL.
+        """
+        return self._load().get(url)
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], content: Any) -> None:
+        """
+        Stores the validators and content of the response received for a URL.
+
+        The cache file is left untouched when the same response was already stored recently. Otherwise, it is
+        loaded again and written while locked, so that the responses stored meanwhile by other processes are kept.
+
+        :param url: URL that was requested.
+        :param etag: Value of the ETag header of the response, if any.
+        :param last_modified: Value of the Last-Modified header of the response, if any.
+        :param content: JSON content of the response.
+        """
+        now = time.time()
+        entry = self._load().get(url)
+        if (entry and (entry["etag"], entry["last_modified"], entry["content"]) == (etag, last_modified, content)
+                and now - entry["stored_at"] < CONDITIONAL_REQUESTS_RETENTION.total_seconds() / 2):
+            return
+
+        with file_lock(f"{self._path}.lock"):
+            self._entries = None
+            entries = self._load()
+            for outdated_url in [u for u, e in entries.items()
+                                 if now - e["stored_at"] > CONDITIONAL_REQUESTS_RETENTION.total_seconds()]:
+                del entries[outdated_url]
+            entries[url] = {"etag": etag, "last_modified": last_modified, "content": content, "stored_at": now}
+
+            dump_versioned(self._path, CONDITIONAL_REQUESTS_CACHE_VERSION, entries)
+
+    def _load(self) -> Dict[str, dict]:
+        if self._entries is None:
+            self._entries = load_versioned(self._path, CONDITIONAL_REQUESTS_CACHE_VERSION) or {}
+        return self._entries
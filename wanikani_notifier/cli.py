@@ -1,19 +1,26 @@
+import cProfile
+import logging
+import time
 from collections import namedtuple
 from datetime import datetime, timedelta
 from functools import update_wrapper
-from typing import Optional, Generator, Any, Callable, Tuple, List, Dict
+from typing import Optional, Generator, Any, Callable, Tuple, List, Mapping, Dict, Sequence
 
 import click
-from wanikani_api.client import Client as WaniKaniClient
-from wanikani_api.models import Subject
+import pytz
 
+from wanikani_notifier import cache, transport
+from wanikani_notifier.client import build_client
+from wanikani_notifier.metrics import metrics, JSON_FORMAT, PROMETHEUS_FORMAT
 from wanikani_notifier.notifiers import notifier
-from wanikani_notifier.notifiers.console import ConsoleNotifier
-from wanikani_notifier.notifiers.notifier import Notifier
-from wanikani_notifier.notifiers.pushover import PushoverNotifier
-from wanikani_notifier.notifiers.pushsafer import PushSaferNotifier
-from wanikani_notifier.wanikani import get_all_subjects
-from wanikani_notifier.wanikani import get_notification_message, get_available_assignments
+from wanikani_notifier.notifiers.notifier import Notifier, NotificationResult
+from wanikani_notifier.options import wanikani_options
+from wanikani_notifier.outbox import Outbox, Delivery, notifier_id as outbox_notifier_id
+from wanikani_notifier.state import NotificationState
+from wanikani_notifier.store import SqliteStore, SQLITE_STORE
+from wanikani_notifier.wanikani import get_all_subjects, SubjectInfo, AssignmentsSnapshot
+from wanikani_notifier.wanikani import get_notification_message, get_available_assignments, get_next_available_time
+from wanikani_notifier.wanikani import get_review_forecast, get_next_notification_time
 
 
 def processor(f: Callable):
@@ -27,10 +34,24 @@ def processor(f: Callable):
 
 
 def generator(f: Callable):
+    """
+    Turns a command generating messages into a processor adding them to the message stream.
+
+    When the chain stops as soon as a command has nothing to notify, the command is not even evaluated once
+    a previous command had nothing to notify, since its message would be dropped anyway.
+    """
     @processor
     def new_func(context: Context, message_stream: str, *args, **kwargs) -> Generator[str, Any, None]:
-        yield from message_stream
-        yield from f(context, *args, **kwargs)
+        previous_messages = list(message_stream)
+        yield from previous_messages
+        if context.stop_if_empty and not all(previous_messages):
+            metrics.increment(f"command.{f.__name__}.skipped")
+            yield None
+            return
+
+        with metrics.timed(f"command.{f.__name__}"):
+            messages = list(f(context, *args, **kwargs))
+        yield from messages
 
     return update_wrapper(new_func, f)
 
@@ -41,20 +62,122 @@ def generator(f: Callable):
               default=True,
               help="Determines whether chaining occurs when one command does not trigger a new message to notify"
               )
-def cli(wanikani: str, stop_if_empty: bool):
+@click.option("--daemon/--once",
+              default=False,
+              help="Determines whether the commands are evaluated once or continuously until interrupted"
+              )
+@click.option("--min-interval",
+              type=click.IntRange(min=1),
+              default=1,
+              help="Minimum number of minutes between two evaluations in daemon mode",
+              show_default=True
+              )
+@click.option("--max-interval",
+              type=click.IntRange(min=1),
+              default=60,
+              help="Maximum number of minutes between two evaluations in daemon mode",
+              show_default=True
+              )
+@wanikani_options()
+@click.option("--notify-changes-only/--notify-always",
+              default=False,
+              help="Determines whether a command generates its message again when its counts did not rise since the "
+                   "last run that notified it"
+              )
+@click.option("--min-increase",
+              type=click.IntRange(min=0),
+              default=1,
+              help="Minimum increase of the number of assignments for a message to be notified again when notifying "
+                   "changes only, 0 meaning any change",
+              show_default=True
+              )
+@click.option("--outbox/--no-outbox",
+              default=False,
+              help="Determines whether messages are queued on disk before being notified, so that failed notifications "
+                   "are retried on later runs"
+              )
+@click.option("--metrics",
+              "metrics_path",
+              type=click.Path(dir_okay=False, writable=True),
+              required=False,
+              help="File to write the timings of each stage and the number of requests and cache hits to"
+              )
+@click.option("--metrics-format",
+              type=click.Choice([JSON_FORMAT, PROMETHEUS_FORMAT]),
+              default=JSON_FORMAT,
+              help="Format of the metrics file, Prometheus' one being suited to the textfile collector",
+              show_default=True
+              )
+@click.option("--profile",
+              type=click.Path(dir_okay=False, writable=True),
+              required=False,
+              help="File to dump a cProfile profile of the whole run to"
+              )
+def cli(wanikani: str, stop_if_empty: bool, daemon: bool, min_interval: int, max_interval: int,
+        http_timeout: float, http_retries: int, rate_limit: int, shared_rate_limit: bool,
+        notify_changes_only: bool, min_increase: int, outbox: bool, cache_dir: Optional[str], store: str,
+        summary: bool, metrics_path: Optional[str], metrics_format: str, profile: Optional[str]):
     pass  # pragma: nocover
 
 
-Context = namedtuple("Context", ("wanikani_client", "all_subjects", "stop_if_empty"))
+Context = namedtuple("Context", ("wanikani_client", "all_subjects", "snapshot", "notifiers", "session",
+                                 "stop_if_empty", "notification_state", "outbox"),
+                     defaults=(None, None))
+
+SUBJECTS_REFRESH_PERIOD = timedelta(days=1)
+ISO_FORMAT = "iso"
+EPOCH_FORMAT = "epoch"
+SYSTEMD_FORMAT = "systemd"
+AT_FORMAT = "at"
+NOTIFICATION_TITLE = "WaniKani"
+NOTIFICATION_URL = "https://www.wanikani.com/dashboard"
+
+logger = logging.getLogger(__name__)
 
 
 @cli.resultcallback()
-def process_all(processors, wanikani: str, stop_if_empty: bool):
-    wanikani_client = WaniKaniClient(wanikani)
-    context = Context(wanikani_client=wanikani_client,
-                      all_subjects=get_all_subjects(wanikani_client),
-                      stop_if_empty=stop_if_empty)
+def process_all(processors, wanikani: str, stop_if_empty: bool, daemon: bool, min_interval: int, max_interval: int,
+                http_timeout: float, http_retries: int, rate_limit: int, shared_rate_limit: bool,
+                notify_changes_only: bool, min_increase: int, outbox: bool, cache_dir: Optional[str], store: str,
+                summary: bool, metrics_path: Optional[str], metrics_format: str, profile: Optional[str]):
+    def export_metrics():
+        if metrics_path:
+            metrics.write(metrics_path, metrics_format)
+        metrics.reset()
+
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+    metrics.reset()
+    cache.set_cache_folder(cache_dir)
+    try:
+        session = transport.build_session(timeout=http_timeout, retries=http_retries)
+        wanikani_client = build_client(wanikani, session, rate_limit, shared_rate_limit)
+        sqlite_store = SqliteStore.default() if store == SQLITE_STORE else None
+        context = Context(wanikani_client=wanikani_client,
+                          all_subjects=get_all_subjects(wanikani_client, store=sqlite_store),
+                          snapshot=AssignmentsSnapshot(wanikani_client, store=sqlite_store, use_summary=summary),
+                          notifiers={},
+                          session=session,
+                          stop_if_empty=stop_if_empty,
+                          notification_state=(NotificationState.for_token(wanikani, min_increase)
+                                              if notify_changes_only else None),
+                          outbox=Outbox.for_token(wanikani) if outbox else None)
+
+        if daemon:
+            run_daemon(context, processors,
+                       timedelta(minutes=min_interval), timedelta(minutes=max(min_interval, max_interval)),
+                       after_evaluation=export_metrics)
+        else:
+            run_processors(context, processors)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        export_metrics()
+
 
+def run_processors(context: Context, processors: List[Callable]) -> None:
     message_stream = ()
     for processor in processors:
         message_stream = processor(context, message_stream)
@@ -62,6 +185,67 @@ def process_all(processors, wanikani: str, stop_if_empty: bool):
     for _ in message_stream:
         pass
 
+    if context.notification_state is not None:
+        context.notification_state.save()
+
+
+def build_processors(args: List[str]) -> List[Callable]:
+    """
+    Builds the processors corresponding to a chain of commands, as they would be given on the command line.
+
+    :param args: Arguments of the chained commands, without the options of the main command.
+    :return: the processors to run.
+    :raises click.UsageError: if the chain of commands is not valid.
+    """
+    context = click.Context(cli, info_name=cli.name)
+    processors = []
+    while args:
+        command_name, command, args = cli.resolve_command(context, args)
+        command_context = command.make_context(command_name, args, parent=context,
+                                               allow_extra_args=True, allow_interspersed_args=False)
+        args, command_context.args = command_context.args, []
+        with command_context:
+            processors.append(command.invoke(command_context))
+
+    return processors
+
+
+def run_daemon(context: Context, processors: List[Callable], min_interval: timedelta, max_interval: timedelta,
+               after_evaluation: Callable[[], None] = lambda: None) -> None:
+    """
+    Evaluates the processors continuously until interrupted, keeping the subjects and notifiers in memory.
+
+    Between two evaluations, sleeps until the next review becomes available, within the provided bounds.
+    """
+    subjects_refreshed_at = datetime.utcnow()
+    try:
+        while True:
+            try:
+                if datetime.utcnow() - subjects_refreshed_at >= SUBJECTS_REFRESH_PERIOD:
+                    context = context._replace(all_subjects=get_all_subjects(context.wanikani_client,
+                                                                             store=context.snapshot.store))
+                    subjects_refreshed_at = datetime.utcnow()
+                run_processors(context, processors)
+                delay = next_evaluation_delay(context, min_interval, max_interval)
+            except Exception:
+                logger.exception("Failed to evaluate the commands, retrying later")
+                delay = min_interval
+            after_evaluation()
+
+            time.sleep(delay.total_seconds())
+            context = context._replace(snapshot=context.snapshot.renewed())
+    except KeyboardInterrupt:
+        pass
+
+
+def next_evaluation_delay(context: Context, min_interval: timedelta, max_interval: timedelta) -> timedelta:
+    now = datetime.utcnow()
+    next_available_time = get_next_available_time(context.snapshot, context.all_subjects, after=now)
+    if next_available_time is None:
+        return max_interval
+
+    return min(max(next_available_time - now, min_interval), max_interval)
+
 
 @cli.command("available_assignments_now")
 @click.option(
@@ -82,34 +266,246 @@ def process_all(processors, wanikani: str, stop_if_empty: bool):
 )
 @generator
 def cli_available_assignments_now(context: Context, since: int, min_assignments: int):
-    yield available_assignments_now(context.wanikani_client, context.all_subjects, since, min_assignments)
+    # The same counts in windows ending at different times are about different assignments, so only
+    # the counts of all the available assignments are deduplicated
+    yield available_assignments_now(context.snapshot, context.all_subjects, since, min_assignments,
+                                    context.notification_state if since < 0 else None)
 
 
-def available_assignments_now(wanikani_client: WaniKaniClient, all_subjects: Dict[int, Subject],
-                              since: int, min_assignments: int):
+def available_assignments_now(snapshot: AssignmentsSnapshot, all_subjects: Mapping[int, SubjectInfo],
+                              since: int, min_assignments: int,
+                              notification_state: Optional[NotificationState] = None):
     current_time_rounded = datetime.utcnow()
     start_time = (current_time_rounded - (timedelta(hours=since) - timedelta(seconds=1)) if since >= 0 else None)
-    assignments_available_now = get_available_assignments(wanikani_client,
+    assignments_available_now = get_available_assignments(snapshot,
                                                           all_subjects,
                                                           start=start_time,
                                                           end=current_time_rounded
                                                           )
+    message = None
     if sum(assignments_available_now) >= min_assignments:
-        return get_notification_message(assignments_available_now, message_template="{} are now available!")
-    else:
-        return
+        message = get_notification_message(assignments_available_now, message_template="{} are now available!")
+    return deduplicate(notification_state, f"available_assignments_now --since {since} --min {min_assignments}",
+                       assignments_available_now, message)
 
 
 @cli.command("all_available_assignments")
 @generator
 def cli_all_available_assignments(context: Context):
-    yield all_available_assignments(context.wanikani_client, context.all_subjects)
+    yield all_available_assignments(context.snapshot, context.all_subjects, context.notification_state)
 
 
-def all_available_assignments(wanikani_client: WaniKaniClient, all_subjects: Dict[int, Subject]):
+def all_available_assignments(snapshot: AssignmentsSnapshot, all_subjects: Mapping[int, SubjectInfo],
+                              notification_state: Optional[NotificationState] = None):
     current_time_rounded = datetime.utcnow()
-    all_assignments_available = get_available_assignments(wanikani_client, all_subjects, end=current_time_rounded)
-    return get_notification_message(all_assignments_available, message_template="In total, there are {} to do.")
+    all_assignments_available = get_available_assignments(snapshot, all_subjects, end=current_time_rounded)
+    message = get_notification_message(all_assignments_available, message_template="In total, there are {} to do.")
+    return deduplicate(notification_state, "all_available_assignments", all_assignments_available, message)
+
+
+@cli.command("windows")
+@click.option("--hours",
+              type=click.IntRange(min=1),
+              multiple=True,
+              default=(1, 6),
+              help="Number of hours of a window of time ending now, in which the assignments that became available are "
+                   "reported (can be repeated)",
+              show_default=True
+              )
+@click.option("--total/--no-total",
+              default=True,
+              help="Determines whether all the available assignments are reported as well"
+              )
+@generator
+def cli_windows(context: Context, hours: Tuple[int, ...], total: bool):
+    yield windows(context.snapshot, context.all_subjects, hours, total)
+
+
+def windows(snapshot: AssignmentsSnapshot, all_subjects: Mapping[int, SubjectInfo], hours: Sequence[int],
+            total: bool = True) -> Optional[str]:
+    """
+    Creates a single message reporting the assignments that became available in several windows of time ending now,
+    all counted from the same snapshot.
+
+    Its message is never deduplicated, since the same counts in windows ending at different times are about
+    different assignments.
+
+    :param snapshot: Snapshot of the user's assignments to query.
+    :param all_subjects: Subjects known to WaniKani, indexed by their id.
+    :param hours: Number of hours of each window.
+    :param total: Whether all the available assignments are reported as well.
+    :return: the message if some assignments are available in any window, None otherwise.
+    """
+    now = datetime.utcnow()
+    hours = list(dict.fromkeys(hours))
+    counts = [(f"in the last {h}h",
+               get_available_assignments(snapshot, all_subjects, start=now - (timedelta(hours=h) - timedelta(seconds=1)),
+                                         end=now))
+              for h in hours]
+    if total:
+        counts.append(("in total", get_available_assignments(snapshot, all_subjects, end=now)))
+
+    reports = [get_notification_message(available, message_template=f"{{}} {label}") for label, available in counts]
+    message = "; ".join(report for report in reports if report) or None
+    return f"Available assignments: {message}" if message else None
+
+
+def deduplicate(notification_state: Optional[NotificationState], key: str,
+                available_assignments: Sequence[int], message: Optional[str]) -> Optional[str]:
+    """
+    Drops a message that would duplicate the one last notified for the same command, if notification state is kept.
+
+    :param notification_state: State of the notifications of the user, None to never drop messages.
+    :param key: Command the message was generated by, with its options.
+    :param available_assignments: Counts the message is about.
+    :param message: Message generated by the command, None if it has nothing to notify.
+    :return: the message if it must be notified, None otherwise.
+    """
+    if notification_state is None:
+        return message
+    if message is None:
+        notification_state.reset(key)
+        return None
+
+    return message if notification_state.should_notify(key, available_assignments) else None
+
+
+def _validate_timezone(ctx: click.Context, param: click.Parameter, value: str) -> pytz.BaseTzInfo:
+    try:
+        return pytz.timezone(value)
+    except pytz.UnknownTimeZoneError:
+        raise click.BadParameter(f"unknown time zone {value}")
+
+
+@cli.command("forecast")
+@click.option("--hours",
+              type=click.IntRange(min=1),
+              default=24,
+              help="Number of hours to forecast the upcoming reviews for, hour by hour",
+              show_default=True
+              )
+@click.option("--days",
+              type=click.IntRange(min=1),
+              required=False,
+              help="Number of days to forecast the upcoming reviews for, day by day, instead of hours"
+              )
+@click.option("--timezone",
+              default="UTC",
+              callback=_validate_timezone,
+              help="Time zone the forecast is given in, e.g. Europe/Paris",
+              show_default=True
+              )
+@generator
+def cli_forecast(context: Context, hours: int, days: Optional[int], timezone: pytz.BaseTzInfo):
+    yield forecast(context.snapshot, context.all_subjects, hours, days, timezone)
+
+
+def forecast(snapshot: AssignmentsSnapshot, all_subjects: Mapping[int, SubjectInfo],
+             hours: int, days: Optional[int] = None, timezone: pytz.BaseTzInfo = pytz.utc) -> Optional[str]:
+    """
+    Creates a message forecasting the reviews becoming available hour by hour, or day by day, from now on.
+
+    :return: the message if some reviews become available in the forecast period, None otherwise.
+    """
+    now = datetime.utcnow().replace(tzinfo=pytz.utc)
+    local_now = now.astimezone(timezone).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    if days:
+        # Each day starts at its own local midnight, days lasting 23 or 25 hours across daylight saving time changes.
+        midnight = local_now.replace(hour=0)
+        boundaries = [timezone.localize(midnight + timedelta(days=index)) for index in range(days + 1)]
+        label_format, heading = "on %a %d", f"next {days} days"
+    else:
+        start = timezone.localize(local_now)
+        boundaries = [start + timedelta(hours=index) for index in range(hours + 1)]
+        label_format, heading = "at %H:%M", f"next {hours}h"
+
+    counts = get_review_forecast(snapshot, all_subjects, boundaries=boundaries, after=now)
+    if not sum(counts):
+        return
+
+    upcoming = ", ".join(f"{count} {timezone.normalize(boundaries[index]).strftime(label_format)}"
+                         for index, count in enumerate(counts) if count)
+    return f"Upcoming reviews in the {heading}: {upcoming}"
+
+
+@cli.command("next_run")
+@click.option(
+    "--since",
+    required=False,
+    default=-1,
+    help="How many hours since assignments are accounted for (-1 meaning forever), as for available_assignments_now",
+    show_default=True
+)
+@click.option(
+    "--min",
+    "min_assignments",
+    required=False,
+    type=click.IntRange(min=1),
+    default=1,
+    help="Minimum number of assignments to generate a message, as for available_assignments_now",
+    show_default=True
+)
+@click.option("--max-delay",
+              type=click.IntRange(min=1),
+              default=60,
+              help="Maximum number of minutes until the next run, when no notification is expected sooner",
+              show_default=True
+              )
+@click.option("--format",
+              "output_format",
+              type=click.Choice([ISO_FORMAT, EPOCH_FORMAT, SYSTEMD_FORMAT, AT_FORMAT]),
+              default=ISO_FORMAT,
+              help="Format the time of the next run is printed in: ISO 8601, UNIX timestamp, calendar event of "
+                   "systemd-run --on-calendar, or time of at -t",
+              show_default=True
+              )
+@processor
+def cli_next_run(context: Context,
+                 message_stream: Generator[str, Any, None],
+                 since: int,
+                 min_assignments: int,
+                 max_delay: int,
+                 output_format: str
+                 ) -> Generator[str, Any, None]:
+    yield from message_stream
+    click.echo(format_next_run(next_run(context.snapshot, context.all_subjects, since, min_assignments,
+                                        timedelta(minutes=max_delay)),
+                               output_format))
+
+
+def next_run(snapshot: AssignmentsSnapshot, all_subjects: Mapping[int, SubjectInfo], since: int, min_assignments: int,
+             max_delay: timedelta) -> datetime:
+    """
+    Plans when the commands should run next: as soon as reviews becoming available could make available_assignments_now
+    with the same options generate a message, and no later than after the maximum delay.
+
+    :return: the time of the next run, in UTC.
+    """
+    now = datetime.utcnow()
+    next_notification_time = get_next_notification_time(snapshot, all_subjects, after=now,
+                                                        min_assignments=min_assignments,
+                                                        since=timedelta(hours=since) if since >= 0 else None)
+    if next_notification_time is None:
+        return now + max_delay
+    return min(next_notification_time, now + max_delay)
+
+
+def format_next_run(moment: datetime, output_format: str) -> str:
+    """
+    Formats the time of the next run for an external scheduler.
+
+    :param moment: Time of the next run, in UTC.
+    :param output_format: One of ISO_FORMAT, EPOCH_FORMAT, SYSTEMD_FORMAT or AT_FORMAT, the latter being given in the
+                            local time of the machine, as expected by at.
+    """
+    moment = pytz.utc.localize(moment.replace(microsecond=0))
+    if output_format == EPOCH_FORMAT:
+        return str(int(moment.timestamp()))
+    if output_format == SYSTEMD_FORMAT:
+        return moment.strftime("%Y-%m-%d %H:%M:%S UTC")
+    if output_format == AT_FORMAT:
+        return datetime.fromtimestamp(moment.timestamp()).strftime("%Y%m%d%H%M.%S")
+    return moment.isoformat()
 
 
 @cli.command("notify")
@@ -121,34 +517,117 @@ def all_available_assignments(wanikani_client: WaniKaniClient, all_subjects: Dic
 @click.option("--pushover",
               nargs=2,
               type=str,
+              multiple=True,
               required=False,
-              help="Activates notifications though Pushover by providing the app key and the user key"
+              help="Activates notifications though Pushover by providing the app key and the user key, "
+                   "users of the same app being notified through a single request"
+              )
+@click.option("--timeout",
+              type=click.FloatRange(min=0),
+              default=10,
+              help="Number of seconds after which a notifier that did not complete is considered as failed",
+              show_default=True
               )
 @processor
 def cli_notify(context: Context,
                message_stream: Generator[str, Any, None],
                pushsafer: Optional[str],
-               pushover: Optional[Tuple[str, str]],
-               console: Optional[bool]
+               pushover: Sequence[Tuple[str, str]],
+               console: Optional[bool],
+               timeout: float
                ) -> None:
-    notifiers = []
+    messages = list(message_stream)
+    message = "" if context.stop_if_empty and not all(messages) else "\n".join(m for m in messages if m)
+
+    notifiers_parameters = []
     if pushsafer:
-        notifiers.append(notifier.factory.create(PushSaferNotifier.key(), private_key=pushsafer))
-    if pushover:
-        notifiers.append(notifier.factory.create(PushoverNotifier.key(), app_token=pushover[0], user_token=pushover[1]))
+        notifiers_parameters.append(("pushsafer", {"private_key": pushsafer}))
+    for app_token, user_token in pushover:
+        notifiers_parameters.append(("pushover", {"app_token": app_token, "user_token": user_token}))
     if console:
-        notifiers.append(notifier.factory.create(ConsoleNotifier.key()))
+        notifiers_parameters.append(("console", {}))
 
-    messages = list(message_stream)
-    if context.stop_if_empty and not all(messages):
-        yield
-        return
+    if context.outbox is not None:
+        deliver(context, message, notifiers_parameters, timeout)
+        sent = bool(message and notifiers_parameters)
+    elif message:
+        results = notify(message, [get_notifier(context, key, **kwargs) for key, kwargs in notifiers_parameters],
+                         timeout)
+        sent = any(result.succeeded for result in results)
+    else:
+        sent = False
 
-    notify("\n".join(m for m in messages if m), notifiers)
+    if sent and context.notification_state is not None:
+        context.notification_state.commit()
     yield
 
 
-def notify(message: str, notifiers: List[Notifier]) -> None:
-    if message:
-        for n in notifiers:
-            n.notify(title="WaniKani", message=message, url="https://www.wanikani.com/dashboard")
+def get_notifier(context: Context, key: str, **kwargs) -> Notifier:
+    """
+    Gets the notifier identified by the provided key and parameters, creating it only once per context.
+
+    The notifier sends its notifications through the HTTP session of the context.
+    """
+    notifier_id = (key, tuple(sorted(kwargs.items())))
+    if notifier_id not in context.notifiers:
+        context.notifiers[notifier_id] = notifier.factory.create(key, session=context.session, **kwargs)
+    return context.notifiers[notifier_id]
+
+
+def deliver(context: Context, message: str, notifiers_parameters: List[Tuple[str, Dict[str, Any]]],
+            timeout: float = 10) -> List[NotificationResult]:
+    """
+    Queues a message in the outbox of the context for each notifier, then sends all the deliveries through these
+    notifiers that are due, including the ones that failed during previous runs.
+
+    A notifier that fails is not attempted again until the next call, so that a provider that is down delays a run
+    by one timeout at most. The outbox is locked meanwhile, so that overlapping runs do not send the same deliveries.
+
+    :param context: Context whose outbox and notifiers are used.
+    :param message: Message to queue, if any.
+    :param notifiers_parameters: Key and parameters of each notifier to send the message through.
+    :param timeout: Number of seconds after which a notifier that did not complete is considered as failed.
+    :return: the results of all the attempted deliveries.
+    """
+    outbox = context.outbox
+    notifiers_by_id = {outbox_notifier_id(key, **kwargs): (key, kwargs) for key, kwargs in notifiers_parameters}
+    results = []
+    with outbox.locked():
+        if message:
+            for notifier_id in notifiers_by_id:
+                outbox.enqueue(notifier_id, NOTIFICATION_TITLE, message, NOTIFICATION_URL)
+
+        deliveries_per_content: Dict[Tuple[str, str, Optional[str]], List[Delivery]] = {}
+        for delivery in outbox.due(notifiers_by_id):
+            deliveries_per_content.setdefault((delivery.title, delivery.message, delivery.url), []).append(delivery)
+
+        failed_notifier_ids = set()
+        for (title, content, url), deliveries in deliveries_per_content.items():
+            deliveries = [d for d in deliveries if d.notifier_id not in failed_notifier_ids]
+            notifiers = [get_notifier(context, notifiers_by_id[d.notifier_id][0], **notifiers_by_id[d.notifier_id][1])
+                         for d in deliveries]
+            for delivery, result in zip(deliveries, notify(content, notifiers, timeout, title=title, url=url)):
+                if result.succeeded:
+                    outbox.delivered(delivery.id)
+                else:
+                    outbox.failed(delivery.id)
+                    failed_notifier_ids.add(delivery.notifier_id)
+                results.append(result)
+
+    return results
+
+
+def notify(message: str, notifiers: List[Notifier], timeout: float = 10,
+           title: str = NOTIFICATION_TITLE, url: Optional[str] = NOTIFICATION_URL) -> List[NotificationResult]:
+    if not message or not notifiers:
+        return []
+
+    results = notifier.notify_all(notifiers, timeout, title=title, message=message, url=url)
+    for result in results:
+        metrics.record(f"notify.{result.key}", result.duration)
+        if result.succeeded:
+            logger.info("Notified through %s in %.2fs", result.key, result.duration)
+        else:
+            logger.warning("Failed to notify through %s after %.2fs: %r", result.key, result.duration, result.error)
+
+    return results
@@ -0,0 +1,124 @@
+import time
+from typing import Optional
+
+import requests
+from wanikani_api import client, constants, models
+from wanikani_api.exceptions import InvalidWanikaniApiKeyException
+
+from wanikani_notifier import transport
+from wanikani_notifier.cache import ConditionalRequestsCache
+from wanikani_notifier.metrics import metrics
+from wanikani_notifier.ratelimit import TokenBucket, rate_limiter, retry_delay, reset_time, DEFAULT_REQUESTS_PER_MINUTE
+
+RATE_LIMITED_ATTEMPTS = 3
+
+
+class WaniKaniClient(client.Client):
+    """
+    WaniKani client sending all its requests through a provided HTTP session, so that connections are reused.
+
+    When provided with a cache of conditional requests, requests are made conditional on the validators of the last
+    response received for the same URL, and the content of that response is reused when WaniKani answers
+    "304 Not Modified".
+    Only the responses fitting in a single page are cached, which covers the frequent "nothing changed since"
+    queries while keeping large collections out of the cache.
+
+    Requests are paced by the token bucket of the API token, shared by all the clients using the same token.
+    Throttled requests are retried once the delay given by WaniKani elapsed, and the bucket is paused until WaniKani
+    resets its rate limit when no request remains. The time spent waiting is recorded as the "wanikani.throttled"
+    stage.
+    """
+
+    def __init__(self, v2_api_key: str,
+                 session: Optional[requests.Session] = None,
+                 conditional_requests: Optional[ConditionalRequestsCache] = None,
+                 rate_limit: Optional[TokenBucket] = None):
+        self.session = session or transport.build_session()
+        self.conditional_requests = conditional_requests
+        self.rate_limit = rate_limit or rate_limiter.bucket(v2_api_key)
+        super().__init__(v2_api_key)
+
+    def build_authorized_requester(self, headers):
+        def _make_wanikani_api_request(url):
+            return models.factory(self._get(url, headers), client=self)
+
+        return _make_wanikani_api_request
+
+    def user_information(self):
+        return self.authorized_request_maker(self.url_builder.build_wk_url(constants.USER_ENDPOINT))
+
+    def summary(self):
+        return self.authorized_request_maker(self.url_builder.build_wk_url(constants.SUMMARY_ENDPOINT))
+
+    def assignments(self, fetch_all=False, **filters):
+        url = self.url_builder.build_wk_url(constants.ASSIGNMENT_ENDPOINT, parameters=filters)
+        return self._wrap_collection_in_iterator(self.authorized_request_maker(url), fetch_all)
+
+    def _get(self, url: str, headers: dict) -> dict:
+        cached = self.conditional_requests.get(url) if self.conditional_requests else None
+        request_headers = dict(headers)
+        if cached and cached["etag"]:
+            request_headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            request_headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = self._send(url, request_headers)
+        if response.status_code == 304 and cached:
+            metrics.increment("wanikani.not_modified")
+            return cached["content"]
+        if response.status_code == 401:
+            raise InvalidWanikaniApiKeyException("The WaniKani API key is not valid")
+        response.raise_for_status()
+
+        content = response.json()
+        if content.get("object") == "collection":
+            metrics.increment("wanikani.pages")
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if self.conditional_requests is not None and (etag or last_modified) and _is_single_page(content):
+            self.conditional_requests.put(url, etag, last_modified, content)
+
+        return content
+
+    def _send(self, url: str, headers: dict) -> requests.Response:
+        for _ in range(RATE_LIMITED_ATTEMPTS):
+            waited = self.rate_limit.acquire()
+            if waited:
+                metrics.record("wanikani.throttled", waited)
+
+            with metrics.timed("wanikani.request"):
+                response = self.session.get(url, headers=headers)
+            metrics.increment("wanikani.requests")
+
+            if response.headers.get("RateLimit-Remaining") == "0" and reset_time(response) is not None:
+                self.rate_limit.pause_until(reset_time(response))
+            if response.status_code != 429:
+                return response
+
+            metrics.increment("wanikani.rate_limited")
+            self.rate_limit.pause_until(time.time() + retry_delay(response))
+
+        return response
+
+
+def build_client(token: str, session: requests.Session,
+                 requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE, shared_rate_limit: bool = True
+                 ) -> WaniKaniClient:
+    """
+    Builds the WaniKani client of an API token, reusing the cached responses of its conditional requests and pacing
+    its requests by the token bucket of the token.
+
+    :param token: WaniKani API token.
+    :param session: HTTP session to send the requests through.
+    :param requests_per_minute: Maximum number of requests per minute.
+    :param shared_rate_limit: Whether the rate limit is shared with other processes, through a file of the cache folder.
+    :return: the WaniKani client.
+    """
+    return WaniKaniClient(token, session=session,
+                          conditional_requests=ConditionalRequestsCache.for_token(token),
+                          rate_limit=rate_limiter.bucket(token, requests_per_minute, shared_rate_limit))
+
+
+def _is_single_page(content: dict) -> bool:
+    pages = content.get("pages")
+    return not pages or (pages.get("next_url") is None and pages.get("previous_url") is None)
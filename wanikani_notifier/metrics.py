@@ -0,0 +1,107 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+import ujson as ujson
+
+from wanikani_notifier.cache import atomic_open
+
+JSON_FORMAT = "json"
+PROMETHEUS_FORMAT = "prometheus"
+PROMETHEUS_PREFIX = "wanikani_notifier"
+
+
+class Metrics:
+    """
+    Thread-safe registry of the time spent in each stage of a run and of the number of times events occurred,
+    e.g. requests sent to WaniKani or cache hits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations: Dict[str, float] = {}
+        self._calls: Dict[str, int] = {}
+        self._counts: Dict[str, int] = {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._durations.clear()
+            self._calls.clear()
+            self._counts.clear()
+
+    def record(self, stage: str, duration: float) -> None:
+        """
+        Records the time spent in one call of a stage.
+
+        :param stage: Name of the stage.
+        :param duration: Number of seconds spent in the stage.
+        """
+        with self._lock:
+            self._durations[stage] = self._durations.get(stage, 0.0) + duration
+            self._calls[stage] = self._calls.get(stage, 0) + 1
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """
+        Records the time spent in the wrapped block as one call of a stage.
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started_at)
+
+    def increment(self, event: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[event] = self._counts.get(event, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {stage: {"calls": self._calls[stage], "duration": duration}
+                           for stage, duration in self._durations.items()},
+                "counts": dict(self._counts),
+            }
+
+    def to_json(self) -> str:
+        return ujson.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Formats the metrics for the textfile collector of the Prometheus node exporter.
+        """
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_stage_duration_seconds Time spent in a stage during the last run.",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_duration_seconds gauge",
+        ]
+        lines += [f'{PROMETHEUS_PREFIX}_stage_duration_seconds{{stage="{stage}"}} {values["duration"]}'
+                  for stage, values in sorted(snapshot["stages"].items())]
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_stage_calls Number of times a stage was run during the last run.",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_calls gauge",
+        ]
+        lines += [f'{PROMETHEUS_PREFIX}_stage_calls{{stage="{stage}"}} {values["calls"]}'
+                  for stage, values in sorted(snapshot["stages"].items())]
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_events Number of times an event occurred during the last run.",
+            f"# TYPE {PROMETHEUS_PREFIX}_events gauge",
+        ]
+        lines += [f'{PROMETHEUS_PREFIX}_events{{event="{event}"}} {count}'
+                  for event, count in sorted(snapshot["counts"].items())]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, metrics_format: str = JSON_FORMAT) -> None:
+        """
+        Writes the metrics to a file, replacing it atomically so that readers never see a partial file.
+
+        :param path: Path of the file to write.
+        :param metrics_format: Either JSON_FORMAT or PROMETHEUS_FORMAT.
+        """
+        content = self.to_prometheus() if metrics_format == PROMETHEUS_FORMAT else self.to_json()
+        with atomic_open(path, "w") as metrics_file:
+            metrics_file.write(content)
+
+
+metrics = Metrics()
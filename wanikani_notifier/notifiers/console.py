@@ -1,6 +1,6 @@
 from typing import Optional
 
-from wanikani_notifier.notifiers.notifier import Notifier, NoMessageProvided, factory
+from wanikani_notifier.notifiers.notifier import Notifier, NoMessageProvided
 
 
 class ConsoleNotifier(Notifier):
@@ -21,6 +21,3 @@ class ConsoleNotifier(Notifier):
             notification += f"\n{url}"
 
         print(notification)
-
-
-factory.register_builder(ConsoleNotifier.key(), ConsoleNotifier.build)
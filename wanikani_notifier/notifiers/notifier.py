@@ -1,5 +1,10 @@
+import importlib
+import inspect
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Callable, Optional
+from collections import namedtuple
+from typing import Any, Callable, Optional, List, Dict, Hashable, Iterable, Sequence
 
 
 class NoMessageProvided(RuntimeError):
@@ -26,16 +31,197 @@ class Notifier(ABC):
         :param icon: Optional icon to display
         """
 
+    def batch_key(self) -> Hashable:
+        """
+        Defines which notifiers of a class overriding notify_many are sent a notification together, e.g. the ones
+        sharing the same credentials, the others running concurrently.
+        :return: the key shared by the notifiers sent notifications together.
+        """
+        return None
+
+    @classmethod
+    def notify_many(cls,
+                    notifiers: Sequence["Notifier"],
+                    title: str,
+                    message: str,
+                    url: Optional[str] = None,
+                    icon: Optional[str] = None
+                    ) -> List[Optional[Exception]]:
+        """
+        Sends the same notification through several notifiers of this class, e.g. to several recipients.
+
+        Notifier classes whose provider can reach several recipients at once override it to collapse the notification
+        into fewer requests, while this default sends it through each notifier in turn.
+
+        :param notifiers: Notifiers of this class to send the notification through.
+        :param title: Title of the notification to send.
+        :param message: Content of the notification to send.
+        :param url: Optional url to display.
+        :param icon: Optional icon to display
+        :return: the error each notifier failed with, or None if it succeeded, in the same order as the notifiers.
+        """
+        errors = []
+        for n in notifiers:
+            try:
+                n.notify(title=title, message=message, url=url, icon=icon)
+            except Exception as error:
+                errors.append(error)
+            else:
+                errors.append(None)
+        return errors
+
+
+NotificationResult = namedtuple("NotificationResult", ("key", "succeeded", "error", "duration"))
+
+
+class NotificationTimeout(TimeoutError):
+    pass
+
+
+def notify_all(notifiers: List[Notifier],
+               timeout: float,
+               title: str,
+               message: str,
+               url: Optional[str] = None,
+               icon: Optional[str] = None
+               ) -> List[NotificationResult]:
+    """
+    Sends a notification through all the provided notifiers concurrently.
+
+    Notifiers of a class overriding Notifier.notify_many, whose provider reaches several recipients at once, are sent
+    the notification together, per batch key. Each batch and each other notifier runs in its own daemon thread, so that
+    a notifier hanging past the timeout delays neither the other notifiers nor the end of the process.
+
+    :param notifiers: Notifiers to send the notification through.
+    :param timeout: Number of seconds after which notifiers that did not complete are considered as failed.
+    :param title: Title of the notification to send.
+    :param message: Content of the notification to send.
+    :param url: Optional url to display.
+    :param icon: Optional icon to display
+    :return: the result of the notification for each notifier, in the same order as the notifiers.
+    """
+    results = {}
+
+    def send(indexes: List[int]) -> None:
+        started_at = time.monotonic()
+        batch = [notifiers[i] for i in indexes]
+        send_many = type(batch[0]).notify_many if _sends_many(type(batch[0])) else Notifier.notify_many
+        try:
+            errors = send_many(batch, title=title, message=message, url=url, icon=icon)
+        except Exception as error:
+            errors = [error] * len(indexes)
+        duration = time.monotonic() - started_at
+        for i, error in zip(indexes, errors):
+            results[i] = NotificationResult(notifiers[i].key(), error is None, error, duration)
+
+    batches: Dict[Any, List[int]] = {}
+    for i, n in enumerate(notifiers):
+        batches.setdefault((type(n), n.batch_key()) if _sends_many(type(n)) else i, []).append(i)
+
+    threads = [threading.Thread(target=send, args=(indexes,), daemon=True) for indexes in batches.values()]
+    for thread in threads:
+        thread.start()
+
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+
+    return [results.get(i, NotificationResult(n.key(), False, NotificationTimeout(f"No answer after {timeout}s"), timeout))
+            for i, n in enumerate(notifiers)]
+
+
+def _sends_many(notifier_class: type) -> bool:
+    return (issubclass(notifier_class, Notifier)
+            and getattr(notifier_class.notify_many, "__func__", None) is not Notifier.notify_many.__func__)
+
+
+class UnknownNotifier(KeyError):
+    pass
+
+
+ENTRY_POINTS_GROUP = "wanikani_notifier.notifiers"
+
 
 class NotifierFactory:
+    """
+    Creates notifiers from the builders registered for their key.
+
+    Builders can be registered lazily, by the path of the builder as "module:attribute", so that a notifier module
+    and its dependencies are only imported once a notifier is created for its key.
+    Keys that are not registered are looked up in the ENTRY_POINTS_GROUP entry points group of the installed packages,
+    which allows third-party packages to provide their own notifiers. Their builders are only given the parameters
+    they accept, e.g. not the HTTP session shared by the notifiers if they do not take it.
+    """
+
     def __init__(self):
-        self._builders = {}
+        self._builders: Dict[str, Callable] = {}
+        self._builder_paths: Dict[str, str] = {}
 
     def register_builder(self, key: str, builder: Callable) -> None:
         self._builders[key] = builder
 
+    def register_builder_path(self, key: str, builder_path: str) -> None:
+        self._builder_paths[key] = builder_path
+
     def create(self, key: str, **kwargs) -> Notifier:
-        return self._builders[key.lower()](**kwargs)
+        return self._get_builder(key.lower())(**kwargs)
+
+    def _get_builder(self, key: str) -> Callable:
+        if key not in self._builders:
+            if key in self._builder_paths:
+                self._builders[key] = _resolve(self._builder_paths[key])
+            else:
+                self._builders[key] = _load_entry_point(key)
+        return self._builders[key]
+
+
+def _resolve(builder_path: str) -> Callable:
+    module_name, _, attributes = builder_path.partition(":")
+    builder = importlib.import_module(module_name)
+    for attribute in attributes.split("."):
+        builder = getattr(builder, attribute)
+    return builder
+
+
+def _load_entry_point(key: str) -> Callable:
+    for entry_point in _entry_points(ENTRY_POINTS_GROUP):
+        if entry_point.name == key:
+            return _with_accepted_parameters(entry_point.load())
+
+    raise UnknownNotifier(key)
+
+
+def _with_accepted_parameters(builder: Callable) -> Callable:
+    """
+    Wraps a builder so that it is called with only the keyword parameters it accepts.
+    """
+    try:
+        parameters = inspect.signature(builder).parameters.values()
+    except (TypeError, ValueError):  # pragma: nocover
+        return builder
+    if any(p.kind == p.VAR_KEYWORD for p in parameters):
+        return builder
+
+    accepted = {p.name for p in parameters if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)}
+    return lambda **kwargs: builder(**{name: value for name, value in kwargs.items() if name in accepted})
+
+
+def _entry_points(group: str) -> Iterable:
+    """
+    Gets the entry points of a group, through importlib_metadata before Python 3.8.
+    """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # pragma: nocover
+        from importlib_metadata import entry_points
+
+    all_entry_points = entry_points()
+    if hasattr(all_entry_points, "select"):
+        return all_entry_points.select(group=group)
+    return all_entry_points.get(group, [])  # pragma: nocover
 
 
 factory = NotifierFactory()
+factory.register_builder_path("console", "wanikani_notifier.notifiers.console:ConsoleNotifier.build")
+factory.register_builder_path("pushover", "wanikani_notifier.notifiers.pushover:PushoverNotifier.build")
+factory.register_builder_path("pushsafer", "wanikani_notifier.notifiers.pushsafer:PushSaferNotifier.build")
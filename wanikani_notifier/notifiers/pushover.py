@@ -1,13 +1,53 @@
-from typing import Optional
+from typing import Dict, List, Optional, Sequence
 
 import chump
+import requests
 
-from wanikani_notifier.notifiers.notifier import Notifier, NoMessageProvided, factory
+from wanikani_notifier.notifiers.notifier import Notifier, NoMessageProvided
+
+PUSHOVER_MAX_USERS_PER_MESSAGE = 50
+
+
+class SessionApplication(chump.Application):
+    """
+    Pushover application sending its requests through a provided HTTP session instead of chump's own pool.
+    """
+
+    def __init__(self, token: str, session: requests.Session):
+        super().__init__(token)
+        self._session = session
+
+    def _request(self, request, data=None, url=None):
+        data = dict(data or {}, token=self.token)
+        url = url or chump.ENDPOINT + chump.REQUESTS[request]["path"]
+        method = chump.REQUESTS[request]["method"]
+
+        if method == "get":
+            response = self._session.get(url, params=data)
+        else:
+            response = self._session.post(url, data=data)
+
+        timestamp = chump.http_date_to_datetime(response.headers["date"]) if "date" in response.headers else None
+        if 400 <= response.status_code < 500:
+            raise chump.APIError(url, data, response.json(), timestamp)
+        if response.status_code != 200:
+            raise chump.APIError(url, data, {
+                "request": None,
+                "status": 0,
+                "errors": [f"unknown error ({response.status_code}): {response.text}"],
+            }, timestamp)
+
+        if request == "message":
+            self.limit = int(response.headers["X-Limit-App-Limit"])
+            self.remaining = int(response.headers["X-Limit-App-Remaining"])
+            self.reset = chump.epoch_to_datetime(response.headers["X-Limit-App-Reset"])
+
+        return response.json(), timestamp
 
 
 class PushoverNotifier(Notifier):
-    def __init__(self, app_token: str, user_token: str):
-        self._app = chump.Application(app_token)
+    def __init__(self, app_token: str, user_token: str, session: Optional[requests.Session] = None):
+        self._app = SessionApplication(app_token, session) if session else chump.Application(app_token)
         self._user = self._app.get_user(user_token)
 
     @classmethod
@@ -15,14 +55,64 @@ class PushoverNotifier(Notifier):
         return "pushover"
 
     @classmethod
-    def build(cls, app_token: str, user_token: str, **_ignored) -> "PushoverNotifier":
-        return PushoverNotifier(app_token, user_token)
+    def build(cls, app_token: str, user_token: str, session: Optional[requests.Session] = None,
+              **_ignored) -> "PushoverNotifier":
+        return PushoverNotifier(app_token, user_token, session)
 
     def notify(self, title: str, message: str, url: Optional[str] = None, icon: Optional[str] = None):
         if not message:
             raise NoMessageProvided
 
-        self._user.send_message(title=title, message=message, url=url)
+        sent = self._user.send_message(title=title, message=message, url=url)
+        if not sent.is_sent:
+            raise sent.error
 
+    def batch_key(self) -> str:
+        return self._app.token
+
+    @classmethod
+    def notify_many(cls,
+                    notifiers: Sequence["PushoverNotifier"],
+                    title: str,
+                    message: str,
+                    url: Optional[str] = None,
+                    icon: Optional[str] = None
+                    ) -> List[Optional[Exception]]:
+        """
+        Sends the same notification to the users of several Pushover notifiers, with a single request for the users
+        of the same application, up to PUSHOVER_MAX_USERS_PER_MESSAGE at a time.
+
+        When Pushover rejects the request because of one of its users, the notification is sent to each of them
+        in turn, so that a single invalid user key does not prevent the others from being notified.
+        """
+        if not message:
+            return [NoMessageProvided() for _ in notifiers]
+
+        indexes_per_app: Dict[str, List[int]] = {}
+        for index, n in enumerate(notifiers):
+            indexes_per_app.setdefault(n._app.token, []).append(index)
+
+        errors: List[Optional[Exception]] = [None] * len(notifiers)
+        for indexes in indexes_per_app.values():
+            for start in range(0, len(indexes), PUSHOVER_MAX_USERS_PER_MESSAGE):
+                batch = indexes[start:start + PUSHOVER_MAX_USERS_PER_MESSAGE]
+                for index, error in zip(batch, cls._send_to_users([notifiers[i] for i in batch], title, message, url)):
+                    errors[index] = error
+        return errors
+
+    @classmethod
+    def _send_to_users(cls, notifiers: Sequence["PushoverNotifier"], title: str, message: str, url: Optional[str]
+                       ) -> List[Optional[Exception]]:
+        data = {"user": ",".join(n._user.token for n in notifiers), "title": title, "message": message}
+        if url:
+            data["url"] = url
 
-factory.register_builder(PushoverNotifier.key(), PushoverNotifier.build)
+        try:
+            notifiers[0]._app._request("message", data)
+        except chump.APIError as error:
+            if len(notifiers) > 1 and "user" in error.bad_inputs:
+                return super().notify_many(notifiers, title=title, message=message, url=url)
+            return [error] * len(notifiers)
+        except Exception as error:
+            return [error] * len(notifiers)
+        return [None] * len(notifiers)
@@ -1,27 +1,42 @@
 from typing import Optional
 
 import pushsafer
+import requests
 
-from wanikani_notifier.notifiers.notifier import Notifier, NoMessageProvided, factory
+from wanikani_notifier.notifiers.notifier import Notifier, NoMessageProvided
+
+
+class SessionClient(pushsafer.Client):
+    """
+    PushSafer client sending its messages through a provided HTTP session.
+    """
+
+    def __init__(self, private_key: str, session: requests.Session):
+        super().__init__(private_key)
+        self._session = session
+
+    def _send(self, payload: dict):
+        payload = {k: v for k, v in payload.items() if v}
+        response = self._session.post(self.ENDPOINT, data=payload)
+        if response.status_code != 200:
+            raise pushsafer.MessageSendError(f"Failed to send message, got {response.text}")
+        return response.json()
 
 
 class PushSaferNotifier(Notifier):
-    def __init__(self, private_key: str):
-        self._client = pushsafer.Client(private_key)
+    def __init__(self, private_key: str, session: Optional[requests.Session] = None):
+        self._client = SessionClient(private_key, session) if session else pushsafer.Client(private_key)
 
     @classmethod
     def key(cls) -> str:
         return "pushsafer"
 
     @classmethod
-    def build(cls, private_key: str, **_ignored) -> "PushSaferNotifier":
-        return PushSaferNotifier(private_key)
+    def build(cls, private_key: str, session: Optional[requests.Session] = None, **_ignored) -> "PushSaferNotifier":
+        return PushSaferNotifier(private_key, session)
 
     def notify(self, title: str, message: str, url: Optional[str] = None, icon: Optional[str] = None):
         if not message:
             raise NoMessageProvided
 
         self._client.send_message(title=title, message=message, url=url)
-
-
-factory.register_builder(PushSaferNotifier.key(), PushSaferNotifier.build)
@@ -0,0 +1,68 @@
+from typing import Callable
+
+import click
+
+from wanikani_notifier import cache, ratelimit, transport
+from wanikani_notifier.store import JSON_STORE, SQLITE_STORE
+
+
+def wanikani_options(summary: bool = True) -> Callable[[Callable], Callable]:
+    """
+    Adds the options shared by all the commands querying WaniKani, about the HTTP requests, their rate limit and the
+    local caches.
+
+    :param summary: Whether the command also reads the counts covered by WaniKani's summary, and gets the option
+                    to scan all the assignments instead.
+    :return: the decorator adding the options to a command.
+    """
+    options = [
+        click.option("--http-timeout",
+                     type=click.FloatRange(min=0),
+                     default=transport.DEFAULT_TIMEOUT,
+                     help="Number of seconds to wait for an HTTP server before giving up on a request",
+                     show_default=True
+                     ),
+        click.option("--http-retries",
+                     type=click.IntRange(min=0),
+                     default=transport.DEFAULT_RETRIES,
+                     help="Number of times a failed HTTP request is retried",
+                     show_default=True
+                     ),
+        click.option("--rate-limit",
+                     type=click.IntRange(min=1),
+                     default=ratelimit.DEFAULT_REQUESTS_PER_MINUTE,
+                     help="Maximum number of WaniKani requests per minute and API token",
+                     show_default=True
+                     ),
+        click.option("--shared-rate-limit/--process-rate-limit",
+                     default=True,
+                     help="Determines whether the rate limit is shared with other processes, e.g. overlapping runs "
+                          "or syncs, through a file of the cache folder"
+                     ),
+        click.option("--cache-dir",
+                     type=click.Path(file_okay=False, writable=True),
+                     required=False,
+                     help=f"Folder the caches are kept in, shared and locked by concurrent runs "
+                          f"[default: ${cache.CACHE_DIR_ENV_VAR} or $XDG_CACHE_HOME/{cache.CACHE_FOLDER_NAME}]"
+                     ),
+        click.option("--store",
+                     type=click.Choice([JSON_STORE, SQLITE_STORE]),
+                     default=JSON_STORE,
+                     help="Local store of the subjects and assignments, SQLite answering queries through indexes",
+                     show_default=True
+                     ),
+    ]
+    if summary:
+        options.append(click.option("--summary/--no-summary",
+                                    default=True,
+                                    help="Determines whether the counts covered by WaniKani's summary, i.e. the lessons "
+                                         "and reviews available now and the reviews of the next 24 hours, are read "
+                                         "from it instead of scanning all the assignments"
+                                    ))
+
+    def decorator(f: Callable) -> Callable:
+        for option in reversed(options):
+            f = option(f)
+        return f
+
+    return decorator
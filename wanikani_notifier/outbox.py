@@ -0,0 +1,128 @@
+import hashlib
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from wanikani_notifier import cache
+
+OUTBOX_FILENAME = "outbox-{}.json.gz"
+OUTBOX_VERSION = 1
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_MAX_AGE = timedelta(hours=12)
+OUTBOX_FIRST_RETRY_DELAY = timedelta(minutes=1)
+OUTBOX_MAX_RETRY_DELAY = timedelta(hours=1)
+
+Delivery = namedtuple("Delivery", ("id", "notifier_id", "title", "message", "url", "attempts", "created_at",
+                                   "next_attempt_at"))
+
+
+def notifier_id(key: str, **kwargs) -> str:
+    """
+    Gets an identifier of a notifier and its parameters, which does not expose its credentials.
+    """
+    description = repr((key, tuple(sorted(kwargs.items()))))
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()[:16]
+
+
+class Outbox:
+    """
+    Notifications of a user queued before being sent, persisted so that failed ones are retried on later runs.
+
+    Each notification is queued once per notifier, identified by the digest of its notifier and content, so that
+    queueing the same notification again while it is pending does not send it twice. A new notification replaces the
+    ones still pending for the same notifier, whose counts are outdated, so that a provider recovering from an outage
+    is not sent every message it missed.
+    Failed deliveries are retried with an exponential backoff, and dropped after OUTBOX_MAX_ATTEMPTS attempts
+    or once older than OUTBOX_MAX_AGE, when their content is outdated anyway.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._deliveries: Optional[Dict[str, Delivery]] = None
+        self._changed = False
+
+    @classmethod
+    def for_token(cls, token: str) -> "Outbox":
+        return cls(cache.cache_path(OUTBOX_FILENAME.format(cache.token_digest(token))))
+
+    def enqueue(self, notifier_id: str, title: str, message: str, url: Optional[str] = None) -> str:
+        """
+        Queues a notification to send through a notifier, unless the same one is already pending, replacing the
+        other ones pending for this notifier.
+
+        :return: the id of the delivery.
+        """
+        deliveries = self._load()
+        delivery_id = hashlib.sha256(repr((notifier_id, title, message, url)).encode("utf-8")).hexdigest()[:16]
+        for outdated_id in [d.id for d in deliveries.values() if d.notifier_id == notifier_id and d.id != delivery_id]:
+            del deliveries[outdated_id]
+            self._changed = True
+        if delivery_id not in deliveries:
+            now = time.time()
+            deliveries[delivery_id] = Delivery(delivery_id, notifier_id, title, message, url, 0, now, now)
+            self._changed = True
+        return delivery_id
+
+    def due(self, notifier_ids: Iterable[str]) -> List[Delivery]:
+        """
+        Gets the deliveries through the provided notifiers that are due, oldest first.
+        """
+        now = time.time()
+        notifier_ids = set(notifier_ids)
+        return sorted((d for d in self._load().values() if d.notifier_id in notifier_ids and d.next_attempt_at <= now),
+                      key=lambda d: d.created_at)
+
+    def delivered(self, delivery_id: str) -> None:
+        if self._load().pop(delivery_id, None) is not None:
+            self._changed = True
+
+    def failed(self, delivery_id: str) -> None:
+        """
+        Schedules the next attempt of a failed delivery, or drops it if it should not be attempted anymore.
+        """
+        deliveries = self._load()
+        delivery = deliveries.get(delivery_id)
+        if delivery is None:
+            return
+
+        now = time.time()
+        attempts = delivery.attempts + 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS or now - delivery.created_at >= OUTBOX_MAX_AGE.total_seconds():
+            del deliveries[delivery_id]
+        else:
+            delay = min(OUTBOX_FIRST_RETRY_DELAY.total_seconds() * 2 ** (attempts - 1),
+                        OUTBOX_MAX_RETRY_DELAY.total_seconds())
+            deliveries[delivery_id] = delivery._replace(attempts=attempts, next_attempt_at=now + delay)
+        self._changed = True
+
+    def pending(self) -> List[Delivery]:
+        return list(self._load().values())
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Holds the outbox while in the wrapped block, from reloading it until persisting it, so that overlapping runs
+        for the same user neither send the same deliveries nor overwrite each other's changes.
+        """
+        with cache.file_lock(f"{self._path}.lock"):
+            self._deliveries = None
+            self._changed = False
+            yield
+            self.save()
+
+    def save(self) -> None:
+        """
+        Persists the outbox if it changed since it was loaded.
+        """
+        if self._changed:
+            cache.dump_versioned(self._path, OUTBOX_VERSION, iter(self._deliveries.values()))
+            self._changed = False
+
+    def _load(self) -> Dict[str, Delivery]:
+        if self._deliveries is None:
+            now = time.time()
+            deliveries = (Delivery(*d) for d in cache.load_versioned(self._path, OUTBOX_VERSION) or [])
+            self._deliveries = {d.id: d for d in deliveries if now - d.created_at < OUTBOX_MAX_AGE.total_seconds()}
+        return self._deliveries
@@ -0,0 +1,171 @@
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+import requests
+import ujson as ujson
+
+from wanikani_notifier import cache
+
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_RETRY_DELAY = 5
+
+RATE_LIMIT_FILENAME = "rate-limit-{}.json"
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing a number of requests per minute, in bursts of at most that number.
+
+    Each request takes a token, and tokens are refilled continuously. When the server tells the requests are throttled,
+    the bucket can also be paused until the server accepts requests again.
+    """
+
+    def __init__(self, requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE):
+        self.capacity = requests_per_minute
+        self._refill_per_second = requests_per_minute / 60
+        self._lock = threading.Lock()
+        self._tokens = float(requests_per_minute)
+        self._updated_at = time.time()
+        self._paused_until = 0.0
+
+    def acquire(self) -> float:
+        """
+        Takes a token, waiting for one to be available if need be.
+
+        :return: the number of seconds waited.
+        """
+        waited = 0.0
+        while True:
+            with self._locked():
+                delay = self._take(time.time())
+            if delay <= 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def pause_until(self, timestamp: float) -> None:
+        """
+        Makes the requests wait until the provided time, and then start again from an empty bucket.
+
+        :param timestamp: Time until which no request must be sent, as a UNIX timestamp.
+        """
+        with self._locked():
+            self._paused_until = max(self._paused_until, timestamp)
+            self._tokens = 0.0
+            self._updated_at = max(self._updated_at, timestamp)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock:
+            yield
+
+    def _take(self, now: float) -> float:
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        if now > self._updated_at:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self._refill_per_second)
+            self._updated_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self._refill_per_second
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket whose state is kept in a file, locked while being updated, so that it is shared by all the processes
+    using the same file, e.g. overlapping cron runs for the same API token.
+    """
+
+    def __init__(self, path: str, requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE):
+        super().__init__(requests_per_minute)
+        self._path = path
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock, cache.file_lock(f"{self._path}.lock"):
+            self._load()
+            yield
+            with cache.atomic_open(self._path, "w") as state_file:
+                ujson.dump({"tokens": self._tokens, "updated_at": self._updated_at, "paused_until": self._paused_until},
+                           state_file)
+
+    def _load(self) -> None:
+        try:
+            with open(self._path, "r") as state_file:
+                state = ujson.load(state_file)
+            self._tokens = min(self.capacity, state["tokens"])
+            self._updated_at = state["updated_at"]
+            self._paused_until = state["paused_until"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+
+class RateLimiter:
+    """
+    Registry of the token buckets per API token and rate, so that all the threads using the same token share its
+    bucket.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, int, bool], TokenBucket] = {}
+
+    def bucket(self, token: str, requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE, shared: bool = False
+               ) -> TokenBucket:
+        """
+        Gets the token bucket of an API token at the provided rate, creating it on first use.
+
+        :param token: API token whose requests are rate limited.
+        :param requests_per_minute: Number of requests allowed per minute.
+        :param shared: Whether the bucket is also shared with other processes, through a file of the cache folder.
+        """
+        key = (cache.token_digest(token), requests_per_minute, shared)
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = (
+                    SharedTokenBucket(cache.cache_path(RATE_LIMIT_FILENAME.format(key[0])), requests_per_minute)
+                    if shared else TokenBucket(requests_per_minute)
+                )
+            return self._buckets[key]
+
+
+def retry_delay(response: requests.Response) -> float:
+    """
+    Gets the number of seconds to wait before retrying a throttled request, from the Retry-After header of the
+    response, or else from its RateLimit-Reset header.
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+
+    reset_at = reset_time(response)
+    if reset_at is not None:
+        return max(0.0, reset_at - time.time())
+
+    return DEFAULT_RETRY_DELAY
+
+
+def reset_time(response: requests.Response) -> Optional[float]:
+    """
+    :return: the time when the rate limit of the server is reset, as given by the RateLimit-Reset header
+                of the response, if any.
+    """
+    try:
+        return float(response.headers["RateLimit-Reset"])
+    except (KeyError, ValueError):
+        return None
+
+
+rate_limiter = RateLimiter()
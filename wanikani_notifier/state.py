@@ -0,0 +1,104 @@
+from typing import Dict, List, Optional, Sequence
+
+from wanikani_notifier import cache
+
+NOTIFICATION_STATE_FILENAME = "notifications-{}.json.gz"
+NOTIFICATION_STATE_VERSION = 1
+
+
+class NotificationState:
+    """
+    Counts of assignments last notified per command, persisted between runs so that the same message is not
+    pushed again and again.
+
+    A message is notified again only once the total of its counts rose by at least min_increase since it was last
+    notified, or as soon as its counts changed when min_increase is 0. When the total drops, e.g. after reviewing,
+    the lower counts silently become the new reference, and when a command has nothing to notify anymore, its next
+    message is always notified.
+
+    The counts of a message to notify are only pending until commit is called once it was actually sent, so that a
+    message that failed to be sent, or that was dropped, is notified again on the next run.
+    """
+
+    def __init__(self, path: str, min_increase: int = 1):
+        self._path = path
+        self.min_increase = min_increase
+        self._entries: Optional[Dict[str, List[int]]] = None
+        self._pending: Dict[str, List[int]] = {}
+        self._changes: Dict[str, Optional[List[int]]] = {}
+
+    @classmethod
+    def for_token(cls, token: str, min_increase: int = 1) -> "NotificationState":
+        return cls(cache.cache_path(NOTIFICATION_STATE_FILENAME.format(cache.token_digest(token))), min_increase)
+
+    def should_notify(self, key: str, counts: Sequence[int]) -> bool:
+        """
+        Determines whether a message with the provided counts must be notified, and keeps them pending if so.
+
+        :param key: Command the message was generated by, with its options.
+        :param counts: Counts of assignments the message is about.
+        :return: True if the message must be notified, False if it would duplicate a previous notification.
+        """
+        entries = self._load()
+        counts = list(counts)
+        previous = entries.get(key)
+        if previous == counts:
+            return False
+
+        increase = sum(counts) - sum(previous) if previous is not None else 0
+        notify = previous is None or self.min_increase == 0 or increase >= self.min_increase
+        if notify:
+            self._pending[key] = counts
+        elif increase < 0:
+            self._set(key, counts)
+        return notify
+
+    def commit(self) -> None:
+        """
+        Records the pending counts as notified, once their messages were sent.
+        """
+        for key, counts in self._pending.items():
+            self._set(key, counts)
+        self._pending = {}
+
+    def reset(self, key: str) -> None:
+        """
+        Forgets what was last notified for a command, which has nothing to notify anymore.
+        """
+        self._pending.pop(key, None)
+        if key in self._load():
+            self._set(key, None)
+
+    def save(self) -> None:
+        """
+        Persists the state if it changed since it was loaded, dropping the counts still pending.
+
+        The changes are merged into the state saved meanwhile by overlapping runs for the same user, if any.
+        """
+        self._pending = {}
+        if not self._changes:
+            return
+
+        with cache.file_lock(f"{self._path}.lock"):
+            self._entries = None
+            entries = self._load()
+            for key, counts in self._changes.items():
+                _apply_change(entries, key, counts)
+            cache.dump_versioned(self._path, NOTIFICATION_STATE_VERSION, entries)
+        self._changes = {}
+
+    def _set(self, key: str, counts: Optional[List[int]]) -> None:
+        _apply_change(self._load(), key, counts)
+        self._changes[key] = counts
+
+    def _load(self) -> Dict[str, List[int]]:
+        if self._entries is None:
+            self._entries = cache.load_versioned(self._path, NOTIFICATION_STATE_VERSION) or {}
+        return self._entries
+
+
+def _apply_change(entries: Dict[str, List[int]], key: str, counts: Optional[List[int]]) -> None:
+    if counts is None:
+        entries.pop(key, None)
+    else:
+        entries[key] = counts
@@ -0,0 +1,219 @@
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from wanikani_notifier import cache
+
+STORE_FILENAME = "store.sqlite3"
+STORE_SCHEMA_VERSION = 1
+
+JSON_STORE = "json"
+SQLITE_STORE = "sqlite"
+
+_SCHEMA = """
+CREATE TABLE subjects (
+    id INTEGER PRIMARY KEY,
+    level INTEGER NOT NULL,
+    data_updated_at REAL NOT NULL
+);
+CREATE INDEX subjects_level ON subjects (level);
+
+CREATE TABLE assignments (
+    account TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    available_at REAL,
+    started INTEGER NOT NULL,
+    unlocked INTEGER NOT NULL,
+    hidden INTEGER NOT NULL,
+    data_updated_at REAL NOT NULL,
+    PRIMARY KEY (account, id)
+);
+CREATE INDEX assignments_available_at ON assignments (account, available_at);
+CREATE INDEX assignments_created_at ON assignments (account, created_at);
+
+CREATE TABLE accounts (
+    account TEXT PRIMARY KEY,
+    full_synced_at REAL NOT NULL
+);
+"""
+
+_ASSIGNMENT_COLUMNS = "id, subject_id, created_at, available_at, started, unlocked, hidden, data_updated_at"
+
+
+class SqliteStore:
+    """
+    Local store of the subjects and of the assignments of several accounts, backed by a SQLite database.
+
+    Assignments are indexed on their availability time, and subjects on their id and level, so that the number of
+    available assignments is counted by indexed queries instead of loops over all the assignments.
+    Each thread gets its own connection to the database, which is shared by concurrent runs thanks to WAL journaling.
+    Accounts are identified by the digest of their API token.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+        self._migrate()
+
+    @classmethod
+    def default(cls) -> "SqliteStore":
+        return cls(cache.cache_path(STORE_FILENAME))
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        if getattr(self._local, "connection", None) is None:
+            connection = sqlite3.connect(self._path, timeout=30)
+            connection.execute("PRAGMA journal_mode = WAL")
+            self._local.connection = connection
+        return self._local.connection
+
+    def _migrate(self) -> None:
+        """
+        Creates the schema of the store, dropping the tables of any other schema version.
+
+        The schema is created in a single write transaction, in which its version is checked again, so that concurrent
+        first runs neither drop the tables one another just created nor see half of them.
+        """
+        connection = self._connection
+        if connection.execute("PRAGMA user_version").fetchone()[0] == STORE_SCHEMA_VERSION:
+            return
+
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if connection.execute("PRAGMA user_version").fetchone()[0] != STORE_SCHEMA_VERSION:
+                for table in ("subjects", "assignments", "accounts"):
+                    connection.execute(f"DROP TABLE IF EXISTS {table}")
+                for statement in _SCHEMA.split(";"):
+                    if statement.strip():
+                        connection.execute(statement)
+                connection.execute(f"PRAGMA user_version = {STORE_SCHEMA_VERSION}")
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+
+    def latest_subject_update(self) -> Optional[float]:
+        return self._connection.execute("SELECT MAX(data_updated_at) FROM subjects").fetchone()[0]
+
+    def put_subjects(self, subjects: Iterable[Tuple]) -> None:
+        """
+        Inserts or replaces subjects, given as (id, level, data_updated_at) tuples.
+        """
+        with self._connection as connection:
+            connection.executemany("INSERT OR REPLACE INTO subjects (id, level, data_updated_at) VALUES (?, ?, ?)",
+                                   subjects)
+
+    def get_subject(self, subject_id: int) -> Optional[Tuple]:
+        return self._connection.execute("SELECT id, level, data_updated_at FROM subjects WHERE id = ?",
+                                        (subject_id,)).fetchone()
+
+    def subject_ids(self) -> List[int]:
+        return [row[0] for row in self._connection.execute("SELECT id FROM subjects ORDER BY id")]
+
+    def count_subjects(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM subjects").fetchone()[0]
+
+    def full_synced_at(self, account: str) -> Optional[float]:
+        row = self._connection.execute("SELECT full_synced_at FROM accounts WHERE account = ?", (account,)).fetchone()
+        return row[0] if row else None
+
+    def latest_assignment_update(self, account: str) -> Optional[float]:
+        return self._connection.execute("SELECT MAX(data_updated_at) FROM assignments WHERE account = ?",
+                                        (account,)).fetchone()[0]
+
+    def put_assignments(self, account: str, assignments: Iterable[Tuple], full_synced_at: Optional[float] = None
+                        ) -> None:
+        """
+        Inserts or replaces assignments of an account, given as tuples of the columns of AssignmentInfo.
+
+        :param account: Account the assignments belong to.
+        :param assignments: Assignments to store.
+        :param full_synced_at: When provided, the assignments are all the ones of the account, which replace the
+                                stored ones in a single transaction, and the time of this full sync is recorded.
+        """
+        with self._connection as connection:
+            if full_synced_at is not None:
+                connection.execute("DELETE FROM assignments WHERE account = ?", (account,))
+                connection.execute("INSERT OR REPLACE INTO accounts (account, full_synced_at) VALUES (?, ?)",
+                                   (account, full_synced_at))
+            connection.executemany(f"INSERT OR REPLACE INTO assignments (account, {_ASSIGNMENT_COLUMNS}) "
+                                   f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   ((account, *assignment) for assignment in assignments))
+
+    def count_assignments(self, account: str) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM assignments WHERE account = ?", (account,)).fetchone()[0]
+
+    def get_assignments(self, account: str, unlocked_only: bool = True) -> List[Tuple]:
+        query = f"SELECT {_ASSIGNMENT_COLUMNS} FROM assignments WHERE account = ?"
+        if unlocked_only:
+            query += " AND unlocked"
+        return [(*row[:4], bool(row[4]), bool(row[5]), bool(row[6]), row[7])
+                for row in self._connection.execute(query, (account,))]
+
+    def count_available_assignments(self, account: str, user_level: int, end: float, start: Optional[float] = None
+                                    ) -> Tuple[int, int]:
+        """
+        Counts the reviews and lessons of an account that are available in a time period, with the same rules as
+        get_available_assignments.
+
+        :return: the number of available reviews and lessons.
+        """
+        reviews = self._connection.execute(
+            "SELECT COUNT(*) FROM assignments JOIN subjects ON subjects.id = assignments.subject_id "
+            "WHERE account = ? AND available_at BETWEEN ? AND ? AND unlocked AND started AND NOT hidden "
+            "AND subjects.level <= ?",
+            (account, start if start is not None else float("-inf"), end, user_level)
+        ).fetchone()[0]
+        lessons = self._connection.execute(
+            "SELECT COUNT(*) FROM assignments "
+            "WHERE account = ? AND created_at BETWEEN ? AND ? AND unlocked AND NOT started",
+            (account, start if start is not None else float("-inf"), end)
+        ).fetchone()[0]
+        return reviews, lessons
+
+    def next_available_at(self, account: str, user_level: int, after: float) -> Optional[float]:
+        """
+        Gets the earliest time, strictly after the provided one, when a review of an account becomes available.
+        """
+        return self._connection.execute(
+            "SELECT MIN(available_at) FROM assignments JOIN subjects ON subjects.id = assignments.subject_id "
+            "WHERE account = ? AND available_at > ? AND unlocked AND started AND NOT hidden AND subjects.level <= ?",
+            (account, after, user_level)
+        ).fetchone()[0]
+
+    def review_times(self, account: str, user_level: int, after: float) -> List[float]:
+        """
+        Gets the sorted times, strictly after the provided one, when the reviews of an account become available,
+        with the same rules as get_available_assignments.
+        """
+        return [row[0] for row in self._connection.execute(
+            "SELECT available_at FROM assignments JOIN subjects ON subjects.id = assignments.subject_id "
+            "WHERE account = ? AND available_at > ? AND unlocked AND started AND NOT hidden AND subjects.level <= ? "
+            "ORDER BY available_at",
+            (account, after, user_level)
+        )]
+
+    def lesson_times(self, account: str, after: float) -> List[float]:
+        """
+        Gets the sorted times, strictly after the provided one, when the lessons of an account became available.
+        """
+        return [row[0] for row in self._connection.execute(
+            "SELECT created_at FROM assignments WHERE account = ? AND created_at > ? AND unlocked AND NOT started "
+            "ORDER BY created_at",
+            (account, after)
+        )]
+
+    def review_times_between(self, account: str, user_level: int, start: float, end: float) -> List[float]:
+        """
+        Gets the sorted times when the reviews of an account become available in a time period, from start (inclusive)
+        to end (exclusive), with the same rules as get_review_forecast.
+        """
+        return [row[0] for row in self._connection.execute(
+            "SELECT available_at FROM assignments JOIN subjects ON subjects.id = assignments.subject_id "
+            "WHERE account = ? AND available_at >= ? AND available_at < ? "
+            "AND unlocked AND started AND NOT hidden AND subjects.level <= ? "
+            "ORDER BY available_at",
+            (account, start, end, user_level)
+        )]
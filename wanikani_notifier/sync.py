@@ -0,0 +1,98 @@
+import logging
+from typing import IO, Callable, List, Optional, Sequence, Tuple
+
+import click
+import ujson as ujson
+
+from wanikani_notifier import cache, transport
+from wanikani_notifier.client import WaniKaniClient, build_client
+from wanikani_notifier.options import wanikani_options
+from wanikani_notifier.store import SqliteStore, SQLITE_STORE
+from wanikani_notifier.wanikani import SyncReport, sync_subjects, sync_assignments
+
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option("--wanikani",
+              multiple=True,
+              help="WaniKani API token of an account whose assignments are synced, can be repeated"
+              )
+@click.option("--accounts",
+              type=click.File("r"),
+              required=False,
+              help="Batch configuration whose accounts' assignments are synced"
+              )
+@click.option("--assignments/--subjects-only",
+              default=True,
+              help="Determines whether the assignments of the accounts are synced along with the subjects"
+              )
+@wanikani_options(summary=False)
+def sync(wanikani: Sequence[str], accounts: Optional[IO], assignments: bool, http_timeout: float, http_retries: int,
+         rate_limit: int, shared_rate_limit: bool, cache_dir: Optional[str], store: str):
+    """
+    Syncs the local caches of the subjects and of the assignments of the accounts, then reports what changed.
+
+    It is meant to run out of band, e.g. from a low-priority timer, so that notification runs find warm caches
+    instead of downloading all the subjects after a deploy or a content update.
+    """
+    tokens = named_tokens(wanikani, ujson.load(accounts) if accounts else {})
+    if not tokens:
+        raise click.UsageError("Provide at least one WaniKani API token, through --wanikani or --accounts")
+
+    cache.set_cache_folder(cache_dir)
+    session = transport.build_session(timeout=http_timeout, retries=http_retries)
+    sqlite_store = SqliteStore.default() if store == SQLITE_STORE else None
+
+    def client(token: str) -> WaniKaniClient:
+        return build_client(token, session, rate_limit, shared_rate_limit)
+
+    _, subjects_report = sync_subjects(client(tokens[0][1]), store=sqlite_store)
+    click.echo(format_sync_report("subjects", subjects_report))
+
+    if assignments:
+        failures = sync_accounts(tokens, client, sqlite_store)
+        if failures:
+            raise click.ClickException(f"{len(failures)} out of {len(tokens)} accounts failed: {', '.join(failures)}")
+
+
+def named_tokens(tokens: Sequence[str], config: dict) -> List[Tuple[str, str]]:
+    """
+    Gets the accounts to sync, named after the batch configuration, or else after the digest of their token.
+
+    :return: the name and API token of each account, without duplicates.
+    """
+    named = [(cache.token_digest(token)[:8], token) for token in tokens]
+    named += [(account_config.get("name", str(index)), account_config["wanikani"])
+              for index, account_config in enumerate(config.get("accounts", []))]
+
+    unique = {}
+    for name, token in named:
+        unique.setdefault(token, name)
+    return [(name, token) for token, name in unique.items()]
+
+
+def sync_accounts(tokens: List[Tuple[str, str]], client: Callable[[str], WaniKaniClient],
+                  store: Optional[SqliteStore] = None) -> List[str]:
+    """
+    Syncs the assignments of each account in turn, reporting what changed.
+
+    :param tokens: Name and API token of each account.
+    :param client: Builder of the WaniKani client of an API token.
+    :param store: SQLite store to sync the assignments to instead of the cache files, if any.
+    :return: the names of the accounts that failed.
+    """
+    failures = []
+    for name, token in tokens:
+        try:
+            report = sync_assignments(client(token), store=store)
+        except Exception:
+            logger.exception("Failed to sync the assignments of %s", name)
+            failures.append(name)
+        else:
+            click.echo(format_sync_report(f"assignments of {name}", report))
+    return failures
+
+
+def format_sync_report(name: str, report: SyncReport) -> str:
+    return f"{name}: {report.updated} updated, {report.total} in total{' (full sync)' if report.full_sync else ''}"
@@ -0,0 +1,49 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 3
+DEFAULT_POOL_SIZE = 10
+
+
+class TimeoutSession(requests.Session):
+    """
+    HTTP session applying a default timeout to all the requests that do not provide their own.
+    """
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def build_session(timeout: float = DEFAULT_TIMEOUT,
+                  retries: int = DEFAULT_RETRIES,
+                  pool_size: int = DEFAULT_POOL_SIZE
+                  ) -> requests.Session:
+    """
+    Builds an HTTP session keeping connections alive, to be shared by all the clients of a process.
+
+    Failed connections are retried for all requests, while server errors are only retried for idempotent requests
+    so that a notification is never sent twice.
+
+    :param timeout: Default number of seconds to wait for the server before giving up on a request.
+    :param retries: Number of times a failed request is retried.
+    :param pool_size: Number of connections kept alive per host.
+    :return: the HTTP session.
+    """
+    retry = Retry(total=retries,
+                  backoff_factor=0.5,
+                  status_forcelist=(500, 502, 503, 504),
+                  allowed_methods=frozenset(["GET", "HEAD"]),
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = TimeoutSession(timeout)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
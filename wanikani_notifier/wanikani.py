@@ -1,66 +1,606 @@
 import os
-from datetime import datetime
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
 from collections import namedtuple
-from typing import Optional, Dict
+from typing import Optional, Dict, Iterable, List, Tuple, Mapping, Iterator, Sequence
 
 import pytz
 import ujson as ujson
 from wanikani_api.client import Client as WaniKaniClient
-from wanikani_api.models import Subject
+from wanikani_api.models import Assignment, Subject, Summary, UserInformation, parse8601
+
+from wanikani_notifier import cache
+from wanikani_notifier.metrics import metrics
+from wanikani_notifier.store import SqliteStore
 
 AvailableAssignments = namedtuple("AvailableAssignments", ("reviews", "lessons"))
+SubjectInfo = namedtuple("SubjectInfo", ("id", "level", "data_updated_at"))
+AssignmentInfo = namedtuple("AssignmentInfo", ("id", "subject_id", "created_at", "available_at",
+                                               "started", "unlocked", "hidden", "data_updated_at"))
+SummaryInfo = namedtuple("SummaryInfo", ("lessons", "reviews", "next_reviews_at"))
+SyncReport = namedtuple("SyncReport", ("updated", "total", "full_sync"))
+
+
+SUBJECTS_CACHED_FILENAME = "subjects.v2.json.gz"
+SUBJECTS_CACHE_VERSION = 2
+LEGACY_SUBJECTS_CACHED_FILENAME = "subjects.json"
+
+ASSIGNMENTS_CACHED_FILENAME = "assignments-{}.json.gz"
+ASSIGNMENTS_CACHE_VERSION = 1
+ASSIGNMENTS_FULL_RESYNC_PERIOD = timedelta(days=1)
+
+SUMMARY_PERIOD = timedelta(hours=1)
+
+
+@metrics.timed("get_all_subjects")
+def get_all_subjects(wk_client: WaniKaniClient, store: Optional[SqliteStore] = None) -> Mapping[int, SubjectInfo]:
+    """
+    Gets the subjects known to WaniKani, as cached locally and completed by the ones updated since the last run.
+
+    Only the fields of the subjects that are needed to notify are kept, i.e. their id, level and the timestamp
+    of their last update. The cache file is only written again when some subjects were updated.
+    The cache file is locked from its load until it is written, so that concurrent processes take turns and the
+    ones waiting find the subjects synced by the first one.
+
+    :param wk_client: WaniKani client to use for fetching the updated subjects
+    :param store: SQLite store to keep the subjects in instead of the cache file, if any
+    :return: the subjects indexed by their id.
+    """
+    return sync_subjects(wk_client, store=store)[0]
+
+
+def sync_subjects(wk_client: WaniKaniClient, store: Optional[SqliteStore] = None
+                  ) -> Tuple[Mapping[int, SubjectInfo], SyncReport]:
+    """
+    Syncs the local cache of the subjects, as get_all_subjects does.
+
+    :return: the subjects indexed by their id, and what changed in the cache.
+    """
+    if store is not None:
+        return _sync_stored_subjects(wk_client, store)
+
+    cache_path = cache.cache_path(SUBJECTS_CACHED_FILENAME)
+    with cache.file_lock(f"{cache_path}.lock"):
+        all_subjects, migrated_from = _load_cached_subjects()
+        metrics.increment("cache.subjects.hit" if all_subjects else "cache.subjects.miss")
+        full_sync = not all_subjects
+
+        latest_update = max(s.data_updated_at for s in all_subjects.values()) if all_subjects else None
+        updated = 0
+        for subject in wk_client.subjects(updated_after=_updated_after(latest_update), fetch_all=True):
+            all_subjects[subject.id] = _to_subject_info(subject)
+            metrics.increment("subjects.updated")
+            updated += 1
+
+        if updated or migrated_from:
+            with metrics.timed("cache.subjects.write"):
+                cache.dump_versioned(cache_path, SUBJECTS_CACHE_VERSION, iter(all_subjects.values()))
+        if migrated_from:
+            os.remove(migrated_from)
+
+    return all_subjects, SyncReport(updated, len(all_subjects), full_sync)
+
+
+def _sync_stored_subjects(wk_client: WaniKaniClient, store: SqliteStore) -> Tuple["StoredSubjects", SyncReport]:
+    latest_update = store.latest_subject_update()
+    metrics.increment("cache.subjects.hit" if latest_update is not None else "cache.subjects.miss")
+
+    updated_subjects = [_to_subject_info(s)
+                        for s in wk_client.subjects(updated_after=_updated_after(latest_update), fetch_all=True)]
+    if updated_subjects:
+        metrics.increment("subjects.updated", len(updated_subjects))
+        with metrics.timed("cache.subjects.write"):
+            store.put_subjects(updated_subjects)
+
+    return StoredSubjects(store), SyncReport(len(updated_subjects), store.count_subjects(), latest_update is None)
+
+
+class StoredSubjects(Mapping):
+    """
+    Read-only mapping of the subjects kept in a SQLite store, indexed by their id and queried on access.
+    """
+
+    def __init__(self, store: SqliteStore):
+        self.store = store
+
+    def __getitem__(self, subject_id: int) -> SubjectInfo:
+        row = self.store.get_subject(subject_id)
+        if row is None:
+            raise KeyError(subject_id)
+        return SubjectInfo(*row)
+
+    def __contains__(self, subject_id) -> bool:
+        return self.store.get_subject(subject_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.store.subject_ids())
+
+    def __len__(self) -> int:
+        return self.store.count_subjects()
+
+
+def _load_cached_subjects() -> Tuple[Dict[int, SubjectInfo], Optional[str]]:
+    """
+    Loads the cached subjects, migrating them from the caches of previous versions when there is none yet, i.e. from
+    the legacy JSON file, or from the data folder of the working directory where the caches used to be kept.
+
+    :return: the cached subjects, and the path of the cache they were migrated from, if they still need to be written.
+    """
+    cached_subjects = cache.load_versioned(cache.cache_path(SUBJECTS_CACHED_FILENAME), SUBJECTS_CACHE_VERSION)
+    if cached_subjects is not None:
+        return {s[0]: SubjectInfo(*s) for s in cached_subjects}, None
+
+    moved_path = cache.legacy_cache_path(SUBJECTS_CACHED_FILENAME)
+    cached_subjects = cache.load_versioned(moved_path, SUBJECTS_CACHE_VERSION) if moved_path else None
+    if cached_subjects is not None:
+        return {s[0]: SubjectInfo(*s) for s in cached_subjects}, moved_path
+
+    for legacy_path in (cache.cache_path(LEGACY_SUBJECTS_CACHED_FILENAME),
+                        cache.legacy_cache_path(LEGACY_SUBJECTS_CACHED_FILENAME)):
+        if legacy_path and os.path.exists(legacy_path):
+            with open(legacy_path, "r") as legacy_file:
+                return _migrate_legacy_subjects(ujson.load(legacy_file)), legacy_path
+
+    return {}, None
+
+
+def _migrate_legacy_subjects(subject_jsons: Iterable[dict]) -> Dict[int, SubjectInfo]:
+    return {
+        subject_json["id"]: SubjectInfo(id=subject_json["id"],
+                                        level=subject_json["data"]["level"],
+                                        data_updated_at=_to_timestamp(parse8601(subject_json["data_updated_at"])))
+        for subject_json in subject_jsons
+    }
+
+
+@metrics.timed("get_all_assignments")
+def get_all_assignments(wk_client: WaniKaniClient) -> Dict[int, AssignmentInfo]:
+    """
+    Gets the assignments of the user, as cached locally and completed by the ones updated since the last sync.
+
+    All the assignments are fetched again once the last full sync is older than ASSIGNMENTS_FULL_RESYNC_PERIOD,
+    so that the local cache cannot drift away from WaniKani.
+    The cache file is only written again when some assignments were updated or after a full sync, and is locked
+    from its load until it is written.
+
+    :param wk_client: WaniKani client to use for fetching the updated assignments
+    :return: the assignments indexed by their id.
+    """
+    return _sync_cached_assignments(wk_client)[0]
+
+
+def sync_assignments(wk_client: WaniKaniClient, store: Optional[SqliteStore] = None) -> SyncReport:
+    """
+    Syncs the local cache of the assignments of the user, or the SQLite store if provided, as get_all_assignments
+    does.
+
+    :return: what changed in the cache.
+    """
+    if store is not None:
+        return _sync_stored_assignments(wk_client, store)
+    return _sync_cached_assignments(wk_client)[1]
+
+
+def _sync_cached_assignments(wk_client: WaniKaniClient) -> Tuple[Dict[int, AssignmentInfo], SyncReport]:
+    cache_path = cache.cache_path(ASSIGNMENTS_CACHED_FILENAME.format(cache.token_digest(wk_client.v2_api_key)))
+    with cache.file_lock(f"{cache_path}.lock"):
+        cached = cache.load_versioned(cache_path, ASSIGNMENTS_CACHE_VERSION)
+
+        now = time.time()
+        all_assignments: Dict[int, AssignmentInfo] = {}
+        full_synced_at = now
+        full_sync = True
+        if cached is not None and now - cached["full_synced_at"] < ASSIGNMENTS_FULL_RESYNC_PERIOD.total_seconds():
+            all_assignments = {a[0]: AssignmentInfo(*a) for a in cached["assignments"]}
+            full_synced_at = cached["full_synced_at"]
+            full_sync = False
+        metrics.increment("cache.assignments.hit" if all_assignments else "cache.assignments.miss")
+
+        latest_update = max(a.data_updated_at for a in all_assignments.values()) if all_assignments else None
+        updated = 0
+        for assignment in wk_client.assignments(updated_after=_updated_after(latest_update), fetch_all=True):
+            all_assignments[assignment.id] = _to_assignment_info(assignment)
+            metrics.increment("assignments.updated")
+            updated += 1
+
+        if updated or full_sync:
+            with metrics.timed("cache.assignments.write"):
+                cache.dump_versioned(cache_path,
+                                     ASSIGNMENTS_CACHE_VERSION,
+                                     {"full_synced_at": full_synced_at, "assignments": iter(all_assignments.values())})
+
+    return all_assignments, SyncReport(updated, len(all_assignments), full_sync)
+
+
+def _sync_stored_assignments(wk_client: WaniKaniClient, store: SqliteStore) -> SyncReport:
+    account = cache.token_digest(wk_client.v2_api_key)
+    now = time.time()
+    full_synced_at = store.full_synced_at(account)
+    full_sync = full_synced_at is None or now - full_synced_at >= ASSIGNMENTS_FULL_RESYNC_PERIOD.total_seconds()
+    metrics.increment("cache.assignments.miss" if full_sync else "cache.assignments.hit")
+
+    latest_update = None if full_sync else store.latest_assignment_update(account)
+    updated_assignments = [_to_assignment_info(a)
+                           for a in wk_client.assignments(updated_after=_updated_after(latest_update), fetch_all=True)]
+    if updated_assignments:
+        metrics.increment("assignments.updated", len(updated_assignments))
+    if updated_assignments or full_sync:
+        with metrics.timed("cache.assignments.write"):
+            store.put_assignments(account, updated_assignments, full_synced_at=now if full_sync else None)
+
+    return SyncReport(len(updated_assignments), store.count_assignments(account), full_sync)
 
 
-SUBJECTS_CACHED_FILENAME = "subjects.json"
+def _updated_after(latest_update: Optional[float]) -> str:
+    updated_after = (datetime.fromtimestamp(latest_update, tz=pytz.utc) if latest_update is not None else datetime.min)
+    return updated_after.strftime("%Y-%m-%dT%H:%M:%S.%f")
 
 
-def get_all_subjects(wk_client: WaniKaniClient) -> Dict[int, Subject]:
-    all_subjects: Dict[int, Subject] = {}
+def _to_subject_info(subject: Subject) -> SubjectInfo:
+    return SubjectInfo(id=subject.id, level=subject.level, data_updated_at=_to_timestamp(subject.data_updated_at))
 
-    if not os.path.exists("data/"):
-        os.makedirs("data/")
 
-    if os.path.exists(f"data/{SUBJECTS_CACHED_FILENAME}"):
-        subject_jsons = ujson.load(open(f"data/{SUBJECTS_CACHED_FILENAME}", "r"))
-        all_subjects = {subject_json["id"]: Subject(subject_json) for subject_json in subject_jsons}
+def _to_assignment_info(assignment: Assignment) -> AssignmentInfo:
+    return AssignmentInfo(id=assignment.id,
+                          subject_id=assignment.subject_id,
+                          created_at=_to_timestamp(assignment.created_at),
+                          available_at=_to_timestamp(assignment.available_at) if assignment.available_at else None,
+                          started=assignment.started_at is not None,
+                          unlocked=assignment.unlocked_at is not None,
+                          hidden=assignment.hidden,
+                          data_updated_at=_to_timestamp(assignment.data_updated_at))
 
-    latest_update = max([s.data_updated_at for s in all_subjects.values()]) if all_subjects else datetime.min
-    for subject in wk_client.subjects(updated_after=latest_update.strftime("%Y-%m-%dT%H:%M:%S.%f"), fetch_all=True):
-        all_subjects[subject.id] = subject
 
-    ujson.dump([subject._raw for subject in all_subjects.values()], open(f"data/{SUBJECTS_CACHED_FILENAME}", "w"))
+def _to_summary_info(summary: Summary) -> SummaryInfo:
+    return SummaryInfo(lessons=[(_to_timestamp(summary.lessons.available_at), len(summary.lessons.subject_ids))],
+                       reviews=[(_to_timestamp(r.available_at), len(r.subject_ids)) for r in summary.reviews],
+                       next_reviews_at=(_to_timestamp(parse8601(summary.next_reviews_at))
+                                        if summary.next_reviews_at else None))
 
-    return all_subjects
 
+def _to_timestamp(moment: datetime) -> float:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=pytz.utc)
+    return moment.timestamp()
 
-def get_available_assignments(wanikani_client: WaniKaniClient,
-                              all_subjects: Dict[int, Subject],
+
+class AssignmentColumns:
+    """
+    Compact columnar representation of assignments, built once per snapshot, indexed by time.
+
+    The reviews, i.e. the started assignments that are not hidden and have an availability time, are kept as parallel
+    arrays of their availability timestamp and subject id, and the lessons as a sorted array of their creation
+    timestamp. The availability timestamps of the reviews that can be done at a level are sorted once per mapping
+    of subjects and level, so that counting the assignments of any time window is a pair of binary searches.
+    """
+
+    __slots__ = ("review_times", "review_subject_ids", "lesson_times", "_index_key", "_reviewable_times")
+
+    def __init__(self, assignments: Iterable[AssignmentInfo]):
+        self.review_times = array("d")
+        self.review_subject_ids = array("L")
+        lesson_times = array("d")
+        for a in assignments:
+            if not a.started:
+                lesson_times.append(a.created_at)
+            elif a.available_at is not None and not a.hidden:
+                self.review_times.append(a.available_at)
+                self.review_subject_ids.append(a.subject_id)
+        self.lesson_times = array("d", sorted(lesson_times))
+        self._index_key: Optional[Tuple[Mapping[int, SubjectInfo], int]] = None
+        self._reviewable_times = array("d")
+
+    def reviewable_times(self, all_subjects: Mapping[int, SubjectInfo], user_level: int) -> array:
+        """
+        :return: the sorted availability times of the reviews whose subject is known and at most at the provided level.
+        """
+        if self._index_key is None or self._index_key[0] is not all_subjects or self._index_key[1] != user_level:
+            self._reviewable_times = array("d", sorted(
+                available_at
+                for available_at, subject_id in zip(self.review_times, self.review_subject_ids)
+                if getattr(all_subjects.get(subject_id), "level", user_level + 1) <= user_level
+            ))
+            self._index_key = (all_subjects, user_level)
+        return self._reviewable_times
+
+    def count_reviews(self, all_subjects: Mapping[int, SubjectInfo], user_level: int, end: float,
+                      start: float = float("-inf")) -> int:
+        return _count_between(self.reviewable_times(all_subjects, user_level), start, end)
+
+    def count_lessons(self, end: float, start: float = float("-inf")) -> int:
+        return _count_between(self.lesson_times, start, end)
+
+    def next_review_time(self, all_subjects: Mapping[int, SubjectInfo], user_level: int, after: float
+                         ) -> Optional[float]:
+        times = self.reviewable_times(all_subjects, user_level)
+        index = bisect_right(times, after)
+        return times[index] if index < len(times) else None
+
+
+def _count_between(sorted_times: Sequence[float], start: float, end: float) -> int:
+    """
+    :return: the number of times between start and end (inclusive) among the sorted ones.
+    """
+    return max(0, bisect_right(sorted_times, end) - bisect_left(sorted_times, start))
+
+
+class AssignmentsSnapshot:
+    """
+    Snapshot of the assignments and information of a user, fetched lazily on first access.
+
+    It is shared by all the commands of a run so that the assignments are fetched at most once,
+    whatever the number of chained commands querying them.
+    When provided with a SQLite store, the assignments are synced to it instead of the cache file, and queried
+    from it.
+    When using the summary, the counts it covers are answered from the single /summary response instead.
+    """
+
+    def __init__(self, wanikani_client: WaniKaniClient, store: Optional[SqliteStore] = None, use_summary: bool = False):
+        self._wanikani_client = wanikani_client
+        self.store = store
+        self.use_summary = use_summary
+        self._store_synced = False
+        self._user_information: Optional[UserInformation] = None
+        self._summary: Optional[SummaryInfo] = None
+        self._columns: Optional[AssignmentColumns] = None
+
+    def renewed(self) -> "AssignmentsSnapshot":
+        """
+        Gets a new snapshot of the same user, whose assignments and information will be fetched again.
+        """
+        return AssignmentsSnapshot(self._wanikani_client, store=self.store, use_summary=self.use_summary)
+
+    @property
+    def account(self) -> str:
+        return cache.token_digest(self._wanikani_client.v2_api_key)
+
+    @property
+    def user_information(self) -> UserInformation:
+        if self._user_information is None:
+            with metrics.timed("user_information"):
+                self._user_information = self._wanikani_client.user_information()
+        return self._user_information
+
+    @property
+    def summary(self) -> Optional[SummaryInfo]:
+        """
+        Lessons available now and reviews of the next 24 hours, bucketed per hour, if the snapshot uses the summary.
+        """
+        if self.use_summary and self._summary is None:
+            with metrics.timed("summary"):
+                self._summary = _to_summary_info(self._wanikani_client.summary())
+        return self._summary
+
+    @property
+    def synced_store(self) -> Optional[SqliteStore]:
+        """
+        SQLite store the assignments of the user are synced to on first access, if any.
+        """
+        if self.store is not None and not self._store_synced:
+            with metrics.timed("get_all_assignments"):
+                _sync_stored_assignments(self._wanikani_client, self.store)
+            self._store_synced = True
+        return self.store
+
+    @property
+    def columns(self) -> AssignmentColumns:
+        """
+        Columnar representation of the unlocked assignments of the user, built on first access.
+
+        Only the columns are kept, not the assignment records they are built from.
+        """
+        if self._columns is None:
+            with metrics.timed("assignments.columns"):
+                self._columns = AssignmentColumns(self._unlocked_assignments())
+        return self._columns
+
+    def _unlocked_assignments(self) -> Iterator[AssignmentInfo]:
+        if self.synced_store is not None:
+            return (AssignmentInfo(*a) for a in self.synced_store.get_assignments(self.account))
+        return (a for a in get_all_assignments(self._wanikani_client).values() if a.unlocked)
+
+
+@metrics.timed("get_available_assignments")
+def get_available_assignments(snapshot: AssignmentsSnapshot,
+                              all_subjects: Mapping[int, SubjectInfo],
                               end: datetime,
                               start: datetime = None
                               ) -> AvailableAssignments:
     """
     Gets the number of reviews and lessons that are available in the provided time period.
 
+    Counts of the whole history until a time covered by the summary are read from it when the snapshot uses the
+    summary. Otherwise, when the snapshot is backed by a SQLite store, both the assignments and subjects are queried
+    from the store.
+
     :rtype: object
-    :param wanikani_client: WaniKani client to use for fetching assignments
+    :param snapshot: Snapshot of the user's assignments to query
+    :param all_subjects: Subjects known to WaniKani, indexed by their id
     :param start: Start of the time period when assignments are considered (inclusive).
     :param end: End of the time period when assignments are considered (inclusive).
     :return: the available assignments.
     """
-    user_level = wanikani_client.user_information().level
-    review_count = sum(1
-                       for a in wanikani_client.assignments(fetch_all=True, unlocked=True, started=True,
-                                                            available_after=start, available_before=end)
-                       if not a.hidden
-                       and a.subject_id in all_subjects and all_subjects[a.subject_id].level <= user_level
-                       )
-    lesson_count = sum(1
-                       for a in wanikani_client.assignments(fetch_all=True, unlocked=True, started=False)
-                       if a.created_at.replace(tzinfo=pytz.utc) <= end.replace(tzinfo=pytz.utc)
-                       and (start.replace(tzinfo=pytz.utc) <= a.created_at.replace(tzinfo=pytz.utc) if start else True)
-                       )
-
-    return AvailableAssignments(reviews=review_count, lessons=lesson_count)
+    end_timestamp = _to_timestamp(end)
+    start_timestamp = _to_timestamp(start) if start else None
+
+    summary = snapshot.summary if start is None else None
+    if summary is not None and _summary_covers(summary, end_timestamp, end_timestamp):
+        metrics.increment("summary.hit")
+        return AvailableAssignments(reviews=sum(count for available_at, count in summary.reviews
+                                                if available_at <= end_timestamp),
+                                    lessons=sum(count for available_at, count in summary.lessons
+                                                if available_at <= end_timestamp))
+
+    user_level = snapshot.user_information.level
+    store = snapshot.synced_store
+    if store is not None:
+        return AvailableAssignments(*store.count_available_assignments(snapshot.account, user_level,
+                                                                       end_timestamp, start_timestamp))
+
+    start_timestamp = start_timestamp if start_timestamp is not None else float("-inf")
+    return AvailableAssignments(
+        reviews=snapshot.columns.count_reviews(all_subjects, user_level, end_timestamp, start_timestamp),
+        lessons=snapshot.columns.count_lessons(end_timestamp, start_timestamp)
+    )
+
+
+def get_next_available_time(snapshot: AssignmentsSnapshot,
+                            all_subjects: Mapping[int, SubjectInfo],
+                            after: datetime
+                            ) -> Optional[datetime]:
+    """
+    Gets the earliest time, strictly after the provided one, when a review becomes available.
+
+    When the snapshot uses the summary, the time is read from its hourly buckets or its next_reviews_at whenever
+    they tell it.
+
+    :param snapshot: Snapshot of the user's assignments to query
+    :param all_subjects: Subjects known to WaniKani, indexed by their id
+    :param after: Time after which reviews are looked for.
+    :return: the time when the next review becomes available if any, None otherwise.
+    """
+    after_timestamp = _to_timestamp(after)
+    summary = snapshot.summary
+    if summary is not None and _summary_covers(summary, after_timestamp, after_timestamp):
+        upcoming = [available_at for available_at, count in summary.reviews if count and available_at > after_timestamp]
+        if upcoming or summary.next_reviews_at is None or summary.next_reviews_at > after_timestamp:
+            metrics.increment("summary.hit")
+            next_available_at = min(upcoming, default=summary.next_reviews_at)
+            return datetime.utcfromtimestamp(next_available_at) if next_available_at is not None else None
+
+    user_level = snapshot.user_information.level
+    store = snapshot.synced_store
+    if store is not None:
+        next_available_at = store.next_available_at(snapshot.account, user_level, after_timestamp)
+    else:
+        next_available_at = snapshot.columns.next_review_time(all_subjects, user_level, after_timestamp)
+
+    return datetime.utcfromtimestamp(next_available_at) if next_available_at is not None else None
+
+
+@metrics.timed("get_next_notification_time")
+def get_next_notification_time(snapshot: AssignmentsSnapshot,
+                               all_subjects: Mapping[int, SubjectInfo],
+                               after: datetime,
+                               min_assignments: int = 1,
+                               since: Optional[timedelta] = None
+                               ) -> Optional[datetime]:
+    """
+    Gets the earliest time, strictly after the provided one, when reviews becoming available bring the number of
+    available assignments to at least min_assignments, i.e. when a notification could be sent next.
+
+    Lessons never become available in the future, so only the availability times of the reviews are considered.
+    When the snapshot uses the summary and no window is requested, the time is read from its hourly buckets if they
+    tell it. Otherwise, when the snapshot is backed by a SQLite store, only the times that can fall in a window are
+    queried from its indexes.
+
+    :param snapshot: Snapshot of the user's assignments to query
+    :param all_subjects: Subjects known to WaniKani, indexed by their id
+    :param after: Time after which the notification time is looked for.
+    :param min_assignments: Minimum number of available assignments for a notification to be sent.
+    :param since: Duration of the window of time, ending when notifying, in which assignments are counted, None to
+                    count all the available assignments.
+    :return: the time when a notification could be sent next if any, None otherwise.
+    """
+    after_timestamp = _to_timestamp(after)
+    summary = snapshot.summary if since is None else None
+    if summary is not None and _summary_covers(summary, after_timestamp, after_timestamp):
+        available = sum(count for _, count in summary.lessons) + \
+            sum(count for available_at, count in summary.reviews if available_at <= after_timestamp)
+        for available_at, count in summary.reviews:
+            if available_at > after_timestamp and count:
+                available += count
+                if available >= min_assignments:
+                    metrics.increment("summary.hit")
+                    return datetime.utcfromtimestamp(available_at)
+
+    user_level = snapshot.user_information.level
+    store = snapshot.synced_store
+    if store is not None:
+        # Only the times that can fall in a window are queried, the assignments available before being counted once.
+        lower_bound = after_timestamp - since.total_seconds() if since is not None else after_timestamp
+        review_times = store.review_times(snapshot.account, user_level, lower_bound)
+        lesson_times = store.lesson_times(snapshot.account, lower_bound)
+        already_available = sum(store.count_available_assignments(snapshot.account, user_level, lower_bound)) \
+            if since is None else 0
+    else:
+        review_times = snapshot.columns.reviewable_times(all_subjects, user_level)
+        lesson_times = snapshot.columns.lesson_times
+        already_available = 0
+
+    previous = None
+    for available_at in review_times[bisect_right(review_times, after_timestamp):]:
+        if available_at == previous:
+            continue
+        previous = available_at
+        start = available_at - since.total_seconds() + 1 if since is not None else float("-inf")
+        available = already_available + _count_between(review_times, start, available_at) + \
+            _count_between(lesson_times, start, available_at)
+        if available >= min_assignments:
+            return datetime.utcfromtimestamp(available_at)
+
+    return None
+
+
+@metrics.timed("get_review_forecast")
+def get_review_forecast(snapshot: AssignmentsSnapshot,
+                        all_subjects: Mapping[int, SubjectInfo],
+                        boundaries: Sequence[datetime],
+                        after: Optional[datetime] = None
+                        ) -> List[int]:
+    """
+    Counts the reviews becoming available in each of consecutive periods of time, which do not need to last the same,
+    e.g. days across a daylight saving time change.
+
+    The assignments are fetched once and only the availability times within the periods, found by binary search,
+    are bucketed against the boundaries, unless the periods are covered by the hourly buckets of the summary, which
+    are then bucketed instead.
+
+    :param snapshot: Snapshot of the user's assignments to query
+    :param all_subjects: Subjects known to WaniKani, indexed by their id
+    :param boundaries: Sorted boundaries of the periods, each period going from a boundary (inclusive) to the next one
+                        (exclusive).
+    :param after: Time after which reviews are counted (exclusive), typically now so that the reviews already
+                    available are left out. Defaults to the start of the first period.
+    :return: the number of reviews becoming available in each period.
+    """
+    timestamps = [_to_timestamp(boundary) for boundary in boundaries]
+    start_timestamp, end_timestamp = timestamps[0], timestamps[-1]
+    after_timestamp = _to_timestamp(after) if after else None
+
+    summary = snapshot.summary
+    if summary is not None and _summary_covers(summary, max(start_timestamp, after_timestamp or start_timestamp),
+                                               end_timestamp):
+        metrics.increment("summary.hit")
+        counts = [0] * (len(timestamps) - 1)
+        for available_at, count in summary.reviews:
+            if start_timestamp <= available_at < end_timestamp and (after_timestamp is None or after_timestamp < available_at):
+                counts[bisect_right(timestamps, available_at) - 1] += count
+        return counts
+
+    user_level = snapshot.user_information.level
+    store = snapshot.synced_store
+    if store is not None:
+        times = store.review_times_between(snapshot.account, user_level, start_timestamp, end_timestamp)
+    else:
+        times = snapshot.columns.reviewable_times(all_subjects, user_level)
+    first = bisect_left(times, start_timestamp)
+    if after_timestamp is not None:
+        first = max(first, bisect_right(times, after_timestamp))
+
+    return [max(0, bisect_left(times, end) - max(first, bisect_left(times, start)))
+            for start, end in zip(timestamps, timestamps[1:])]
+
+
+def _summary_covers(summary: SummaryInfo, start: float, end: float) -> bool:
+    """
+    :return: whether the hourly buckets of the summary tell apart all the reviews becoming available between the
+                provided times, the first bucket gathering all the reviews already available when it was fetched.
+    """
+    return bool(summary.reviews) and summary.reviews[0][0] <= start \
+        and end < summary.reviews[-1][0] + SUMMARY_PERIOD.total_seconds()
 
 
 def get_notification_message(available_assignments: AvailableAssignments,